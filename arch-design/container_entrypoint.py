@@ -20,13 +20,20 @@ Generated from agentcli/core/agent_server.py.j2 - DO NOT EDIT MANUALLY
 """
 
 
+import asyncio
+import contextlib
+import contextvars
+import json
 import os
 import sys
+import threading
 import uvicorn
 import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
 from pydantic import BaseModel
 
@@ -72,22 +79,218 @@ def extract_response_text(response) -> str:
 # SPDX-License-Identifier: Apache-2.0
 
 import time
-from typing import Dict, Any, Optional, List
+import weakref
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
 
 # --- Global state -----------------------------------------------------------------
-# Per-agent snapshot table keyed by id(agent) → last cumulative counters seen.
-_agent_snapshots: dict[int, Dict[str, Any]] = {}
-
-# Running totals for the current UI session (reset when chat window reloads)
-_session_totals = {
-    'inputTokens': 0,
-    'outputTokens': 0,
-    'totalTokens': 0,
-    'cycles': 0,
-    'latencyMs': 0
-}
-
-def extract_strands_trace_data(agent_response, message_id: str = None, *, agent=None) -> Optional[Dict[str, Any]]:
+# Histogram bucket upper bounds (an implicit +Inf bucket follows each)
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 300000)
+TOKEN_BUCKETS = (500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+CYCLE_BUCKETS = (1, 2, 3, 5, 8, 13, 21)
+TOOL_DURATION_BUCKETS_MS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Sessions with their own metrics; past this the least recently active are folded together
+METRICS_MAX_SESSIONS = int(os.getenv("METRICS_MAX_SESSIONS", "1000"))
+EVICTED_SESSIONS_KEY = "(evicted)"
+
+
+class Histogram:
+    """Fixed-bucket histogram: O(1) observe, cumulative counts like Prometheus."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram") -> None:
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets, running = {}, 0
+        for bound, n in zip(list(self.bounds) + ["+Inf"], self.counts):
+            running += n
+            buckets[str(bound)] = running
+        return {"count": self.count, "sum": round(self.sum, 3), "buckets": buckets}
+
+
+class UsageMetrics:
+    """Counters and histograms for the turns of one session (or all of them)."""
+
+    def __init__(self):
+        self.turns = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.total_tokens = 0
+        self.cycles = 0
+        self.latency_ms = 0
+        self.tool_calls = 0
+        self.last_turn = None
+        self.latency_hist = Histogram(LATENCY_BUCKETS_MS)
+        self.tokens_hist = Histogram(TOKEN_BUCKETS)
+        self.cycles_hist = Histogram(CYCLE_BUCKETS)
+        self.tool_duration_hist: Dict[str, Histogram] = {}
+
+    def record(self, usage: Dict[str, int], cycles: int, latency_ms: float, tool_durations: List[Tuple[str, float]]) -> None:
+        self.turns += 1
+        self.input_tokens += usage.get('inputTokens', 0)
+        self.output_tokens += usage.get('outputTokens', 0)
+        self.total_tokens += usage.get('totalTokens', 0)
+        self.cycles += cycles
+        self.latency_ms += latency_ms
+        self.tool_calls += len(tool_durations)
+        self.last_turn = time.time()
+        self.latency_hist.observe(latency_ms)
+        self.tokens_hist.observe(usage.get('totalTokens', 0))
+        self.cycles_hist.observe(cycles)
+        for tool_name, duration_ms in tool_durations:
+            hist = self.tool_duration_hist.get(tool_name)
+            if hist is None:
+                hist = self.tool_duration_hist[tool_name] = Histogram(TOOL_DURATION_BUCKETS_MS)
+            hist.observe(duration_ms)
+
+    def merge(self, other: "UsageMetrics") -> None:
+        for name in ('turns', 'input_tokens', 'output_tokens', 'total_tokens', 'cycles', 'latency_ms', 'tool_calls'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.last_turn = max(self.last_turn or 0, other.last_turn or 0) or None
+        self.latency_hist.merge(other.latency_hist)
+        self.tokens_hist.merge(other.tokens_hist)
+        self.cycles_hist.merge(other.cycles_hist)
+        for tool_name, hist in other.tool_duration_hist.items():
+            self.tool_duration_hist.setdefault(tool_name, Histogram(TOOL_DURATION_BUCKETS_MS)).merge(hist)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "turns": self.turns,
+            "tokens": {"input": self.input_tokens, "output": self.output_tokens, "total": self.total_tokens},
+            "cycles": self.cycles,
+            "latency_ms": self.latency_ms,
+            "tool_calls": self.tool_calls,
+            "last_turn": self.last_turn,
+            "histograms": {
+                "latency_ms": self.latency_hist.to_dict(),
+                "tokens": self.tokens_hist.to_dict(),
+                "cycles": self.cycles_hist.to_dict(),
+                "tool_duration_ms": {name: hist.to_dict() for name, hist in sorted(self.tool_duration_hist.items())},
+            },
+        }
+
+
+class MetricsStore:
+    """Per-session usage accounting, safe to update from concurrent agent turns.
+
+    Strands reports cumulative counters per agent, so the store keeps the last
+    counters seen for each agent (weakly, so a collected agent's snapshot can
+    never be picked up by a new agent) and turns them into per-turn deltas.
+    Every update is O(1) under one short lock.
+    """
+
+    def __init__(self, max_sessions: int = METRICS_MAX_SESSIONS):
+        self.max_sessions = max(1, max_sessions)
+        self._lock = threading.Lock()
+        self._snapshots: "weakref.WeakKeyDictionary[Any, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+        self._sessions: "OrderedDict[str, UsageMetrics]" = OrderedDict()
+        self._totals = UsageMetrics()
+
+    def usage_delta(self, agent_obj, usage: Dict[str, int], cycles: int, latency_ms: float):
+        """Swap in the agent's new cumulative counters; returns them as deltas plus the previous cycle count."""
+        current = {
+            'inputTokens': usage.get('inputTokens', 0),
+            'outputTokens': usage.get('outputTokens', 0),
+            'totalTokens': usage.get('totalTokens', 0),
+            'cycles': cycles,
+            'latencyMs': latency_ms
+        }
+        with self._lock:
+            try:
+                prev = self._snapshots.get(agent_obj)
+                self._snapshots[agent_obj] = current
+            except TypeError:
+                # Objects that cannot be weakly referenced are treated as fresh every turn
+                prev = None
+        if prev is None:
+            prev = {key: 0 for key in current}
+
+        delta_usage = {
+            key: max(0, current[key] - prev[key]) for key in ('inputTokens', 'outputTokens', 'totalTokens')
+        }
+        return delta_usage, max(0, cycles - prev['cycles']), max(0, latency_ms - prev['latencyMs']), prev['cycles']
+
+    def record_turn(self, session_id: Optional[str], usage: Dict[str, int], cycles: int, latency_ms: float,
+                    tool_durations: List[Tuple[str, float]]) -> None:
+        """Add one turn's usage to its session and to the process totals."""
+        session_id = session_id or "default"
+        with self._lock:
+            metrics = self._sessions.get(session_id)
+            if metrics is None:
+                metrics = self._sessions[session_id] = UsageMetrics()
+                self._fold_old_sessions()
+            self._sessions.move_to_end(session_id)
+            metrics.record(usage, cycles, latency_ms, tool_durations)
+            self._totals.record(usage, cycles, latency_ms, tool_durations)
+
+    def _fold_old_sessions(self) -> None:
+        # Keeps the totals exact while bounding memory; caller holds the lock
+        while len(self._sessions) > self.max_sessions:
+            session_id, metrics = next(iter(self._sessions.items()))
+            if session_id == EVICTED_SESSIONS_KEY:
+                self._sessions.move_to_end(session_id)
+                session_id, metrics = next(iter(self._sessions.items()))
+            del self._sessions[session_id]
+            self._sessions.setdefault(EVICTED_SESSIONS_KEY, UsageMetrics()).merge(metrics)
+
+    def forget_agent(self, agent_obj) -> None:
+        with self._lock:
+            try:
+                self._snapshots.pop(agent_obj, None)
+            except TypeError:
+                pass
+
+    def reset(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+            self._sessions.clear()
+            self._totals = UsageMetrics()
+
+    def snapshot(self, session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Totals and per-session metrics, or one session's (None if it has none)."""
+        with self._lock:
+            if session_id is not None:
+                metrics = self._sessions.get(session_id)
+                return metrics.to_dict() if metrics else None
+            return {
+                "totals": self._totals.to_dict(),
+                "sessions": {sid: metrics.to_dict() for sid, metrics in self._sessions.items()},
+            }
+
+
+_metrics_store = MetricsStore()
+
+
+def _tool_durations(traces: List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+    """(tool name, duration in ms) for every tool call in the given cycle traces."""
+    durations = []
+    for trace in traces:
+        for child in trace.get('children', []):
+            name = child.get('name', '')
+            if 'Tool:' in name and child.get('duration') is not None:
+                tool_name = child.get('metadata', {}).get('tool_name') or name.split('Tool:', 1)[1].strip()
+                durations.append((tool_name, child['duration'] * 1000))
+    return durations
+
+def extract_strands_trace_data(agent_response, message_id: str = None, *, agent=None, session_id: str = None) -> Optional[Dict[str, Any]]:
     """Extract trace data from Strands agent response using get_summary()."""
     
     # Check if it's a Strands AgentResult object with metrics
@@ -103,7 +306,7 @@ def extract_strands_trace_data(agent_response, message_id: str = None, *, agent=
         if not message_id:
             message_id = f"msg_{int(time.time() * 1000000)}"
         
-        per_message_data = calculate_per_message_metrics(summary, agent)
+        per_message_data = calculate_per_message_metrics(summary, agent, session_id=session_id)
         
         # Inject raw metrics summary for downstream debug output
         per_message_data['metrics_summary'] = summary
@@ -115,16 +318,15 @@ def extract_strands_trace_data(agent_response, message_id: str = None, *, agent=
         print(f"❌ Error extracting trace data: {e}")
         return None
 
-def calculate_per_message_metrics(current_summary: Dict[str, Any], agent_obj) -> Dict[str, Any]:
+def calculate_per_message_metrics(current_summary: Dict[str, Any], agent_obj, *, session_id: str = None) -> Dict[str, Any]:
     """Calculate per-message metrics by tracking deltas from previous state.
 
     When the caller does not provide a persistent ``agent_obj`` (``agent_obj is None``)
     we treat the supplied usage numbers as already per-message and skip the snapshot
     bookkeeping that enables cumulative-to-delta conversion for long-lived agents.
+    The turn is recorded in the metrics store under ``session_id``.
     """
     
-    global _agent_snapshots, _session_totals
-    
     # Current cumulative numbers ----
     curr_usage = current_summary.get('accumulated_usage', {})
     curr_cycles = current_summary.get('total_cycles', 0)
@@ -135,55 +337,21 @@ def calculate_per_message_metrics(current_summary: Dict[str, Any], agent_obj) ->
         delta_usage = curr_usage
         delta_cycles = curr_cycles
         delta_latency = curr_latency
+        prev_cycles_index = 0
     else:
-        key = id(agent_obj)
-        prev_snapshot = _agent_snapshots.get(key, None)
-
-        if prev_snapshot is None:
-            # first call on this agent
-            delta_usage = curr_usage
-            delta_cycles = curr_cycles
-            delta_latency = curr_latency
-        else:
-            prev_cycles_val = prev_snapshot['cycles']
-            delta_usage = {
-                'inputTokens': max(0, curr_usage.get('inputTokens', 0) - prev_snapshot['inputTokens']),
-                'outputTokens': max(0, curr_usage.get('outputTokens', 0) - prev_snapshot['outputTokens']),
-                'totalTokens': max(0, curr_usage.get('totalTokens', 0) - prev_snapshot['totalTokens'])
-            }
-            delta_cycles = max(0, curr_cycles - prev_cycles_val)
-            delta_latency = max(0, curr_latency - prev_snapshot['latencyMs'])
-
-        # Save snapshot back only when we have an agent object (persistent path)
-        if agent_obj is not None:
-            _agent_snapshots[key] = {
-                'inputTokens': curr_usage.get('inputTokens', 0),
-                'outputTokens': curr_usage.get('outputTokens', 0),
-                'totalTokens': curr_usage.get('totalTokens', 0),
-                'cycles': curr_cycles,
-                'latencyMs': curr_latency
-            }
-
-    # ---------------- session totals ----------------
-    _session_totals['inputTokens'] += delta_usage.get('inputTokens', 0)
-    _session_totals['outputTokens'] += delta_usage.get('outputTokens', 0)
-    _session_totals['totalTokens'] += delta_usage.get('totalTokens', 0)
-    _session_totals['cycles'] += delta_cycles
-    _session_totals['latencyMs'] += delta_latency
+        delta_usage, delta_cycles, delta_latency, prev_cycles_index = _metrics_store.usage_delta(
+            agent_obj, curr_usage, curr_cycles, curr_latency
+        )
 
     token_delta = delta_usage
     new_cycles = delta_cycles
     latency_delta = delta_latency
     
-    # Determine previous cycle index for slicing traces
-    if agent_obj is None:
-        prev_cycles_index = 0
-    else:
-        prev_cycles_index = prev_snapshot['cycles'] if 'prev_snapshot' in locals() and prev_snapshot else 0
-
     # Get only the new traces (cycles) for this message
     all_traces = current_summary.get('traces', [])
     new_traces = all_traces[prev_cycles_index:curr_cycles] if prev_cycles_index < len(all_traces) else []
+
+    _metrics_store.record_turn(session_id, token_delta, new_cycles, latency_delta, _tool_durations(new_traces))
     
     # Extract message content and tool calls from traces
     message_contents = []
@@ -228,8 +396,6 @@ def calculate_per_message_metrics(current_summary: Dict[str, Any], agent_obj) ->
     # Get tool usage for this message
     tool_usage = current_summary.get('tool_usage', {})
     
-    # Note: no per-agent snapshot update when ``agent_obj`` is None
-    
     return {
         'token_delta': token_delta,
         'new_cycles': new_cycles,
@@ -389,9 +555,7 @@ def convert_to_ui_format(agent_response, per_message_data: Dict[str, Any], messa
 
 def reset_metrics_state():
     """Reset the global metrics state (useful for testing or new sessions)."""
-    global _agent_snapshots, _session_totals
-    _agent_snapshots.clear()
-    _session_totals.clear()
+    _metrics_store.reset()
     print("🔄 Reset metrics state")
 
 def get_trace_data(agent_response, message: str, response_text: str, model_name: str, mode: str = "local", real_tool_calls: list = None) -> Optional[Dict[str, Any]]:
@@ -412,7 +576,7 @@ def get_trace_data(agent_response, message: str, response_text: str, model_name:
         print("❌ No real Strands trace data found")
         return None
 
-def extract_direct_metrics_from_response(agent_response, message_id: str = None) -> Optional[Dict[str, Any]]:
+def extract_direct_metrics_from_response(agent_response, message_id: str = None, session_id: str = None) -> Optional[Dict[str, Any]]:
     """Extract metrics directly from agent response without delta tracking.
     
     This is useful for temporary agents where global delta tracking doesn't work.
@@ -480,6 +644,8 @@ def extract_direct_metrics_from_response(agent_response, message_id: str = None)
                                 'result': tool_result
                             })
         
+        _metrics_store.record_turn(session_id, current_usage, current_cycles, current_latency, _tool_durations(new_traces))
+
         # Build direct metrics (no delta calculation)
         direct_metrics = {
             'token_delta': {
@@ -511,6 +677,109 @@ def extract_direct_metrics_from_response(agent_response, message_id: str = None)
 
 class AgentRequest(BaseModel):
     message: str
+    # Conversation to continue; requests without one share the "default" session
+    session_id: Optional[str] = None
+
+
+DEFAULT_SESSION_ID = "default"
+
+try:
+    # Tools record their output folders under the caller's session
+    from src.tools.run_registry import set_session as set_tool_session
+except Exception:
+    set_tool_session = None
+
+try:
+    # Agents built by src/agent.py manage their own history (see clean_messages)
+    from src.history_manager import HistoryManager
+except Exception:
+    HistoryManager = None
+
+def forget_agent_metrics(session_id: str, agent_obj) -> None:
+    """Drop the usage snapshot of an agent evicted from the pool (its session's totals stay)."""
+    _metrics_store.forget_agent(agent_obj)
+
+
+# === AGENT WORKER POOL ===
+# Agent turns block for as long as the model and tools take (Bedrock, graphviz,
+# MCP), so they run on a bounded thread pool instead of the event loop; /health
+# and the other endpoints keep answering while turns are in progress.
+
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "4"))
+AGENT_QUEUE_MAX = int(os.getenv("AGENT_QUEUE_MAX", "8"))
+AGENT_REQUEST_TIMEOUT = float(os.getenv("AGENT_REQUEST_TIMEOUT", "300"))
+AGENT_RETRY_AFTER_SECONDS = int(os.getenv("AGENT_RETRY_AFTER_SECONDS", "10"))
+# Comment lines sent on an idle /chat/stream so proxies keep the connection open
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+
+
+class AgentExecutor:
+    """Run blocking agent calls on a fixed number of threads with a bounded queue.
+
+    At most ``workers`` calls run at once and ``queue_max`` more wait; beyond
+    that a request is refused with 429 and a Retry-After header rather than
+    piling up.  A call that takes longer than ``timeout`` seconds answers 504
+    (a call still queued is dropped; one already running finishes in the
+    background and keeps its slot until it does).  After ``shutdown`` new
+    calls get 503.
+    """
+
+    def __init__(self, workers: int, queue_max: int, timeout: float):
+        self.workers = max(1, workers)
+        self.queue_max = max(0, queue_max)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="agent")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn, *args) -> "asyncio.Future":
+        """Queue ``fn(*args)`` on a worker and return a future for it, or raise 429/503."""
+        with self._lock:
+            if self._closed:
+                raise HTTPException(status_code=503, detail="Server is shutting down",
+                                    headers={"Retry-After": str(AGENT_RETRY_AFTER_SECONDS)})
+            if self._pending >= self.workers + self.queue_max:
+                raise HTTPException(status_code=429, detail="Agent is busy, try again shortly",
+                                    headers={"Retry-After": str(AGENT_RETRY_AFTER_SECONDS)})
+            self._pending += 1
+
+        # Carry context variables (e.g. the session a tool records its outputs under) into the worker
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, fn, *args)
+        except RuntimeError:
+            self._release(None)
+            raise HTTPException(status_code=503, detail="Server is shutting down")
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    async def run(self, fn, *args):
+        """Run ``fn(*args)`` on a worker and return its result, or raise 429/503/504."""
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail=f"Agent did not respond within {self.timeout:g}s")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = self._pending
+        return {
+            "workers": self.workers,
+            "running": min(pending, self.workers),
+            "queued": max(0, pending - self.workers),
+            "queue_max": self.queue_max,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
 
 
 def load_agent():
@@ -544,7 +813,9 @@ def load_agent():
         raise ImportError(f"No 'agent' object found. Available objects: {available_objects}")
     
     print(f"✅ Successfully loaded agent: {type(agent)}")
-    return agent
+    # Agents built from templates without a pool fall back to the single agent
+    agent_pool = getattr(agent_module, "agent_pool", None)
+    return agent, agent_pool
 
 
 
@@ -567,48 +838,220 @@ def create_app():
     )
     
     
+    agent_executor = AgentExecutor(AGENT_WORKERS, AGENT_QUEUE_MAX, AGENT_REQUEST_TIMEOUT)
+
+    # nosem: useless-inner-function
+    @app.on_event("shutdown")
+    async def shutdown_agent_executor():
+        agent_executor.shutdown()
+
     # Container mode - load agent and create endpoints
     try:
-        agent = load_agent()
+        agent, agent_pool = load_agent()
+        if agent_pool is not None:
+            agent_pool.on_evict = forget_agent_metrics
+        # Without a pool one agent holds every conversation, so its turns never overlap
+        agent_lock = threading.Lock()
+
+        @contextlib.contextmanager
+        def hold_agent(session_id: str):
+            """Hold the session's agent for one turn: turns of one session queue up, sessions run in parallel."""
+            if set_tool_session:
+                set_tool_session(session_id)
+            if agent_pool is None:
+                with agent_lock:
+                    turn_agent = agent
+                    clean_messages(turn_agent)
+                    yield turn_agent
+            else:
+                with agent_pool.session(session_id) as turn_agent:
+                    clean_messages(turn_agent)
+                    yield turn_agent
+
+        def clean_messages(turn_agent) -> None:
+            # Guard: drop any message objects that have an empty content list
+            try:
+                history = getattr(turn_agent, 'conversation_manager', None)
+                if HistoryManager and isinstance(history, HistoryManager):
+                    # Only looks at messages added since its last pass
+                    history.apply_management(turn_agent)
+                elif hasattr(turn_agent, 'messages') and isinstance(turn_agent.messages, list):
+                    turn_agent.messages = [m for m in turn_agent.messages if m.get('content')]
+            except Exception:
+                # Fail-open: never block the request because of cleanup errors
+                pass
+
+        def discard_turn(turn_agent, last_before) -> None:
+            """Remove the messages of an unfinished turn: everything after ``last_before``."""
+            messages = turn_agent.messages
+            start = next(
+                (index + 1 for index in range(len(messages) - 1, -1, -1) if messages[index] is last_before),
+                0,
+            )
+            if start < len(messages):
+                print(f"🧹 Discarded {len(messages) - start} messages of an unfinished turn")
+                del messages[start:]
+
+        def build_turn_body(turn_agent, response, session_id: str) -> Dict[str, Any]:
+            """Response body for a finished turn: the reply and its trace metrics."""
+            # Extract trace data
+            if hasattr(response, '_is_temporary_agent') and response._is_temporary_agent:
+                trace_data = extract_direct_metrics_from_response(response, session_id=session_id)
+            else:
+                trace_data = extract_strands_trace_data(response, agent=turn_agent, session_id=session_id)
+            
+            return {
+                "response": response.message if hasattr(response, 'message') else str(response),
+                "trace": trace_data,
+                "session_id": session_id
+            }
+
+        def run_agent_turn(message: str, session_id: str) -> Dict[str, Any]:
+            """Run one conversation turn (blocking) and build the response body."""
+            with hold_agent(session_id) as turn_agent:
+                # Direct agent call
+                response = turn_agent(message)
+                return build_turn_body(turn_agent, response, session_id)
+
+        def stream_agent_turn(message: str, session_id: str, emit, cancelled: threading.Event) -> None:
+            """Run one turn (blocking), passing its events to ``emit(event, data)`` as they happen.
+
+            Events: ``token`` (model text), ``tool_start``/``tool_end`` and a
+            final ``done`` carrying the same body /chat returns.  A turn that
+            is cancelled (or fails) part-way is removed from the history, so
+            the next turn does not start after a dangling prompt or toolUse.
+            """
+            async def drive(turn_agent):
+                tool_names = {}
+                result = None
+                # The last message before this turn; found by identity, as history management may drop older turns
+                messages = turn_agent.messages
+                last_before = messages[-1] if messages else None
+                events = turn_agent.stream_async(message)
+                try:
+                    async for event in events:
+                        if cancelled.is_set():
+                            break
+                        if "data" in event:
+                            emit("token", {"text": event["data"]})
+                        elif "current_tool_use" in event:
+                            tool_use = event["current_tool_use"] or {}
+                            tool_use_id = tool_use.get("toolUseId")
+                            if tool_use_id and tool_use_id not in tool_names:
+                                tool_names[tool_use_id] = tool_use.get("name")
+                                emit("tool_start", {"tool_use_id": tool_use_id, "name": tool_use.get("name")})
+                        elif "message" in event:
+                            for block in event["message"].get("content", []):
+                                tool_result = block.get("toolResult") if isinstance(block, dict) else None
+                                if tool_result:
+                                    tool_use_id = tool_result.get("toolUseId")
+                                    emit("tool_end", {
+                                        "tool_use_id": tool_use_id,
+                                        "name": tool_names.get(tool_use_id),
+                                        "status": tool_result.get("status"),
+                                    })
+                        elif "result" in event:
+                            result = event["result"]
+                finally:
+                    await events.aclose()
+                    if result is None:
+                        discard_turn(turn_agent, last_before)
+                return result
+
+            with hold_agent(session_id) as turn_agent:
+                # Workers have no event loop of their own, so each streamed turn gets one
+                result = asyncio.run(drive(turn_agent))
+                if result is not None:
+                    emit("done", build_turn_body(turn_agent, result, session_id))
         
         # nosem: useless-inner-function
         @app.post("/chat")
         async def chat_endpoint(request: AgentRequest):
             """Chat with the agent."""
+            message = request.message
+            
+            if not message:
+                raise HTTPException(status_code=400, detail="Message is required")
+            
             try:
-                message = request.message
-                
-                if not message:
-                    raise HTTPException(status_code=400, detail="Message is required")
-                
-                # Guard: drop any message objects that have an empty content list
-                try:
-                    if hasattr(agent, 'messages') and isinstance(agent.messages, list):
-                        agent.messages = [m for m in agent.messages if m.get('content')]
-                except Exception:
-                    # Fail-open: never block the request because of cleanup errors
-                    pass
-                
-                # Direct agent call
-                response = agent(message)
-                
-                # Extract response content
-                response_text = extract_response_text(response)
-                
-                # Extract trace data
-                if hasattr(response, '_is_temporary_agent') and response._is_temporary_agent:
-                    trace_data = extract_direct_metrics_from_response(response)
-                else:
-                    trace_data = extract_strands_trace_data(response, agent=agent)
-                
-                return {
-                    "response": response.message if hasattr(response, 'message') else str(response),
-                    "trace": trace_data
-                }
+                return await agent_executor.run(run_agent_turn, message, request.session_id or DEFAULT_SESSION_ID)
+            except HTTPException:
+                raise
             except Exception as e:
                 import traceback
                 traceback.print_exc()
                 raise HTTPException(status_code=500, detail=str(e))
+
+        # nosem: useless-inner-function
+        @app.post("/chat/stream")
+        async def chat_stream_endpoint(request: AgentRequest):
+            """Chat with the agent, streaming the turn as server-sent events."""
+            message = request.message
+            
+            if not message:
+                raise HTTPException(status_code=400, detail="Message is required")
+            
+            loop = asyncio.get_running_loop()
+            events: asyncio.Queue = asyncio.Queue()
+            cancelled = threading.Event()
+
+            def emit(event: str, data: Dict[str, Any]) -> None:
+                loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+            # Admission happens before the response starts, so a full queue still answers 429
+            turn = agent_executor.submit(
+                stream_agent_turn, message, request.session_id or DEFAULT_SESSION_ID, emit, cancelled
+            )
+            turn.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, None))
+
+            def sse(event: str, data: Dict[str, Any]) -> str:
+                return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+            async def event_stream():
+                deadline = loop.time() + agent_executor.timeout
+                try:
+                    while True:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            cancelled.set()
+                            yield sse("error", {"status": 504, "detail": f"Agent did not finish within {agent_executor.timeout:g}s"})
+                            return
+                        try:
+                            item = await asyncio.wait_for(events.get(), min(STREAM_KEEPALIVE_SECONDS, remaining))
+                        except asyncio.TimeoutError:
+                            yield ": keep-alive\n\n"
+                            continue
+                        if item is None:
+                            break
+                        yield sse(*item)
+
+                    error = turn.exception() if not turn.cancelled() else None
+                    if error is not None:
+                        yield sse("error", {"status": 500, "detail": str(error)})
+                finally:
+                    # Client went away or the turn ended: drop the turn if still queued,
+                    # otherwise stop the agent at its next event
+                    cancelled.set()
+                    if not turn.done():
+                        turn.cancel()
+
+            return StreamingResponse(
+                event_stream(),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        # nosem: useless-inner-function
+        @app.delete("/sessions/{session_id}")
+        async def end_session(session_id: str):
+            """Forget a conversation and free its agent."""
+            if agent_pool is None:
+                raise HTTPException(status_code=404, detail="Sessions are not pooled by this agent")
+            if session_id not in agent_pool:
+                raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+            if not agent_pool.close(session_id):
+                raise HTTPException(status_code=409, detail="Session is in the middle of a turn")
+            return {"session_id": session_id, "closed": True}
                 
     except Exception as e:
         print(f"❌ Failed to load agent: {e}")
@@ -619,6 +1062,7 @@ def create_app():
             raise HTTPException(status_code=500, detail=f"Agent failed to load: {str(e)}")
         
         agent = None
+        agent_pool = None
     
     # nosem: useless-inner-function
     @app.get("/health")
@@ -629,7 +1073,9 @@ def create_app():
                     "status": "healthy", 
                     "mode": "container",
                     "agent_loaded": True,
-                    "agent_type": str(type(agent))
+                    "agent_type": str(type(agent)),
+                    "workers": agent_executor.stats(),
+                    "sessions": agent_pool.stats() if agent_pool is not None else None
                 }
             else:
                 return {
@@ -644,6 +1090,15 @@ def create_app():
                 "error": "Agent variable not defined"
             }
     
+    # nosem: useless-inner-function
+    @app.get("/metrics")
+    async def usage_metrics(session_id: Optional[str] = None):
+        """Token, latency, cycle and tool-duration totals and histograms, overall and per session."""
+        metrics = _metrics_store.snapshot(session_id)
+        if metrics is None:
+            raise HTTPException(status_code=404, detail=f"No metrics for session: {session_id}")
+        return metrics
+    
     # nosem: useless-inner-function
     @app.get("/info")
     async def agent_info():
@@ -737,7 +1192,10 @@ def create_app():
             "version": "1.0.0",
             "endpoints": {
                 "chat": "POST /chat",
+                "chat_stream": "POST /chat/stream",
+                "end_session": "DELETE /sessions/{session_id}",
                 "health": "GET /health", 
+                "metrics": "GET /metrics",
                 "info": "GET /info",
                 "config": "GET /config"
             }
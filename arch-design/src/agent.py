@@ -25,7 +25,7 @@
 #   2. For custom tools: Add .py files to src/tools/ - they're auto-discovered.
 # ---------------------------------------------------------------------------
 
-import os, importlib, yaml
+import os, importlib, threading, yaml
 from pathlib import Path
 
 from strands import Agent
@@ -47,6 +47,12 @@ from src.mcp_tools import get_mcp_tools_sync
 # Custom tools (auto-discovered from src/tools/)
 from src.tools import get_tools
 
+# One agent per conversation for servers handling several users
+from src.agent_pool import AgentPool
+
+# Keeps each conversation's history within a token budget
+from src.history_manager import HistoryManager
+
 # Enable OpenTelemetry tracing for development (console only)
 os.environ["STRANDS_OTEL_ENABLE_CONSOLE_EXPORT"] = "true"
 
@@ -111,11 +117,28 @@ def load_model(cfg: dict):
     return ModelCls(**kwargs)
 
 
-def create_agent():
-    """Factory that wires model + tools + system prompt into one Agent."""
-    cfg = load_config()
-    model = load_model(cfg)
-    
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def load_shared():
+    """Load the config, model and tools once per process.
+
+    Every agent reuses them: the model client and its connection pool, the
+    discovered tools and the MCP connections are built a single time, so a
+    new agent only brings its own message history.
+    """
+    global _shared
+
+    with _shared_lock:
+        if _shared is None:
+            cfg = load_config()
+            _shared = (cfg, load_model(cfg), load_tools(cfg))
+    return _shared
+
+
+def load_tools(cfg: dict):
+    """Collect the agent's tools (MCP servers are connected here)."""
     # Configure your tools here
     tools = []
     
@@ -132,12 +155,27 @@ def create_agent():
     # Add custom tools from src/tools/ (auto-discovered)
     tools.extend(get_tools())
     
+    return tools
+
+
+def create_agent():
+    """Factory that wires model + tools + system prompt into one Agent."""
+    cfg, model, tools = load_shared()
+    
     return Agent(
         model=model,
-        tools=tools,
-        system_prompt=cfg.get("system_prompt", "You are a helpful AI assistant.")
+        tools=list(tools),
+        system_prompt=cfg.get("system_prompt", "You are a helpful AI assistant."),
+        conversation_manager=HistoryManager(**cfg.get("history", {}))
     )
 
 
-# Initialize the singleton agent
-agent = create_agent() 
\ No newline at end of file
+# Initialize the singleton agent (used by single-user tooling such as `agent dev`)
+agent = create_agent()
+
+# Per-session agents for the container server (see container_entrypoint.py)
+agent_pool = AgentPool(
+    create_agent,
+    max_sessions=int(os.getenv("AGENT_MAX_SESSIONS", "64")),
+    idle_seconds=float(os.getenv("AGENT_SESSION_IDLE_SECONDS", "1800")),
+)
@@ -0,0 +1,124 @@
+"""
+Session-keyed pool of agents.
+
+A Strands ``Agent`` holds one conversation in ``agent.messages`` and must not
+run two turns at once, so sharing a single agent between users interleaves
+their histories and serializes every request.  ``AgentPool`` keeps one agent
+per session instead.  The factory passed in is expected to reuse the heavy
+parts (model client, tools, MCP connections) so a new session only costs a
+new message history.
+
+Sessions idle for longer than ``idle_seconds`` are evicted, and when more
+than ``max_sessions`` are open the least recently used idle ones go first.
+A session in the middle of a turn is never evicted.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    __slots__ = ("agent", "lock", "last_used", "users")
+
+    def __init__(self):
+        self.agent = None
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        # Turns holding or waiting for the session (changed under the pool lock)
+        self.users = 0
+
+
+class AgentPool:
+    """One agent per session, created on demand and evicted when idle or over the cap."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        max_sessions: int = 64,
+        idle_seconds: float = 1800,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+    ):
+        self.factory = factory
+        self.max_sessions = max(1, max_sessions)
+        self.idle_seconds = idle_seconds
+        self.on_evict = on_evict
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[Any]:
+        """Hold the agent for ``session_id`` for one turn, creating it if needed.
+
+        Turns in the same session wait for each other; different sessions run
+        in parallel.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = _Session()
+                self._sessions[session_id] = entry
+            self._sessions.move_to_end(session_id)
+            entry.users += 1
+
+        try:
+            with entry.lock:
+                if entry.agent is None:
+                    # Built outside the pool lock: other sessions are not held up
+                    entry.agent = self.factory()
+                    logger.info(f"Created agent for session {session_id} ({len(self._sessions)} open)")
+                yield entry.agent
+        finally:
+            with self._lock:
+                entry.users -= 1
+                entry.last_used = time.monotonic()
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop idle sessions and, over the cap, the least recently used ones; returns how many."""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            # Oldest first; sessions mid-turn are skipped
+            for session_id, entry in list(self._sessions.items()):
+                over_cap = len(self._sessions) > self.max_sessions
+                idle = self.idle_seconds > 0 and now - entry.last_used > self.idle_seconds
+                if not (over_cap or idle):
+                    break
+                if entry.users:
+                    continue
+                del self._sessions[session_id]
+                evicted.append((session_id, entry.agent))
+
+        for session_id, agent in evicted:
+            logger.info(f"Evicted agent for session {session_id}")
+            if self.on_evict and agent is not None:
+                self.on_evict(session_id, agent)
+        return len(evicted)
+
+    def close(self, session_id: str) -> bool:
+        """End a session now (unless it is mid-turn); returns whether it was dropped."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry.users:
+                return False
+            del self._sessions[session_id]
+        if self.on_evict and entry.agent is not None:
+            self.on_evict(session_id, entry.agent)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            busy = sum(1 for entry in self._sessions.values() if entry.users)
+            return {"sessions": len(self._sessions), "busy": busy, "max_sessions": self.max_sessions}
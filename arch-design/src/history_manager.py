@@ -0,0 +1,170 @@
+"""
+Bounded conversation history for long agent sessions.
+
+Left alone, ``agent.messages`` grows with every turn, and tool results
+(YAML previews, tfstate summaries, documentation pages) are re-sent to the
+model on every later request.  ``HistoryManager`` is a Strands conversation
+manager that, after each turn:
+
+1. drops messages with empty content (which the model API rejects),
+2. keeps the last ``keep_turns`` turns verbatim,
+3. trims tool results in older turns to ``tool_result_chars`` characters,
+4. drops the oldest turns while the history is over ``max_tokens``.
+
+A turn is a user prompt and everything the agent did to answer it, so tool
+uses and their results are always kept or dropped together.  Token counts
+are estimated at ~4 characters per token and cached per message; a pass only
+looks at messages added since the previous one, so the cost does not grow
+with the length of the conversation.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from strands.agent.conversation_manager import ConversationManager
+from strands.types.exceptions import ContextWindowOverflowException
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+
+def _is_prompt(message: Dict[str, Any]) -> bool:
+    """A user message with text, as opposed to one carrying tool results."""
+    if message.get("role") != "user":
+        return False
+    return not any("toolResult" in block for block in message.get("content") or [])
+
+
+def _estimate_tokens(message: Dict[str, Any]) -> int:
+    return len(json.dumps(message.get("content"), default=str)) // CHARS_PER_TOKEN + 1
+
+
+TRIMMED_NOTE = "characters trimmed from an earlier tool result ...]"
+
+
+def _trim_text(text: str, limit: int) -> str:
+    if len(text) <= limit or text.endswith(TRIMMED_NOTE):
+        return text
+    return f"{text[:limit]}\n[... {len(text) - limit} {TRIMMED_NOTE}"
+
+
+class HistoryManager(ConversationManager):
+    """Keeps recent turns verbatim, trims old tool results and enforces a token budget."""
+
+    def __init__(self, keep_turns: int = 6, max_tokens: int = 60000, tool_result_chars: int = 1500):
+        super().__init__()
+        self.keep_turns = max(1, keep_turns)
+        self.max_tokens = max_tokens
+        self.tool_result_chars = tool_result_chars
+
+        # Bookkeeping for the list last seen; a different list starts over
+        self._messages: Optional[List[Dict[str, Any]]] = None
+        self._tokens: List[int] = []  # estimate per message, same order
+        self._total = 0
+        self._prompts: List[int] = []  # indexes of turn-starting messages
+        self._trimmed = 0  # messages before this index have had tool results trimmed
+
+    # ---------------------------------------------------------------------------
+    # ConversationManager interface
+    # ---------------------------------------------------------------------------
+
+    def apply_management(self, agent: Any, **kwargs: Any) -> None:
+        """Bring ``agent.messages`` within bounds; only new messages are examined."""
+        messages = agent.messages
+        self._sync(messages)
+        self._trim_old_tool_results(messages)
+        while self.max_tokens > 0 and self._total > self.max_tokens and len(self._prompts) > self.keep_turns:
+            self._drop_oldest_turn(messages)
+
+    def reduce_context(self, agent: Any, e: Optional[Exception] = None, **kwargs: Any) -> None:
+        """The model rejected the history as too long: drop the oldest turn, or trim everything."""
+        messages = agent.messages
+        self._sync(messages)
+        if len(self._prompts) > 1:
+            self._drop_oldest_turn(messages)
+            return
+
+        # A single turn left: its own tool results are what overflowed
+        before = self._total
+        self._trimmed = 0
+        self._trim_tool_results(messages, 0, len(messages))
+        if self._total >= before:
+            raise ContextWindowOverflowException("History cannot be reduced any further") from e
+
+    # ---------------------------------------------------------------------------
+    # Bookkeeping
+    # ---------------------------------------------------------------------------
+
+    def _reset(self, messages: List[Dict[str, Any]]) -> None:
+        self._messages = messages
+        self._tokens = []
+        self._total = 0
+        self._prompts = []
+        self._trimmed = 0
+
+    def _sync(self, messages: List[Dict[str, Any]]) -> None:
+        """Account for messages appended since the last pass, dropping empty ones."""
+        if messages is not self._messages or len(messages) < len(self._tokens):
+            self._reset(messages)
+
+        start = len(self._tokens)
+        if any(not message.get("content") for message in messages[start:]):
+            messages[start:] = [message for message in messages[start:] if message.get("content")]
+
+        for index in range(start, len(messages)):
+            tokens = _estimate_tokens(messages[index])
+            self._tokens.append(tokens)
+            self._total += tokens
+            if _is_prompt(messages[index]):
+                self._prompts.append(index)
+
+    # ---------------------------------------------------------------------------
+    # Compaction
+    # ---------------------------------------------------------------------------
+
+    def _trim_old_tool_results(self, messages: List[Dict[str, Any]]) -> None:
+        """Trim tool results in turns older than the verbatim window (once per message)."""
+        if len(self._prompts) <= self.keep_turns or self.tool_result_chars <= 0:
+            return
+        window_start = self._prompts[-self.keep_turns]
+        if self._trimmed < window_start:
+            self._trim_tool_results(messages, self._trimmed, window_start)
+            self._trimmed = window_start
+
+    def _trim_tool_results(self, messages: List[Dict[str, Any]], start: int, end: int) -> None:
+        for index in range(start, end):
+            changed = False
+            for block in messages[index].get("content") or []:
+                tool_result = block.get("toolResult")
+                if not tool_result:
+                    continue
+                for part in tool_result.get("content") or []:
+                    if "text" in part:
+                        text = _trim_text(part["text"], self.tool_result_chars)
+                        if text is not part["text"]:
+                            part["text"] = text
+                            changed = True
+                    elif "json" in part:
+                        text = json.dumps(part["json"], default=str)
+                        if len(text) > self.tool_result_chars:
+                            part.pop("json")
+                            part["text"] = _trim_text(text, self.tool_result_chars)
+                            changed = True
+            if changed:
+                tokens = _estimate_tokens(messages[index])
+                self._total += tokens - self._tokens[index]
+                self._tokens[index] = tokens
+
+    def _drop_oldest_turn(self, messages: List[Dict[str, Any]]) -> None:
+        """Remove everything before the second turn (including any orphaned leading messages)."""
+        count = self._prompts[1]
+        del messages[:count]
+        dropped = sum(self._tokens[:count])
+        del self._tokens[:count]
+        self._total -= dropped
+        self._prompts = [index - count for index in self._prompts[1:]]
+        self._trimmed = max(0, self._trimmed - count)
+        self.removed_message_count += count
+        logger.debug(f"Dropped {count} messages (~{dropped} tokens) from the conversation history")
@@ -0,0 +1,100 @@
+"""
+Architecture text to rendered diagram in one tool call.
+
+convert_architecture_to_yaml followed by generate_diagram_from_yaml makes the
+model carry the whole YAML document from one call to the next, and the
+diagram is dumped and re-parsed on the way.  ``architecture_to_diagram``
+keeps the diagram as a dict from detection through relationships,
+validation and rendering, and writes the YAML and PNG once, at the end.
+Only a short summary goes back to the model.
+"""
+
+import logging
+from pathlib import Path
+
+from strands import tool
+
+from .architecture_to_yaml import (
+    build_architecture_diagram,
+    default_output_folder,
+    relationship_method_label,
+    write_diagram_yaml,
+)
+from .run_registry import record_run
+from .yaml_to_diagram import generate_simple_diagram, get_folder_contents, validate_diagram
+
+logger = logging.getLogger(__name__)
+
+
+@tool
+def architecture_to_diagram(
+    architecture_design: str,
+    diagram_name: str = "AWS Architecture",
+    output_folder: str = None,
+    additional_categories: str = None,
+    use_llm: str = "true",
+) -> str:
+    """
+    Convert an AWS architecture design to a diagrams-as-code YAML file and a PNG diagram in one step.
+
+    Prefer this over convert_architecture_to_yaml + generate_diagram_from_yaml:
+    the diagram never passes through the conversation, so the YAML does not
+    have to be copied between tool calls.  Components and relationships are
+    derived exactly as in convert_architecture_to_yaml, the result is
+    validated, and the PNG and YAML are saved to the output folder.
+
+    Args:
+        architecture_design: The complete architecture design text output from aws_architecture_designer
+        diagram_name: The name for the diagram (default: "AWS Architecture")
+        output_folder: Optional folder name. If not provided, uses sanitized diagram name with timestamp
+        additional_categories: Optional comma-separated list of additional categories to include
+        use_llm: "true" to use LLM for relationship inference (default), "false" for deterministic
+
+    Returns:
+        Status message with the YAML and PNG paths and component/relationship counts
+    """
+    yaml_structure, relationship_method = build_architecture_diagram(
+        architecture_design, diagram_name, additional_categories, use_llm
+    )
+
+    errors, warnings = validate_diagram(yaml_structure)
+    if errors:
+        error_list = "\n".join(f"  • {error}" for error in errors)
+        return f"❌ Error: Generated diagram failed validation:\n{error_list}"
+
+    resources = yaml_structure["diagram"]["resources"]
+    relationship_count = sum(len(resource.get("relates", [])) for resource in resources)
+    rel_label = relationship_method_label(relationship_method)
+
+    output_folder = output_folder or default_output_folder(diagram_name)
+    output_dir = Path(output_folder)
+    created = not output_dir.exists()
+    output_dir.mkdir(exist_ok=True)
+
+    png_path = output_dir / f"{diagram_name.replace(' ', '_').lower()}.png"
+    render_result = generate_simple_diagram(yaml_structure, str(png_path))
+    yaml_path, _ = write_diagram_yaml(yaml_structure, output_folder, "architecture_to_diagram", created)
+
+    if "successfully" not in render_result.lower():
+        logger.warning(f"Diagram render failed for {diagram_name}; YAML saved to {yaml_path}")
+        return f"""{render_result}
+
+📄 **YAML File**: {yaml_path}
+Fix the issue above and render again with generate_diagram_from_yaml (output_folder="{output_folder}")."""
+
+    record_run(output_dir, "architecture_to_diagram", diagram_name, [png_path], created=created)
+
+    warning_text = ""
+    if warnings:
+        warning_text = "\n⚠️ **Warnings:**\n" + "\n".join(f"  • {warning}" for warning in warnings) + "\n"
+
+    return f"""✅ Architecture Diagram Generated Successfully!
+
+📁 **Output Folder**: {output_folder}/
+📄 **YAML File**: {yaml_path}
+🖼️ **PNG File**: {png_path}
+📊 **Components**: {len(resources)} AWS services detected
+🔗 **Relationships**: {relationship_count} connections generated ({rel_label})
+{warning_text}
+📂 **Folder Contents:**
+{get_folder_contents(output_dir)}"""
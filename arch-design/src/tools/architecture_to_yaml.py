@@ -4,9 +4,14 @@ import json
 import re
 import os
 import logging
-import boto3
 from datetime import datetime
+from bisect import bisect_left
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from .aws_clients import stream_bedrock_array
+from .json_stream import IncompleteJsonError
+from .run_registry import record_run
 from .diagrams_as_code_reference import (
     DIAGRAMS_AS_CODE_EXAMPLES,
     AWS_SERVICE_TYPES,
@@ -20,77 +25,26 @@ logger = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------------
-# LLM helper — calls Bedrock directly using config from .agent.yaml
+# LLM helpers — Bedrock calls go through aws_clients
 # ---------------------------------------------------------------------------
 
-def _load_bedrock_config() -> dict:
-    """Load Bedrock model config from .agent.yaml so we reuse the same model."""
-    defaults = {
-        "model_id": "us.anthropic.claude-3-7-sonnet-20250219-v1:0",
-        "region_name": "us-west-2",
-    }
-    try:
-        cfg_path = Path(__file__).parent.parent.parent / ".agent.yaml"
-        if cfg_path.exists():
-            cfg = yaml.safe_load(cfg_path.read_text())
-            kwargs = cfg.get("provider", {}).get("kwargs", {})
-            return {
-                "model_id": kwargs.get("model_id", defaults["model_id"]),
-                "region_name": kwargs.get("region_name", defaults["region_name"]),
-            }
-    except Exception:
-        pass
-    return defaults
-
-
-def _call_bedrock(prompt: str, max_tokens: int = 4096) -> str:
-    """Make a direct boto3 call to Bedrock for structured inference."""
-    cfg = _load_bedrock_config()
-    client = boto3.client("bedrock-runtime", region_name=cfg["region_name"])
-
-    response = client.invoke_model(
-        modelId=cfg["model_id"],
-        contentType="application/json",
-        accept="application/json",
-        body=json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": max_tokens,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.2,
-        }),
-    )
-    result = json.loads(response["body"].read())
-    return result["content"][0]["text"]
-
-
-def _parse_json_from_llm(text: str):
-    """Extract a JSON array from LLM output, handling markdown fences."""
-    text = text.strip()
-    if "```" in text:
-        parts = text.split("```")
-        for part in parts:
-            cleaned = part.strip()
-            if cleaned.startswith("json"):
-                cleaned = cleaned[4:].strip()
-            if cleaned.startswith("["):
-                try:
-                    return json.loads(cleaned)
-                except json.JSONDecodeError:
-                    continue
-    if text.startswith("["):
-        return json.loads(text)
-    start = text.find("[")
-    end = text.rfind("]")
-    if start != -1 and end != -1:
-        return json.loads(text[start : end + 1])
-    raise ValueError("No JSON array found in LLM response")
+RELATIONSHIP_METHOD_LABELS = {
+    "llm": "LLM-derived (dynamic)",
+    "llm-partial": "LLM-derived (partial: the response was truncated)",
+}
 
 
-def _llm_derive_relationships(components: list, architecture_text: str) -> list | None:
+def relationship_method_label(relationship_method: str) -> str:
+    """Describe a relationship_method returned by build_architecture_diagram."""
+    return RELATIONSHIP_METHOD_LABELS.get(relationship_method, "deterministic (heuristic)")
+
+
+def _llm_derive_relationships(components: list, architecture_text: str) -> Tuple[list, bool] | None:
     """Use LLM to dynamically derive relationships between AWS components.
 
-    Returns a list of dicts with from_id, to_id, label, direction — or None if
-    the call fails (signals fallback to deterministic inference).
+    Returns a list of dicts with from_id, to_id, label, direction and whether
+    the response was truncated (the edges before the cut are kept) — or None
+    if the call fails (signals fallback to deterministic inference).
     """
     services_desc = "\n".join(
         f"  - id: {c['id']},  name: {c['name']},  type: {c['type']},  desc: {c.get('description', '')}"
@@ -121,28 +75,356 @@ Return ONLY a JSON array — no markdown, no explanation. Each element:
 JSON array:"""
 
     try:
-        raw = _call_bedrock(prompt)
-        relationships = _parse_json_from_llm(raw)
-
         component_ids = {c["id"] for c in components}
         valid = []
-        for rel in relationships:
-            fid = rel.get("from_id", "")
-            tid = rel.get("to_id", "")
-            if fid in component_ids and tid in component_ids and fid != tid:
-                valid.append({
-                    "from_id": fid,
-                    "to_id": tid,
-                    "label": rel.get("label", "Data Flow"),
-                    "direction": rel.get("direction", "outgoing"),
-                })
-        logger.info(f"LLM derived {len(valid)} relationships from {len(relationships)} returned")
-        return valid if valid else None
+        returned = 0
+        partial = False
+        # Edges are validated as the streamed JSON array arrives
+        try:
+            for rel in stream_bedrock_array(prompt):
+                returned += 1
+                if not isinstance(rel, dict):
+                    continue
+                fid = rel.get("from_id", "")
+                tid = rel.get("to_id", "")
+                if fid in component_ids and tid in component_ids and fid != tid:
+                    valid.append({
+                        "from_id": fid,
+                        "to_id": tid,
+                        "label": rel.get("label", "Data Flow"),
+                        "direction": rel.get("direction", "outgoing"),
+                    })
+        except IncompleteJsonError as e:
+            if not valid:
+                raise
+            partial = True
+            logger.warning(f"LLM response ended early ({e}), keeping the {len(valid)} relationships received")
+        logger.info(f"LLM derived {len(valid)} relationships from {returned} returned")
+        return (valid, partial) if valid else None
     except Exception as e:
         logger.warning(f"LLM relationship inference failed, falling back to deterministic: {e}")
         return None
 
 
+# ---------------------------------------------------------------------------
+# Service detection
+# ---------------------------------------------------------------------------
+
+# Common AWS service patterns to look for - Updated to match schema
+SERVICE_PATTERNS = {
+    # Network Services
+    r'cloudfront|cdn': {'type': 'aws.network.CloudFront', 'name': 'CloudFront', 'category': 'network', 'description': 'Content Delivery Network'},
+    r'route\s*53|dns': {'type': 'aws.network.Route53', 'name': 'Route 53', 'category': 'network', 'description': 'DNS Management'},
+    r'application\s*load\s*balancer|alb': {'type': 'aws.network.ElbApplicationLoadBalancer', 'name': 'Application Load Balancer', 'category': 'network', 'description': 'Load Balancing'},
+    r'network\s*load\s*balancer|nlb': {'type': 'aws.network.ElbNetworkLoadBalancer', 'name': 'Network Load Balancer', 'category': 'network', 'description': 'Load Balancing'},
+    r'classic\s*load\s*balancer|elb': {'type': 'aws.network.ELB', 'name': 'Classic Load Balancer', 'category': 'network', 'description': 'Load Balancing'},
+    r'api\s*gateway': {'type': 'aws.network.APIGateway', 'name': 'API Gateway', 'category': 'network', 'description': 'API Management'},
+    r'vpc': {'type': 'aws.network.VPC', 'name': 'VPC', 'category': 'network', 'description': 'Virtual Private Cloud'},
+    r'nat\s*gateway': {'type': 'aws.network.NATGateway', 'name': 'NAT Gateway', 'category': 'network', 'description': 'Network Address Translation'},
+    r'internet\s*gateway': {'type': 'aws.network.InternetGateway', 'name': 'Internet Gateway', 'category': 'network', 'description': 'Internet Access'},
+    r'privatelink': {'type': 'aws.network.Privatelink', 'name': 'PrivateLink', 'category': 'network', 'description': 'Private Connectivity'},
+    r'transit\s*gateway': {'type': 'aws.network.TransitGateway', 'name': 'Transit Gateway', 'category': 'network', 'description': 'Network Transit Hub'},
+    r'direct\s*connect': {'type': 'aws.network.DirectConnect', 'name': 'Direct Connect', 'category': 'network', 'description': 'Dedicated Network Connection'},
+
+    # Security Services
+    r'waf': {'type': 'aws.security.WAF', 'name': 'AWS WAF', 'category': 'security', 'description': 'Web Application Firewall'},
+    r'shield': {'type': 'aws.security.Shield', 'name': 'AWS Shield', 'category': 'security', 'description': 'DDoS Protection'},
+    r'cognito': {'type': 'aws.security.Cognito', 'name': 'Amazon Cognito', 'category': 'security', 'description': 'User Authentication'},
+    r'certificate\s*manager|acm': {'type': 'aws.security.CertificateManager', 'name': 'Certificate Manager', 'category': 'security', 'description': 'SSL/TLS Certificates'},
+    r'kms': {'type': 'aws.security.KMS', 'name': 'AWS KMS', 'category': 'security', 'description': 'Key Management'},
+    r'secrets\s*manager': {'type': 'aws.security.SecretsManager', 'name': 'Secrets Manager', 'category': 'security', 'description': 'Secrets Management'},
+    r'iam': {'type': 'aws.security.IAM', 'name': 'AWS IAM', 'category': 'security', 'description': 'Identity and Access Management'},
+    r'guardduty': {'type': 'aws.security.Guardduty', 'name': 'GuardDuty', 'category': 'security', 'description': 'Threat Detection'},
+
+    # Compute Services
+    r'ec2': {'type': 'aws.compute.EC2', 'name': 'EC2', 'category': 'compute', 'description': 'Virtual Servers'},
+    r'ecs': {'type': 'aws.compute.ECS', 'name': 'ECS', 'category': 'compute', 'description': 'Container Orchestration'},
+    r'fargate': {'type': 'aws.compute.Fargate', 'name': 'Fargate', 'category': 'compute', 'description': 'Serverless Containers'},
+    r'lambda': {'type': 'aws.compute.Lambda', 'name': 'Lambda', 'category': 'compute', 'description': 'Serverless Functions'},
+    r'eks': {'type': 'aws.compute.EKS', 'name': 'EKS', 'category': 'compute', 'description': 'Managed Kubernetes'},
+    r'elastic\s*beanstalk': {'type': 'aws.compute.ElasticBeanstalk', 'name': 'Elastic Beanstalk', 'category': 'compute', 'description': 'Application Platform'},
+    r'app\s*runner': {'type': 'aws.compute.AppRunner', 'name': 'App Runner', 'category': 'compute', 'description': 'Container-based Applications'},
+
+    # Database Services
+    r'dynamodb': {'type': 'aws.database.Dynamodb', 'name': 'DynamoDB', 'category': 'database', 'description': 'NoSQL Database'},
+    r'rds': {'type': 'aws.database.RDS', 'name': 'RDS', 'category': 'database', 'description': 'Relational Database'},
+    r'elasticache': {'type': 'aws.database.ElastiCache', 'name': 'ElastiCache', 'category': 'database', 'description': 'In-Memory Cache'},
+    r'dax': {'type': 'aws.database.DAX', 'name': 'DAX', 'category': 'database', 'description': 'DynamoDB Accelerator'},
+    r'redshift': {'type': 'aws.database.Redshift', 'name': 'Redshift', 'category': 'database', 'description': 'Data Warehouse'},
+    r'aurora': {'type': 'aws.database.Aurora', 'name': 'Aurora', 'category': 'database', 'description': 'High-Performance Database'},
+    r'documentdb': {'type': 'aws.database.DocumentDB', 'name': 'DocumentDB', 'category': 'database', 'description': 'MongoDB-compatible Database'},
+    r'neptune': {'type': 'aws.database.Neptune', 'name': 'Neptune', 'category': 'database', 'description': 'Graph Database'},
+
+    # Storage Services
+    r's3': {'type': 'aws.storage.S3', 'name': 'S3', 'category': 'storage', 'description': 'Object Storage'},
+    r'ebs': {'type': 'aws.storage.EBS', 'name': 'EBS', 'category': 'storage', 'description': 'Block Storage'},
+    r'efs': {'type': 'aws.storage.EFS', 'name': 'EFS', 'category': 'storage', 'description': 'File Storage'},
+    r'fsx': {'type': 'aws.storage.FSx', 'name': 'FSx', 'category': 'storage', 'description': 'High-Performance File Systems'},
+    r'backup': {'type': 'aws.storage.Backup', 'name': 'AWS Backup', 'category': 'storage', 'description': 'Backup Service'},
+
+    # Container Services
+    r'ecr': {'type': 'aws.compute.ECR', 'name': 'ECR', 'category': 'devops', 'description': 'Container Registry'},
+
+    # Integration Services
+    r'sqs': {'type': 'aws.integration.SQS', 'name': 'SQS', 'category': 'integration', 'description': 'Message Queue'},
+    r'sns': {'type': 'aws.integration.SNS', 'name': 'SNS', 'category': 'integration', 'description': 'Pub/Sub Messaging'},
+    r'eventbridge': {'type': 'aws.integration.Eventbridge', 'name': 'EventBridge', 'category': 'integration', 'description': 'Event Bus'},
+    r'step\s*functions': {'type': 'aws.integration.StepFunctions', 'name': 'Step Functions', 'category': 'integration', 'description': 'Workflow Orchestration'},
+    r'mq': {'type': 'aws.integration.MQ', 'name': 'Amazon MQ', 'category': 'integration', 'description': 'Message Broker'},
+    r'appsync': {'type': 'aws.integration.Appsync', 'name': 'AppSync', 'category': 'integration', 'description': 'GraphQL API'},
+
+    # Analytics Services
+    r'kinesis': {'type': 'aws.analytics.Kinesis', 'name': 'Kinesis', 'category': 'integration', 'description': 'Data Streaming'},
+    r'kinesis\s*data\s*streams': {'type': 'aws.analytics.KinesisDataStreams', 'name': 'Kinesis Data Streams', 'category': 'integration', 'description': 'Real-time Data Streaming'},
+    r'kinesis\s*data\s*firehose': {'type': 'aws.analytics.KinesisDataFirehose', 'name': 'Kinesis Data Firehose', 'category': 'integration', 'description': 'Data Delivery'},
+    r'emr': {'type': 'aws.analytics.EMR', 'name': 'EMR', 'category': 'integration', 'description': 'Big Data Processing'},
+    r'glue': {'type': 'aws.analytics.Glue', 'name': 'AWS Glue', 'category': 'integration', 'description': 'Data Integration'},
+    r'athena': {'type': 'aws.analytics.Athena', 'name': 'Athena', 'category': 'integration', 'description': 'Query Service'},
+    r'quicksight': {'type': 'aws.analytics.Quicksight', 'name': 'QuickSight', 'category': 'integration', 'description': 'Business Intelligence'},
+    r'elasticsearch': {'type': 'aws.analytics.ElasticsearchService', 'name': 'Elasticsearch', 'category': 'integration', 'description': 'Search and Analytics'},
+
+    # Cost Management
+    r'cost\s*explorer': {'type': 'aws.cost.CostExplorer', 'name': 'Cost Explorer', 'category': 'monitoring', 'description': 'Cost Analysis'},
+    r'budgets': {'type': 'aws.cost.Budgets', 'name': 'Budgets', 'category': 'monitoring', 'description': 'Cost Management'},
+
+    # Generic/Client Services
+    r'internet': {'type': 'generic.network.Internet', 'name': 'Internet', 'category': 'users', 'description': 'Public Internet'},
+    r'users?': {'type': 'aws.general.Users', 'name': 'Users', 'category': 'users', 'description': 'End Users'},
+    r'clients?': {'type': 'aws.general.Client', 'name': 'Client', 'category': 'users', 'description': 'Client Applications'},
+    r'mobile': {'type': 'aws.general.MobileClient', 'name': 'Mobile Client', 'category': 'users', 'description': 'Mobile Applications'},
+}
+
+# Services only detected when their category is requested via additional_categories
+OPTIONAL_SERVICE_PATTERNS = {
+    'ci-cd': {
+        r'codecommit': {'type': 'aws.devtools.Codecommit', 'name': 'CodeCommit', 'category': 'ci-cd', 'description': 'Source Control'},
+        r'codebuild': {'type': 'aws.devtools.Codebuild', 'name': 'CodeBuild', 'category': 'ci-cd', 'description': 'Build Service'},
+        r'codepipeline': {'type': 'aws.devtools.Codepipeline', 'name': 'CodePipeline', 'category': 'ci-cd', 'description': 'CI/CD Pipeline'},
+        r'codedeploy': {'type': 'aws.devtools.Codedeploy', 'name': 'CodeDeploy', 'category': 'ci-cd', 'description': 'Deployment Service'},
+        r'ecr': {'type': 'aws.compute.ECR', 'name': 'ECR', 'category': 'ci-cd', 'description': 'Container Registry'},
+    },
+}
+
+
+class ServiceMention(NamedTuple):
+    """One match of a SERVICE_PATTERNS key in the lowercased architecture text."""
+    start: int
+    end: int
+    pattern: str
+
+
+class ServiceDetector:
+    """Find every mention of the known services in a single scan of the text.
+
+    The alternatives of all patterns are combined into one regex, factored by
+    first character so that ``search`` can skip ahead with a character-set
+    check and tries only a few branches where a mention may start.  At each
+    hit, the patterns sharing its first two characters are matched to tell
+    which services start there, so overlapping mentions ("kinesis" inside
+    "kinesis data streams") are all reported, with their offsets.
+    """
+
+    def __init__(self, patterns: Dict[str, dict]):
+        self.patterns = patterns
+
+        by_first_char: Dict[str, List[str]] = {}
+        # Candidate patterns by the first two characters of a mention
+        self._candidates: Dict[str, List[Tuple[str, re.Pattern]]] = {}
+        for key in patterns:
+            compiled = re.compile(key)
+            for alternative in key.split("|"):
+                by_first_char.setdefault(alternative[0], []).append(alternative[1:])
+                prefix = _literal_prefix(alternative)
+                starts = [prefix[:2]] if len(prefix) >= 2 else [alternative[0] + ch for ch in _MENTION_CHARS]
+                for start in starts:
+                    candidates = self._candidates.setdefault(start, [])
+                    if (key, compiled) not in candidates:
+                        candidates.append((key, compiled))
+
+        self._scanner = re.compile("|".join(
+            re.escape(first_char) + "(?:" + "|".join(rests) + ")" for first_char, rests in by_first_char.items()
+        ))
+
+    def find_mentions(self, text: str) -> List[ServiceMention]:
+        """Return every service mention in ``text`` (already lowercased), ordered by offset."""
+        mentions = []
+        match = self._scanner.search(text)
+        while match:
+            pos = match.start()
+            for key, compiled in self._candidates.get(text[pos:pos + 2], ()):
+                hit = compiled.match(text, pos)
+                if hit:
+                    mentions.append(ServiceMention(pos, hit.end(), key))
+            match = self._scanner.search(text, pos + 1)
+        return mentions
+
+    def matched_patterns(self, mentions: List[ServiceMention]) -> List[str]:
+        """Patterns with at least one mention, in SERVICE_PATTERNS order."""
+        found = {mention.pattern for mention in mentions}
+        return [key for key in self.patterns if key in found]
+
+
+# Characters that may follow a pattern's first character when its literal prefix is a single character
+_MENTION_CHARS = "abcdefghijklmnopqrstuvwxyz0123456789 \t\n\r\f\v-"
+
+
+def _literal_prefix(alternative: str) -> str:
+    """Leading literal characters of a pattern alternative (before any optional character or escape)."""
+    prefix = re.match(r"[a-z0-9 -]*", alternative).group()
+    if len(prefix) < len(alternative) and alternative[len(prefix)] in "?*{":
+        prefix = prefix[:-1]
+    return prefix
+
+
+SERVICE_DETECTOR = ServiceDetector(SERVICE_PATTERNS)
+
+
+@lru_cache(maxsize=16)
+def _detector_for_categories(categories: Tuple[str, ...]) -> ServiceDetector:
+    patterns = dict(SERVICE_PATTERNS)
+    for category in categories:
+        patterns.update(OPTIONAL_SERVICE_PATTERNS.get(category, {}))
+    return ServiceDetector(patterns)
+
+
+def get_service_detector(additional_categories: Optional[str] = None) -> ServiceDetector:
+    """Return the detector for the default services plus any requested optional categories."""
+    categories = tuple(sorted(
+        c.strip().lower() for c in (additional_categories or "").split(",")
+        if c.strip().lower() in OPTIONAL_SERVICE_PATTERNS
+    ))
+    return _detector_for_categories(categories) if categories else SERVICE_DETECTOR
+
+
+# ---------------------------------------------------------------------------
+# Mention index
+# ---------------------------------------------------------------------------
+
+# Sentence ends ("." / "!" / "?" before whitespace) and line breaks, so bullet items are sentences of their own
+SENTENCE_BREAK_PATTERN = re.compile(r'[.!?](?=\s|$)|\n')
+# Verbs between two mentions that state a connection: "<source> routes to <target>", "<target> receives from <source>"
+FORWARD_CONNECTION_PATTERN = re.compile(r'\b(?:connects?|uses?|accesses?|sends?|routes?|flows? to|points? to)\b|→|->')
+REVERSE_CONNECTION_PATTERN = re.compile(r'\b(?:receives?|gets?|from)\b')
+# Text that joins mentions into a list ("ECS, Lambda and Fargate"); a verb applies to every listed mention
+LIST_JOINER_PATTERN = re.compile(r'(?:[\s,/&()]|\band\b|\bor\b)*')
+# How many listed mentions after a connection verb are taken as its targets
+EXPLICIT_CONNECTION_WINDOW = 4
+
+
+class MentionIndex:
+    """Where each component is mentioned in the architecture text, built once per conversion.
+
+    Mentions are kept ordered by offset with the sentence they fall in.  An
+    explicit connection is a verb between a mention and the next one in the
+    same sentence, so each gap is checked once and all connections are found
+    in time linear in the number of mentions, instead of running
+    ``source.*verb.*target`` regexes over the whole text per pair.
+    """
+
+    def __init__(self, text: str, spans: Dict[str, List[Tuple[int, int]]]):
+        """``text`` is the lowercased architecture text, ``spans`` the (start, end) mentions per component id."""
+        self.text = text
+        sentence_ends = [m.start() for m in SENTENCE_BREAK_PATTERN.finditer(text)]
+
+        self.mentions: List[Tuple[int, int, str, int]] = sorted(
+            (start, end, component_id, bisect_left(sentence_ends, start))
+            for component_id, component_spans in spans.items()
+            for start, end in component_spans
+        )
+        self.offsets: Dict[str, List[int]] = {}
+        for start, _, component_id, _ in self.mentions:
+            self.offsets.setdefault(component_id, []).append(start)
+        self._explicit: Optional[List[Tuple[str, str]]] = None
+
+    @classmethod
+    def for_components(cls, text: str, components: List[dict],
+                       mentions: Optional[List[ServiceMention]] = None,
+                       pattern_ids: Optional[Dict[str, str]] = None) -> "MentionIndex":
+        """Index ``components`` in ``text`` (lowercased).
+
+        Components reached through ``pattern_ids`` (pattern -> component id)
+        take their spans from the detector ``mentions``; any other component is
+        located by occurrences of its name.
+        """
+        spans: Dict[str, List[Tuple[int, int]]] = {}
+        for mention in mentions or ():
+            component_id = (pattern_ids or {}).get(mention.pattern)
+            if component_id:
+                spans.setdefault(component_id, []).append((mention.start, mention.end))
+
+        for component in components:
+            if component['id'] in spans:
+                continue
+            name = component['name'].lower()
+            pos = text.find(name)
+            while pos != -1:
+                spans.setdefault(component['id'], []).append((pos, pos + len(name)))
+                pos = text.find(name, pos + 1)
+        return cls(text, spans)
+
+    def _next_mention(self, i: int) -> int:
+        """Index of the first mention starting after mention ``i`` ends (skipping overlapping ones)."""
+        mentions = self.mentions
+        end = mentions[i][1]
+        j = i + 1
+        while j < len(mentions) and mentions[j][0] < end:
+            j += 1
+        return j
+
+    def explicit_connections(self) -> List[Tuple[str, str]]:
+        """(source id, target id) pairs the text connects with a verb, in text order."""
+        if self._explicit is not None:
+            return self._explicit
+
+        found = []
+        seen = set()
+        mentions = self.mentions
+        for i, (_, end, mention_id, sentence) in enumerate(mentions):
+            j = self._next_mention(i)
+            if j == len(mentions) or mentions[j][3] != sentence:
+                continue
+
+            between = self.text[end:mentions[j][0]]
+            if FORWARD_CONNECTION_PATTERN.search(between):
+                forward = True
+            elif REVERSE_CONNECTION_PATTERN.search(between):
+                forward = False
+            else:
+                continue
+
+            # The verb reaches the next mention and any listed right after it
+            for _ in range(EXPLICIT_CONNECTION_WINDOW):
+                k = self._next_mention(j)
+                for _, _, other_id, _ in mentions[j:k]:
+                    pair = (mention_id, other_id) if forward else (other_id, mention_id)
+                    if other_id != mention_id and pair not in seen:
+                        seen.add(pair)
+                        found.append(pair)
+                if (k == len(mentions) or mentions[k][3] != sentence
+                        or not LIST_JOINER_PATTERN.fullmatch(self.text, mentions[j][1], mentions[k][0])):
+                    break
+                j = k
+
+        self._explicit = found
+        return found
+
+
+# Flexible detection of AWS services the patterns above do not know
+# (the shared "<word> <suffix>" branches are factored so each word is scanned once)
+FLEXIBLE_MENTION_PATTERN = re.compile(r'\b(aws\s+\w+|\w+\s+(?:aws|service|database|storage|compute|network))')
+CAMEL_CASE_PATTERN = re.compile(r'\b[A-Z][a-z]+[A-Z]\w*\b')
+UPPERCASE_PATTERN = re.compile(r'\b[A-Z]{2,}\b')
+
+# Filter out common words that shouldn't be services
+COMMON_WORDS_TO_IGNORE = {
+    'aws', 'service', 'database', 'storage', 'compute', 'network', 'security',
+    'management', 'integration', 'analytics', 'devtools', 'mobile', 'general',
+    'following', 'relational', 'nosql', 'sql', 'rest', 'api', 'https', 'ssl',
+    'tls', 'iam', 'kms', 'nat', 'sso', 'cpu', 'xss', 'alb', 'dns', 'cdn'
+}
+IGNORED_MENTION_FRAGMENTS = ('following', 'relational', 'nosql', 'sql', 'rest', 'api', 'https', 'ssl', 'tls', 'iam', 'kms', 'nat', 'sso', 'cpu', 'xss', 'alb', 'dns', 'cdn')
+
+
 @tool
 def convert_architecture_to_yaml(architecture_design: str, diagram_name: str = "AWS Architecture", output_folder: str = None, additional_categories: str = None, use_llm: str = "true") -> str:
     """
@@ -168,18 +450,48 @@ def convert_architecture_to_yaml(architecture_design: str, diagram_name: str = "
         Status message with file path and YAML content preview
     """
     
-    # Create output folder name if not provided
-    if not output_folder:
-        # Sanitize diagram name for folder
-        sanitized_name = re.sub(r'[^a-zA-Z0-9\s-]', '', diagram_name)
-        sanitized_name = re.sub(r'\s+', '_', sanitized_name).lower()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_folder = f"{sanitized_name}_{timestamp}"
-    
-    # Create the output directory
-    output_dir = Path(output_folder)
-    output_dir.mkdir(exist_ok=True)
+    yaml_structure, relationship_method = build_architecture_diagram(
+        architecture_design, diagram_name, additional_categories, use_llm
+    )
+    components = yaml_structure["diagram"]["resources"]
+
+    output_folder = output_folder or default_output_folder(diagram_name)
+    yaml_path, yaml_output = write_diagram_yaml(yaml_structure, output_folder)
     
+    rel_label = relationship_method_label(relationship_method)
+
+    return f"""✅ Architecture YAML Generated Successfully!
+
+📁 **Output Folder**: {output_folder}/
+📄 **YAML File**: {yaml_path}
+📊 **Components**: {len(components)} AWS services detected
+🔗 **Relationships**: {yaml_output.count('relates:')} connections generated ({rel_label})
+
+📋 **YAML Preview:**
+{yaml_output[:500]}...
+
+🎯 **Next Steps:**
+1. Use generate_diagram_from_yaml to create the visual diagram
+2. All files will be saved to: {output_folder}/
+3. The folder is registered, so generate_diagram_from_yaml finds it without output_folder"""
+
+
+def default_output_folder(diagram_name: str) -> str:
+    """Folder name for a diagram's outputs: the sanitized diagram name plus a timestamp."""
+    sanitized_name = re.sub(r'[^a-zA-Z0-9\s-]', '', diagram_name)
+    sanitized_name = re.sub(r'\s+', '_', sanitized_name).lower()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{sanitized_name}_{timestamp}"
+
+
+def build_architecture_diagram(architecture_design: str, diagram_name: str = "AWS Architecture",
+                               additional_categories: str = None, use_llm: str = "true") -> Tuple[dict, str]:
+    """Build the diagrams-as-code structure for an architecture design, in memory.
+
+    Returns the ``{"diagram": ...}`` dict and how relationships were derived
+    ("llm", "llm-partial" when the model's answer was truncated, or
+    "deterministic").  Nothing is written to disk.
+    """
     # Create the YAML structure with enhanced metadata
     yaml_structure = {
         "diagram": {
@@ -226,133 +538,36 @@ def convert_architecture_to_yaml(architecture_design: str, diagram_name: str = "
         "users": []
     }
     
-    # Common AWS service patterns to look for - Updated to match schema
-    service_patterns = {
-        # Network Services
-        r'cloudfront|cdn': {'type': 'aws.network.CloudFront', 'name': 'CloudFront', 'category': 'network', 'description': 'Content Delivery Network'},
-        r'route\s*53|dns': {'type': 'aws.network.Route53', 'name': 'Route 53', 'category': 'network', 'description': 'DNS Management'},
-        r'application\s*load\s*balancer|alb': {'type': 'aws.network.ElbApplicationLoadBalancer', 'name': 'Application Load Balancer', 'category': 'network', 'description': 'Load Balancing'},
-        r'network\s*load\s*balancer|nlb': {'type': 'aws.network.ElbNetworkLoadBalancer', 'name': 'Network Load Balancer', 'category': 'network', 'description': 'Load Balancing'},
-        r'classic\s*load\s*balancer|elb': {'type': 'aws.network.ELB', 'name': 'Classic Load Balancer', 'category': 'network', 'description': 'Load Balancing'},
-        r'api\s*gateway': {'type': 'aws.network.APIGateway', 'name': 'API Gateway', 'category': 'network', 'description': 'API Management'},
-        r'vpc': {'type': 'aws.network.VPC', 'name': 'VPC', 'category': 'network', 'description': 'Virtual Private Cloud'},
-        r'nat\s*gateway': {'type': 'aws.network.NATGateway', 'name': 'NAT Gateway', 'category': 'network', 'description': 'Network Address Translation'},
-        r'internet\s*gateway': {'type': 'aws.network.InternetGateway', 'name': 'Internet Gateway', 'category': 'network', 'description': 'Internet Access'},
-        r'privatelink': {'type': 'aws.network.Privatelink', 'name': 'PrivateLink', 'category': 'network', 'description': 'Private Connectivity'},
-        r'transit\s*gateway': {'type': 'aws.network.TransitGateway', 'name': 'Transit Gateway', 'category': 'network', 'description': 'Network Transit Hub'},
-        r'direct\s*connect': {'type': 'aws.network.DirectConnect', 'name': 'Direct Connect', 'category': 'network', 'description': 'Dedicated Network Connection'},
-        
-        # Security Services
-        r'waf': {'type': 'aws.security.WAF', 'name': 'AWS WAF', 'category': 'security', 'description': 'Web Application Firewall'},
-        r'shield': {'type': 'aws.security.Shield', 'name': 'AWS Shield', 'category': 'security', 'description': 'DDoS Protection'},
-        r'cognito': {'type': 'aws.security.Cognito', 'name': 'Amazon Cognito', 'category': 'security', 'description': 'User Authentication'},
-        r'certificate\s*manager|acm': {'type': 'aws.security.CertificateManager', 'name': 'Certificate Manager', 'category': 'security', 'description': 'SSL/TLS Certificates'},
-        r'kms': {'type': 'aws.security.KMS', 'name': 'AWS KMS', 'category': 'security', 'description': 'Key Management'},
-        r'secrets\s*manager': {'type': 'aws.security.SecretsManager', 'name': 'Secrets Manager', 'category': 'security', 'description': 'Secrets Management'},
-        r'iam': {'type': 'aws.security.IAM', 'name': 'AWS IAM', 'category': 'security', 'description': 'Identity and Access Management'},
-        r'guardduty': {'type': 'aws.security.Guardduty', 'name': 'GuardDuty', 'category': 'security', 'description': 'Threat Detection'},
-        
-        # Compute Services
-        r'ec2': {'type': 'aws.compute.EC2', 'name': 'EC2', 'category': 'compute', 'description': 'Virtual Servers'},
-        r'ecs': {'type': 'aws.compute.ECS', 'name': 'ECS', 'category': 'compute', 'description': 'Container Orchestration'},
-        r'fargate': {'type': 'aws.compute.Fargate', 'name': 'Fargate', 'category': 'compute', 'description': 'Serverless Containers'},
-        r'lambda': {'type': 'aws.compute.Lambda', 'name': 'Lambda', 'category': 'compute', 'description': 'Serverless Functions'},
-        r'eks': {'type': 'aws.compute.EKS', 'name': 'EKS', 'category': 'compute', 'description': 'Managed Kubernetes'},
-        r'elastic\s*beanstalk': {'type': 'aws.compute.ElasticBeanstalk', 'name': 'Elastic Beanstalk', 'category': 'compute', 'description': 'Application Platform'},
-        r'app\s*runner': {'type': 'aws.compute.AppRunner', 'name': 'App Runner', 'category': 'compute', 'description': 'Container-based Applications'},
-        
-        # Database Services
-        r'dynamodb': {'type': 'aws.database.Dynamodb', 'name': 'DynamoDB', 'category': 'database', 'description': 'NoSQL Database'},
-        r'rds': {'type': 'aws.database.RDS', 'name': 'RDS', 'category': 'database', 'description': 'Relational Database'},
-        r'elasticache': {'type': 'aws.database.ElastiCache', 'name': 'ElastiCache', 'category': 'database', 'description': 'In-Memory Cache'},
-        r'dax': {'type': 'aws.database.DAX', 'name': 'DAX', 'category': 'database', 'description': 'DynamoDB Accelerator'},
-        r'redshift': {'type': 'aws.database.Redshift', 'name': 'Redshift', 'category': 'database', 'description': 'Data Warehouse'},
-        r'aurora': {'type': 'aws.database.Aurora', 'name': 'Aurora', 'category': 'database', 'description': 'High-Performance Database'},
-        r'documentdb': {'type': 'aws.database.DocumentDB', 'name': 'DocumentDB', 'category': 'database', 'description': 'MongoDB-compatible Database'},
-        r'neptune': {'type': 'aws.database.Neptune', 'name': 'Neptune', 'category': 'database', 'description': 'Graph Database'},
-        
-        # Storage Services
-        r's3': {'type': 'aws.storage.S3', 'name': 'S3', 'category': 'storage', 'description': 'Object Storage'},
-        r'ebs': {'type': 'aws.storage.EBS', 'name': 'EBS', 'category': 'storage', 'description': 'Block Storage'},
-        r'efs': {'type': 'aws.storage.EFS', 'name': 'EFS', 'category': 'storage', 'description': 'File Storage'},
-        r'fsx': {'type': 'aws.storage.FSx', 'name': 'FSx', 'category': 'storage', 'description': 'High-Performance File Systems'},
-        r'backup': {'type': 'aws.storage.Backup', 'name': 'AWS Backup', 'category': 'storage', 'description': 'Backup Service'},
-        
-        # Container Services
-        r'ecr': {'type': 'aws.compute.ECR', 'name': 'ECR', 'category': 'devops', 'description': 'Container Registry'},
-        
-        # Integration Services
-        r'sqs': {'type': 'aws.integration.SQS', 'name': 'SQS', 'category': 'integration', 'description': 'Message Queue'},
-        r'sns': {'type': 'aws.integration.SNS', 'name': 'SNS', 'category': 'integration', 'description': 'Pub/Sub Messaging'},
-        r'eventbridge': {'type': 'aws.integration.Eventbridge', 'name': 'EventBridge', 'category': 'integration', 'description': 'Event Bus'},
-        r'step\s*functions': {'type': 'aws.integration.StepFunctions', 'name': 'Step Functions', 'category': 'integration', 'description': 'Workflow Orchestration'},
-        r'mq': {'type': 'aws.integration.MQ', 'name': 'Amazon MQ', 'category': 'integration', 'description': 'Message Broker'},
-        r'appsync': {'type': 'aws.integration.Appsync', 'name': 'AppSync', 'category': 'integration', 'description': 'GraphQL API'},
-        
-        # Analytics Services
-        r'kinesis': {'type': 'aws.analytics.Kinesis', 'name': 'Kinesis', 'category': 'integration', 'description': 'Data Streaming'},
-        r'kinesis\s*data\s*streams': {'type': 'aws.analytics.KinesisDataStreams', 'name': 'Kinesis Data Streams', 'category': 'integration', 'description': 'Real-time Data Streaming'},
-        r'kinesis\s*data\s*firehose': {'type': 'aws.analytics.KinesisDataFirehose', 'name': 'Kinesis Data Firehose', 'category': 'integration', 'description': 'Data Delivery'},
-        r'emr': {'type': 'aws.analytics.EMR', 'name': 'EMR', 'category': 'integration', 'description': 'Big Data Processing'},
-        r'glue': {'type': 'aws.analytics.Glue', 'name': 'AWS Glue', 'category': 'integration', 'description': 'Data Integration'},
-        r'athena': {'type': 'aws.analytics.Athena', 'name': 'Athena', 'category': 'integration', 'description': 'Query Service'},
-        r'quicksight': {'type': 'aws.analytics.Quicksight', 'name': 'QuickSight', 'category': 'integration', 'description': 'Business Intelligence'},
-        r'elasticsearch': {'type': 'aws.analytics.ElasticsearchService', 'name': 'Elasticsearch', 'category': 'integration', 'description': 'Search and Analytics'},
-                
-        # CI/CD Services (only if requested)
-        'ci-cd': {
-            r'codecommit': {'type': 'aws.devtools.Codecommit', 'name': 'CodeCommit', 'category': 'ci-cd', 'description': 'Source Control'},
-            r'codebuild': {'type': 'aws.devtools.Codebuild', 'name': 'CodeBuild', 'category': 'ci-cd', 'description': 'Build Service'},
-            r'codepipeline': {'type': 'aws.devtools.Codepipeline', 'name': 'CodePipeline', 'category': 'ci-cd', 'description': 'CI/CD Pipeline'},
-            r'codedeploy': {'type': 'aws.devtools.Codedeploy', 'name': 'CodeDeploy', 'category': 'ci-cd', 'description': 'Deployment Service'},
-            r'ecr': {'type': 'aws.compute.ECR', 'name': 'ECR', 'category': 'ci-cd', 'description': 'Container Registry'},
-        },
-        
-        # Cost Management
-        r'cost\s*explorer': {'type': 'aws.cost.CostExplorer', 'name': 'Cost Explorer', 'category': 'monitoring', 'description': 'Cost Analysis'},
-        r'budgets': {'type': 'aws.cost.Budgets', 'name': 'Budgets', 'category': 'monitoring', 'description': 'Cost Management'},
-        
-        # Generic/Client Services
-        r'internet': {'type': 'generic.network.Internet', 'name': 'Internet', 'category': 'users', 'description': 'Public Internet'},
-        r'users?': {'type': 'aws.general.Users', 'name': 'Users', 'category': 'users', 'description': 'End Users'},
-        r'clients?': {'type': 'aws.general.Client', 'name': 'Client', 'category': 'users', 'description': 'Client Applications'},
-        r'mobile': {'type': 'aws.general.MobileClient', 'name': 'Mobile Client', 'category': 'users', 'description': 'Mobile Applications'},
-    }
-    
     # Extract services from architecture design with flexible approach
     architecture_lower = architecture_design.lower()
     found_services = set()
     
-    # First, try to match known patterns
-    for pattern, service_info in service_patterns.items():
-        if re.search(pattern, architecture_lower):
-            service_id = service_info['name'].lower().replace(' ', '_').replace('-', '_')
-            if service_id not in found_services:
-                component = {
-                    "id": service_id,
-                    "name": service_info['name'],
-                    "type": service_info['type'],
-                    "description": service_info['description']
-                }
-                components.append(component)
-                service_categories[service_info['category']].append(component)
-                found_services.add(service_id)
+    # First, try to match known patterns (one scan; offsets are kept for relationship inference)
+    detector = get_service_detector(additional_categories)
+    mentions = detector.find_mentions(architecture_lower)
+    pattern_ids = {}
+    for pattern in detector.matched_patterns(mentions):
+        service_info = detector.patterns[pattern]
+        service_id = service_info['name'].lower().replace(' ', '_').replace('-', '_')
+        pattern_ids[pattern] = service_id
+        if service_id not in found_services:
+            component = {
+                "id": service_id,
+                "name": service_info['name'],
+                "type": service_info['type'],
+                "description": service_info['description']
+            }
+            components.append(component)
+            service_categories.setdefault(service_info['category'], []).append(component)
+            found_services.add(service_id)
     
     # FLEXIBILITY: Extract any AWS service mentions that weren't caught by patterns
     # Look for common AWS service patterns in the text
-    aws_service_mentions = re.findall(r'\b(aws\s+\w+|\w+\s+aws|\w+\s+service|\w+\s+database|\w+\s+storage|\w+\s+compute|\w+\s+network)', architecture_lower)
+    aws_service_mentions = FLEXIBLE_MENTION_PATTERN.findall(architecture_lower)
     
     # Look for capitalized service names that might be custom or new services
-    potential_services = re.findall(r'\b[A-Z][a-z]+[A-Z]\w*\b', architecture_design)  # CamelCase
-    potential_services.extend(re.findall(r'\b[A-Z]{2,}\b', architecture_design))  # UPPERCASE
-    
-    # Filter out common words that shouldn't be services
-    common_words_to_ignore = {
-        'aws', 'service', 'database', 'storage', 'compute', 'network', 'security',
-        'management', 'integration', 'analytics', 'devtools', 'mobile', 'general',
-        'following', 'relational', 'nosql', 'sql', 'rest', 'api', 'https', 'ssl',
-        'tls', 'iam', 'kms', 'nat', 'sso', 'cpu', 'xss', 'alb', 'dns', 'cdn'
-    }
+    potential_services = CAMEL_CASE_PATTERN.findall(architecture_design)  # CamelCase
+    potential_services.extend(UPPERCASE_PATTERN.findall(architecture_design))  # UPPERCASE
     
     # Add flexible service detection for unknown services
     for mention in aws_service_mentions + potential_services:
@@ -360,8 +575,8 @@ def convert_architecture_to_yaml(architecture_design: str, diagram_name: str = "
         # Skip if it's a common word or already processed
         if (mention_clean not in found_services and 
             len(mention_clean) > 2 and 
-            mention_clean not in common_words_to_ignore and
-            not any(word in mention_clean for word in ['following', 'relational', 'nosql', 'sql', 'rest', 'api', 'https', 'ssl', 'tls', 'iam', 'kms', 'nat', 'sso', 'cpu', 'xss', 'alb', 'dns', 'cdn'])):
+            mention_clean not in COMMON_WORDS_TO_IGNORE and
+            not any(word in mention_clean for word in IGNORED_MENTION_FRAGMENTS)):
             
             # Try to infer service type from context
             service_type = infer_service_type(mention_clean)
@@ -400,8 +615,9 @@ def convert_architecture_to_yaml(architecture_design: str, diagram_name: str = "
 
         # Try LLM-driven relationship inference first (if enabled)
         if use_llm.lower() == "true":
-            llm_rels = _llm_derive_relationships(components, architecture_design)
-            if llm_rels:
+            llm_result = _llm_derive_relationships(components, architecture_design)
+            if llm_result:
+                llm_rels, partial = llm_result
                 rel_by_source: dict = {}
                 for rel in llm_rels:
                     rel_by_source.setdefault(rel["from_id"], []).append({
@@ -413,28 +629,41 @@ def convert_architecture_to_yaml(architecture_design: str, diagram_name: str = "
                     if component["id"] in rel_by_source:
                         component["relates"] = rel_by_source[component["id"]]
                 llm_succeeded = True
-                relationship_method = "llm"
+                relationship_method = "llm-partial" if partial else "llm"
 
         # Fallback: deterministic heuristic-based inference
         if not llm_succeeded:
             relationship_method = "deterministic"
-            service_order = []
-            arch_lower = architecture_design.lower()
+            mention_index = MentionIndex.for_components(architecture_lower, components, mentions, pattern_ids)
 
-            for component in components:
-                service_name = component['name'].lower()
-                pos = arch_lower.find(service_name)
-                if pos != -1:
-                    service_order.append((pos, component))
+            components_by_id = {component['id']: component for component in components}
+            explicit_targets = {}
+            explicit_pairs = set()
+            for source_id, target_id in mention_index.explicit_connections():
+                explicit_targets.setdefault(source_id, []).append(target_id)
+                explicit_pairs.add((source_id, target_id))
 
-            service_order.sort(key=lambda x: x[0])
+            # Services in order of first mention, however the text names them ("ALB" for the load balancer)
+            service_order = sorted(
+                ((mention_index.offsets[component['id']][0], component)
+                 for component in components if component['id'] in mention_index.offsets),
+                key=lambda x: x[0],
+            )
 
             for i, (pos, component) in enumerate(service_order):
-                component_relationships = []
+                # Connections the text states come first, whatever the services' order
+                component_relationships = [
+                    create_logical_relationship(component, components_by_id[target_id])
+                    for target_id in explicit_targets.get(component['id'], [])
+                ]
 
                 for j in range(i + 1, min(i + 3, len(service_order))):
                     target_pos, target_component = service_order[j]
 
+                    # The text already says how these two connect, in one direction or the other
+                    if ((component['id'], target_component['id']) in explicit_pairs
+                            or (target_component['id'], component['id']) in explicit_pairs):
+                        continue
                     if should_connect_services(component, target_component, architecture_design):
                         relationship = create_logical_relationship(component, target_component)
                         if relationship:
@@ -452,10 +681,24 @@ def convert_architecture_to_yaml(architecture_design: str, diagram_name: str = "
                 if component_relationships:
                     component['relates'] = component_relationships
     
-    # Build the final YAML structure
     yaml_structure["diagram"]["resources"] = components
-    
-    # Convert to YAML string
+    return yaml_structure, relationship_method
+
+
+def write_diagram_yaml(yaml_structure: dict, output_folder: str,
+                       tool_name: str = "convert_architecture_to_yaml",
+                       created: Optional[bool] = None) -> Tuple[Path, str]:
+    """Save a diagram structure as YAML in ``output_folder`` and return the file path and YAML text.
+
+    The folder is recorded in the run registry, where generate_diagram_from_yaml looks it up.
+    ``created`` (default: whether the folder is new) marks it as the tool's own.
+    """
+    output_dir = Path(output_folder)
+    if created is None:
+        created = not output_dir.exists()
+    output_dir.mkdir(exist_ok=True)
+
+    diagram_name = yaml_structure["diagram"]["name"]
     yaml_output = yaml.dump(yaml_structure, default_flow_style=False, sort_keys=False)
     
     # Save YAML file to the output folder
@@ -465,29 +708,10 @@ def convert_architecture_to_yaml(architecture_design: str, diagram_name: str = "
     with open(yaml_path, 'w') as f:
         f.write(yaml_output)
     
-    # Store the folder path for the diagram generation tool
-    folder_info_path = output_dir / ".folder_info"
-    with open(folder_info_path, 'w') as f:
-        f.write(f"diagram_name={diagram_name}\n")
-        f.write(f"yaml_file={yaml_filename}\n")
-        f.write(f"output_folder={output_folder}\n")
-    
-    rel_label = "LLM-derived (dynamic)" if relationship_method == "llm" else "deterministic (heuristic)"
-
-    return f"""✅ Architecture YAML Generated Successfully!
-
-📁 **Output Folder**: {output_folder}/
-📄 **YAML File**: {yaml_path}
-📊 **Components**: {len(components)} AWS services detected
-🔗 **Relationships**: {yaml_output.count('relates:')} connections generated ({rel_label})
+    # Register the folder for the diagram generation tool
+    record_run(output_dir, tool_name, diagram_name, [yaml_path], created=created)
 
-📋 **YAML Preview:**
-{yaml_output[:500]}...
-
-🎯 **Next Steps:**
-1. Use generate_diagram_from_yaml to create the visual diagram
-2. All files will be saved to: {output_folder}/
-3. The folder contains: YAML file + metadata for diagram generation"""
+    return yaml_path, yaml_output
 
 
 def infer_service_type(service_name: str) -> str:
@@ -549,30 +773,27 @@ def infer_category_from_type(service_type: str) -> str:
         return 'compute'  # Default category
 
 
-def determine_relationship(source_component: dict, target_component: dict, architecture_text: str) -> dict:
-    """Determine relationship between two components with flexible logic"""
+def determine_relationship(source_component: dict, target_component: dict, architecture_text: str,
+                           mention_index: Optional[MentionIndex] = None) -> dict:
+    """Determine relationship between two components with flexible logic
+
+    Pass the ``mention_index`` of the whole design when calling this for many
+    pairs, so the text is indexed once rather than per pair.
+    """
     source_type = source_component["type"]
     target_type = target_component["type"]
-    source_name = source_component["name"].lower()
-    target_name = target_component["name"].lower()
     
     # Check if there's explicit mention of relationship in the architecture text
-    text_lower = architecture_text.lower()
+    if mention_index is None:
+        mention_index = MentionIndex.for_components(architecture_text.lower(), [source_component, target_component])
     
     # Look for explicit connections mentioned in text
-    connection_patterns = [
-        fr'{source_name}.*(?:connects?|uses?|accesses?|sends?|routes?).*{target_name}',
-        fr'{source_name}.*(?:→|->|flows? to|points? to).*{target_name}',
-        fr'{target_name}.*(?:receives?|gets?|from).*{source_name}'
-    ]
-    
-    for pattern in connection_patterns:
-        if re.search(pattern, text_lower):
-            return {
-                "to": target_component["id"],
-                "direction": "outgoing",
-                "label": "Explicit Connection"
-            }
+    if (source_component["id"], target_component["id"]) in mention_index.explicit_connections():
+        return {
+            "to": target_component["id"],
+            "direction": "outgoing",
+            "label": "Explicit Connection"
+        }
     
     # Apply flexible pattern matching (original logic but as fallback)
     relationship_info = None
@@ -0,0 +1,196 @@
+"""
+Shared AWS clients and Bedrock access for the tools.
+
+Creating a boto3 client resolves credentials and loads service models, which
+costs 100–300 ms per call; ``get_client`` builds one client per service and
+region for the life of the process instead.  boto3 clients are thread-safe,
+so the same client (and its connection pool) is shared by concurrent reads
+and model calls.  Pool size and retries are configurable:
+
+    AWS_MAX_POOL_CONNECTIONS   connections per client (default 32)
+    AWS_MAX_ATTEMPTS           attempts per request, including the first (default 4)
+    AWS_RETRY_MODE             botocore retry mode (default "adaptive")
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import boto3
+import yaml
+from botocore.config import Config
+
+from .disk_cache import get_llm_cache, make_key
+from .json_stream import iter_array_items
+
+logger = logging.getLogger(__name__)
+
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "32"))
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "4"))
+AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "adaptive")
+
+AGENT_CONFIG_PATH = Path(__file__).parent.parent.parent / ".agent.yaml"
+
+DEFAULT_BEDROCK_CONFIG = {
+    "model_id": "us.anthropic.claude-3-7-sonnet-20250219-v1:0",
+    "region_name": "us-west-2",
+}
+
+_session: Optional[boto3.session.Session] = None
+_clients: Dict[Tuple[str, Optional[str]], Any] = {}
+_clients_lock = threading.Lock()
+
+_bedrock_config: Optional[dict] = None
+_bedrock_config_mtime: Optional[float] = None
+_bedrock_config_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Clients
+# ---------------------------------------------------------------------------
+
+def get_client(service: str, region_name: Optional[str] = None):
+    """Return the process-wide client for ``service`` in ``region_name`` (default region if None)."""
+    client = _clients.get((service, region_name))
+    if client is not None:
+        return client
+
+    global _session
+    # Sessions are not thread-safe, so clients are created under the lock
+    with _clients_lock:
+        client = _clients.get((service, region_name))
+        if client is None:
+            if _session is None:
+                _session = boto3.session.Session()
+            config = Config(
+                max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+                retries={"max_attempts": AWS_MAX_ATTEMPTS, "mode": AWS_RETRY_MODE},
+            )
+            client = _session.client(service, region_name=region_name, config=config)
+            _clients[(service, region_name)] = client
+            logger.info(f"Created {service} client for region {region_name or 'default'}")
+    return client
+
+
+def reset_clients() -> None:
+    """Drop cached clients, e.g. after credentials or environment changed."""
+    global _session
+
+    with _clients_lock:
+        _clients.clear()
+        _session = None
+
+
+# ---------------------------------------------------------------------------
+# Bedrock
+# ---------------------------------------------------------------------------
+
+def load_bedrock_config() -> dict:
+    """Load the Bedrock model and region from .agent.yaml so tools reuse the agent's model.
+
+    The parsed config is kept until the file's mtime changes.
+    """
+    global _bedrock_config, _bedrock_config_mtime
+
+    try:
+        mtime = AGENT_CONFIG_PATH.stat().st_mtime
+    except OSError:
+        mtime = None
+
+    with _bedrock_config_lock:
+        if _bedrock_config is not None and mtime == _bedrock_config_mtime:
+            return _bedrock_config
+
+        config = dict(DEFAULT_BEDROCK_CONFIG)
+        if mtime is not None:
+            try:
+                cfg = yaml.safe_load(AGENT_CONFIG_PATH.read_text()) or {}
+                kwargs = cfg.get("provider", {}).get("kwargs", {})
+                config["model_id"] = kwargs.get("model_id", config["model_id"])
+                config["region_name"] = kwargs.get("region_name", config["region_name"])
+            except Exception as e:
+                logger.warning(f"Failed to read Bedrock config from {AGENT_CONFIG_PATH}: {e}")
+
+        _bedrock_config, _bedrock_config_mtime = config, mtime
+        return config
+
+
+def _bedrock_request(prompt: str, max_tokens: int) -> dict:
+    return {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.2,
+    }
+
+
+def stream_bedrock(prompt: str, max_tokens: int = 4096) -> Iterator[str]:
+    """Yield the text of a Bedrock completion as it is generated.
+
+    Closing the generator early closes the response stream, so the caller
+    stops paying for tokens it does not need.
+    """
+    cfg = load_bedrock_config()
+    client = get_client("bedrock-runtime", cfg["region_name"])
+    response = client.invoke_model_with_response_stream(
+        modelId=cfg["model_id"],
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(_bedrock_request(prompt, max_tokens)),
+    )
+
+    stream = response["body"]
+    try:
+        for event in stream:
+            chunk = event.get("chunk")
+            if not chunk:
+                continue
+            data = json.loads(chunk["bytes"])
+            if data.get("type") == "content_block_delta":
+                text = data.get("delta", {}).get("text", "")
+                if text:
+                    yield text
+            elif data.get("type") == "message_delta" and data.get("delta", {}).get("stop_reason") == "max_tokens":
+                logger.warning(f"Bedrock response truncated at {max_tokens} tokens")
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+
+
+def stream_bedrock_array(prompt: str, max_tokens: int = 4096, use_cache: bool = True) -> Iterator[Any]:
+    """Yield the elements of the JSON array a prompt asks for, as each one arrives.
+
+    The response is streamed and parsed incrementally (json_stream.iter_array_items);
+    the stream is closed as soon as the array does, ignoring any trailing
+    commentary.  A completed array is stored in the response cache (see
+    disk_cache.get_llm_cache), keyed by model, prompt and max_tokens, and
+    served from it on later calls; pass ``use_cache=False`` to force a fresh
+    call.  Raises ValueError if the response holds no array, and
+    json_stream.IncompleteJsonError after the last complete element if it
+    ends early (e.g. at max_tokens); a truncated array is not cached.
+    """
+    cfg = load_bedrock_config()
+    cache = get_llm_cache() if use_cache else None
+    cache_key = make_key("bedrock", cfg["model_id"], _bedrock_request(prompt, max_tokens)) if cache else None
+    if cache:
+        cached = cache.get_json(cache_key)
+        if cached is not None:
+            logger.info(f"Bedrock response cache hit ({len(prompt)} char prompt)")
+            yield from iter_array_items([cached["text"]])
+            return
+
+    items = []
+    stream = stream_bedrock(prompt, max_tokens)
+    try:
+        for item in iter_array_items(stream):
+            items.append(item)
+            yield item
+    finally:
+        stream.close()
+
+    if cache:
+        cache.put_json(cache_key, {"model_id": cfg["model_id"], "text": json.dumps(items)})
@@ -0,0 +1,181 @@
+"""
+Shared resolver from diagrams-as-code type strings to ``diagrams`` node classes.
+
+Both render paths (``generate_simple_diagram`` for YAML and ``_generate_png``
+for Terraform state) map types such as ``aws.compute.Lambda`` through this
+module so they agree on which icon a type gets.  The catalog of provider
+modules is read from the installed ``diagrams`` package without importing
+them; a module such as ``diagrams.aws.compute`` is imported and indexed only
+when a diagram first references one of its types, and then stays warm for
+the rest of the process.  Each resolved type is memoised, so a lookup is a
+single dict access.
+"""
+
+import importlib
+import logging
+import os
+import pkgutil
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Icon used when a type cannot be resolved at all
+DEFAULT_NODE_TYPE = "aws.general.General"
+
+# Per-module fallbacks for types whose class does not exist in the installed
+# diagrams version (e.g. an LLM-generated "aws.network.ALBListener").
+MODULE_DEFAULT_TYPES: Dict[str, str] = {
+    "aws.network": "aws.network.VPC",
+    "aws.compute": "aws.compute.EC2",
+    "aws.database": "aws.database.RDS",
+    "aws.storage": "aws.storage.S3",
+    "aws.security": "aws.security.WAF",
+    "aws.integration": "aws.integration.SQS",
+    "aws.analytics": "aws.analytics.Kinesis",
+    "aws.management": "aws.management.Cloudwatch",
+    "aws.devtools": "aws.devtools.XRay",
+    "aws.mobile": "aws.mobile.APIGateway",
+    "aws.general": "aws.general.General",
+    "generic.network": "generic.network.Internet",
+}
+
+# Last-resort keyword matching for types outside any known module
+KEYWORD_FALLBACK_TYPES: List[Tuple[Tuple[str, ...], str]] = [
+    (("lambda", "function"), "aws.compute.Lambda"),
+    (("database", "db", "dynamo"), "aws.database.Dynamodb"),
+    (("storage", "s3", "bucket"), "aws.storage.S3"),
+    (("network", "vpc", "subnet"), "aws.network.VPC"),
+    (("monitor", "cloudwatch"), "aws.management.Cloudwatch"),
+    (("queue", "sqs"), "aws.integration.SQS"),
+    (("user", "client"), "aws.general.User"),
+    (("internet", "web"), "generic.network.Internet"),
+]
+
+_index_lock = threading.RLock()
+_module_catalog: Optional[Dict[str, str]] = None
+_class_tables: Dict[str, Optional[Dict[str, Any]]] = {}
+_resolved: Dict[str, Any] = {}
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+def _build_module_catalog() -> Dict[str, str]:
+    """List every ``provider.module`` of the installed diagrams package.
+
+    Only the package directories are scanned — no provider module is
+    imported here, which keeps cold starts cheap.
+    """
+    import diagrams
+
+    catalog: Dict[str, str] = {}
+    for provider in pkgutil.iter_modules(diagrams.__path__):
+        if not provider.ispkg or provider.name.startswith("_"):
+            continue
+        provider_paths = [os.path.join(path, provider.name) for path in diagrams.__path__]
+        for module_info in pkgutil.iter_modules(provider_paths):
+            if module_info.name.startswith("_"):
+                continue
+            module_path = f"{provider.name}.{module_info.name}"
+            catalog[module_path.lower()] = f"diagrams.{module_path}"
+    return catalog
+
+
+def get_module_catalog() -> Dict[str, str]:
+    """Return the ``provider.module`` → import path catalog, building it on first use."""
+    global _module_catalog
+
+    if _module_catalog is None:
+        with _index_lock:
+            if _module_catalog is None:
+                _module_catalog = _build_module_catalog()
+    return _module_catalog
+
+
+def _load_class_table(module_path: str) -> Optional[Dict[str, Any]]:
+    """Import one diagrams module and index its node classes (exact and lowercased names)."""
+    import_path = get_module_catalog().get(module_path)
+    if import_path is None:
+        return None
+
+    from diagrams import Node
+
+    try:
+        module = importlib.import_module(import_path)
+    except Exception as e:
+        logger.debug(f"Skipping diagrams module {import_path}: {e}")
+        return None
+
+    table: Dict[str, Any] = {}
+    for attr_name, value in vars(module).items():
+        if attr_name.startswith("_") or not isinstance(value, type) or not issubclass(value, Node):
+            continue
+        table.setdefault(attr_name, value)
+        table.setdefault(attr_name.lower(), value)
+    return table
+
+
+def get_class_table(module_path: str) -> Optional[Dict[str, Any]]:
+    """Return the class table of ``provider.module``, importing the module on first use."""
+    module_path = module_path.lower()
+    if module_path not in _class_tables:
+        with _index_lock:
+            if module_path not in _class_tables:
+                _class_tables[module_path] = _load_class_table(module_path)
+    return _class_tables[module_path]
+
+
+# ---------------------------------------------------------------------------
+# Resolution
+# ---------------------------------------------------------------------------
+
+def _find_class(node_type: str) -> Any:
+    """Look a type up in its module's class table (exact, then case-insensitive)."""
+    if "." not in node_type:
+        return None
+    module_path, class_name = node_type.rsplit(".", 1)
+    table = get_class_table(module_path)
+    if table is None:
+        return None
+    return table.get(class_name) or table.get(class_name.lower())
+
+
+def _lookup(node_type: str) -> Any:
+    """Resolve a type string without the memo: exact, case-insensitive, module default, keyword fallback."""
+    node_cls = _find_class(node_type)
+    if node_cls is not None:
+        return node_cls
+
+    module_path = node_type.rsplit(".", 1)[0].lower()
+    default_type = MODULE_DEFAULT_TYPES.get(module_path)
+    if default_type is None:
+        type_lower = node_type.lower()
+        default_type = next(
+            (fallback for terms, fallback in KEYWORD_FALLBACK_TYPES if any(term in type_lower for term in terms)),
+            DEFAULT_NODE_TYPE,
+        )
+
+    return _find_class(default_type) or _find_class(DEFAULT_NODE_TYPE)
+
+
+def resolve_node_class(node_type: str) -> Any:
+    """Return the diagrams node class for a type such as ``aws.compute.Lambda``.
+
+    Unknown types fall back to the module's default icon, then to a keyword
+    match, then to ``aws.general.General`` — never raising.
+    """
+    node_cls = _resolved.get(node_type)
+    if node_cls is None:
+        node_cls = _lookup(node_type or DEFAULT_NODE_TYPE)
+        _resolved[node_type] = node_cls
+    return node_cls
+
+
+def create_node(node_type: str, label: str) -> Any:
+    """Instantiate the node for ``node_type`` inside the active Diagram context."""
+    try:
+        return resolve_node_class(node_type)(label)
+    except Exception:
+        return resolve_node_class(DEFAULT_NODE_TYPE)(label)
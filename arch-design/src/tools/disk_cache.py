@@ -0,0 +1,263 @@
+"""
+Content-addressed on-disk cache shared by the diagram tools.
+
+Entries are plain files named by a SHA-256 key under
+``$ARCH_DESIGN_CACHE_DIR/<namespace>/`` (default ``~/.cache/arch-design``).
+An entry's mtime is its write time (used for the optional TTL) and its atime
+is set explicitly on every read, so evicting the oldest atimes first when the
+namespace grows past its size cap gives LRU behaviour.  Writes go through a
+temporary file and ``os.replace`` so concurrent tool calls never see a
+partially written entry.
+
+Files handed out to output folders (``copy_to``, ``atomic_render``) are
+likewise moved into place rather than written over: retention hardlinks
+identical PNGs across runs, and writing into a shared inode would change
+every run's copy at once.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(os.getenv("ARCH_DESIGN_CACHE_DIR", "~/.cache/arch-design")).expanduser()
+
+
+def make_key(*parts: Any) -> str:
+    """Hash JSON-serialisable parts into a stable key.
+
+    Dicts are serialised with sorted keys, so two semantically identical
+    documents produce the same key regardless of key order or formatting.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """Size-capped, LRU-evicted file cache for one namespace."""
+
+    def __init__(
+        self,
+        namespace: str,
+        max_bytes: int,
+        ttl_seconds: Optional[float] = None,
+        directory: Optional[Path] = None,
+    ):
+        self.directory = Path(directory or DEFAULT_CACHE_DIR) / namespace
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+    # -- lookups -------------------------------------------------------------
+
+    def _entry(self, key: str, suffix: str) -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    def get_path(self, key: str, suffix: str = "") -> Optional[Path]:
+        """Return the path of a live entry (refreshing its LRU position), or None."""
+        path = self._entry(key, suffix)
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+
+        now = time.time()
+        if self.ttl_seconds is not None and now - stat.st_mtime > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path, (now, stat.st_mtime))
+        except OSError:
+            pass
+        return path
+
+    def get_bytes(self, key: str, suffix: str = "") -> Optional[bytes]:
+        path = self.get_path(key, suffix)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def get_json(self, key: str, suffix: str = ".json") -> Any:
+        data = self.get_bytes(key, suffix)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def copy_to(self, key: str, destination: Path, suffix: str = "") -> bool:
+        """Copy a cached entry to ``destination``. Returns False on a miss."""
+        path = self.get_path(key, suffix)
+        if path is None:
+            return False
+        tmp_name = None
+        try:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=destination.parent, prefix=f".{destination.name}.")
+            os.close(fd)
+            shutil.copyfile(path, tmp_name)
+            os.replace(tmp_name, destination)
+            return True
+        except OSError as e:
+            if tmp_name:
+                Path(tmp_name).unlink(missing_ok=True)
+            logger.warning(f"Failed to copy cache entry {path.name}: {e}")
+            return False
+
+    # -- writes --------------------------------------------------------------
+
+    def put_bytes(self, key: str, data: bytes, suffix: str = "") -> Optional[Path]:
+        """Store ``data`` atomically; caching is best effort, so failures are logged, not raised."""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            path = self._entry(key, suffix)
+            os.replace(tmp_name, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry in {self.directory}: {e}")
+            return None
+        self.evict()
+        return path
+
+    def put_json(self, key: str, value: Any, suffix: str = ".json") -> Optional[Path]:
+        return self.put_bytes(key, json.dumps(value).encode("utf-8"), suffix)
+
+    def put_file(self, key: str, source: Path, suffix: str = "") -> Optional[Path]:
+        try:
+            data = Path(source).read_bytes()
+        except OSError as e:
+            logger.warning(f"Failed to read {source} for caching: {e}")
+            return None
+        return self.put_bytes(key, data, suffix)
+
+    # -- eviction ------------------------------------------------------------
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until under the size cap."""
+        with self._lock:
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.is_file() and not e.name.startswith(".tmp-")]
+            except OSError:
+                return 0
+
+            now = time.time()
+            live = []
+            removed = 0
+            for entry in entries:
+                stat = entry.stat()
+                if self.ttl_seconds is not None and now - stat.st_mtime > self.ttl_seconds:
+                    Path(entry.path).unlink(missing_ok=True)
+                    removed += 1
+                else:
+                    live.append((stat.st_atime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in live)
+            if total > self.max_bytes:
+                for _, size, path in sorted(live):
+                    Path(path).unlink(missing_ok=True)
+                    removed += 1
+                    total -= size
+                    if total <= self.max_bytes:
+                        break
+            return removed
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# Rendered diagrams
+# ---------------------------------------------------------------------------
+
+RENDER_CACHE_ENABLED = os.getenv("ARCH_DESIGN_RENDER_CACHE", "on").lower() not in ("0", "off", "false", "no")
+RENDER_CACHE_MAX_MB = int(os.getenv("ARCH_DESIGN_RENDER_CACHE_MB", "256"))
+
+@contextmanager
+def atomic_render(output_file: Path) -> Iterator[Path]:
+    """Yield a hidden stem next to ``output_file`` to render to; the result replaces ``output_file`` on success.
+
+    Renderers append the format suffix to the stem (``diagrams`` does), so the
+    stem has none.
+    """
+    output_file = Path(output_file)
+    stem = output_file.with_name(f".{output_file.stem}.{os.getpid()}-{threading.get_ident()}.render")
+    rendered = stem.with_name(stem.name + output_file.suffix)
+    try:
+        yield stem
+        os.replace(rendered, output_file)
+    finally:
+        rendered.unlink(missing_ok=True)
+        stem.unlink(missing_ok=True)
+
+
+_render_cache: Optional[DiskCache] = None
+
+
+def get_render_cache() -> Optional[DiskCache]:
+    """Return the shared cache of rendered diagrams, or None when disabled via ARCH_DESIGN_RENDER_CACHE=off."""
+    global _render_cache
+
+    if not RENDER_CACHE_ENABLED:
+        return None
+    if _render_cache is None:
+        _render_cache = DiskCache("renders", max_bytes=RENDER_CACHE_MAX_MB * 1024 * 1024)
+    return _render_cache
+
+
+def _diagrams_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("diagrams")
+    except Exception:
+        return "unknown"
+
+
+def render_cache_key(renderer: str, diagram_dict: dict, outformat: str, direction: str, style: Optional[dict] = None) -> str:
+    """Key a rendered diagram by its content and everything else that changes the output image.
+
+    ``renderer`` names the code path that draws the diagram, since two paths may
+    lay out the same dict differently.
+    """
+    return make_key(renderer, diagram_dict, outformat, direction, style or {}, _diagrams_version())
+
+
+# ---------------------------------------------------------------------------
+# Bedrock responses
+# ---------------------------------------------------------------------------
+
+LLM_CACHE_ENABLED = os.getenv("ARCH_DESIGN_LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+LLM_CACHE_MAX_MB = int(os.getenv("ARCH_DESIGN_LLM_CACHE_MB", "64"))
+LLM_CACHE_TTL_HOURS = float(os.getenv("ARCH_DESIGN_LLM_CACHE_TTL_HOURS", "168"))
+
+_llm_cache: Optional[DiskCache] = None
+
+
+def get_llm_cache() -> Optional[DiskCache]:
+    """Return the shared cache of model responses, or None when disabled via ARCH_DESIGN_LLM_CACHE=off."""
+    global _llm_cache
+
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        _llm_cache = DiskCache(
+            "llm",
+            max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+            ttl_seconds=LLM_CACHE_TTL_HOURS * 3600 if LLM_CACHE_TTL_HOURS > 0 else None,
+        )
+    return _llm_cache
@@ -0,0 +1,307 @@
+"""
+Incremental pull parser for large JSON documents.
+
+``JsonStreamReader`` walks a document delivered as an iterable of text chunks
+(a file read piecewise, an S3 body, a streamed model response) and lets the
+caller decide per object key / array element whether to decode the value or
+skip it.  Skipped values are scanned with C-level regexes and dropped from the
+buffer as the scan advances, so memory is bounded by the values the caller
+actually keeps — not by the size of the document.
+
+    reader = JsonStreamReader(chunks)
+    for key in reader.iter_object():
+        if key == "resources":
+            for _ in reader.iter_array():
+                keep(reader.read_value())
+        else:
+            reader.skip_value()
+
+Every key yielded by ``iter_object`` and every index yielded by
+``iter_array`` must be followed by exactly one ``read_value``/``skip_value``
+(or a nested ``iter_object``/``iter_array``) before advancing.
+
+``iter_array_items`` covers the common case of a streamed model response
+holding one JSON array: it yields each element as soon as it is complete.
+Input that ends inside a value raises ``IncompleteJsonError``, so a caller
+can keep the elements it already has from a truncated response.
+"""
+
+import codecs
+import itertools
+import json
+import re
+from typing import Any, Iterable, Iterator, Optional
+
+_WHITESPACE = re.compile(r"\s*")
+_WHITESPACE_CHARS = " \t\r\n"
+_KEY = re.compile(r'"([^"\\]*)"\s*:')
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR = re.compile(r"[^,:\]}\s]+")
+_SCALAR_END = ",]}" + _WHITESPACE_CHARS
+# Complete strings are consumed whole so brackets inside them are ignored; a
+# lone quote means the string continues in the next chunk.
+_NESTED_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|["\[\]{}]')
+
+# An array of objects as a model writes it: "[" then "{" or the closing "]"
+_ARRAY_START = re.compile(r"\[\s*")
+_FENCE = re.compile(r"```[\w-]*")
+
+_DECODER = json.JSONDecoder()
+_INCOMPLETE = object()
+
+
+class IncompleteJsonError(ValueError):
+    """The input ended before the value being read did (e.g. a truncated model response)."""
+
+
+def decode_chunks(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """Decode byte chunks to text, handling multi-byte characters split across chunks."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _is_line_start(text: str, pos: int) -> bool:
+    """Whether ``pos`` only follows indentation or an opening markdown fence on its line."""
+    prefix = text[text.rfind("\n", 0, pos) + 1:pos].strip(" \t")
+    return not prefix or _FENCE.fullmatch(prefix) is not None
+
+
+def _find_array_start(chunks: Iterator[str]) -> Optional[str]:
+    """Read ``chunks`` up to the start of the array and return the text from its "[" on.
+
+    A "[" counts only when followed by "{" or "]", so bracketed prose ("[1]",
+    "[ALB, Lambda]") is skipped.  One at the start of a line or right after a
+    markdown fence is taken as soon as it is seen; otherwise the first inline
+    one ("Here it is: [{...}]") is used once the input ends without either.
+    """
+    text = ""
+    scan = 0
+    inline = None
+    exhausted = False
+    while not exhausted:
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+        else:
+            text += chunk
+        for m in _ARRAY_START.finditer(text, scan):
+            if m.end() == len(text) and not exhausted:
+                # The character after "[" has not arrived yet
+                scan = m.start()
+                break
+            scan = m.start() + 1
+            if m.end() == len(text) or text[m.end()] not in "{]":
+                continue
+            if _is_line_start(text, m.start()):
+                return text[m.start():]
+            if inline is None:
+                inline = m.start()
+        else:
+            scan = len(text)
+    return text[inline:] if inline is not None else None
+
+
+def iter_array_items(chunks: Iterable[str]) -> Iterator[Any]:
+    """Yield the elements of the JSON array in ``chunks`` as each one completes.
+
+    Text before the array (a preamble, an opening markdown fence) is skipped,
+    and nothing after the closing bracket is read, so a caller consuming a
+    response stream can stop as soon as the array is complete.  Raises
+    ValueError if there is no array, and IncompleteJsonError after the last
+    complete element if the input ends before the array does.
+    """
+    chunks = iter(chunks)
+    text = _find_array_start(chunks)
+    if text is None:
+        raise ValueError("No JSON array found in input")
+
+    reader = JsonStreamReader(itertools.chain([text], chunks))
+    for _ in reader.iter_array():
+        yield reader.read_value()
+
+
+class JsonStreamReader:
+    """Pull parser over a JSON document split into text chunks."""
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    # -- buffer --------------------------------------------------------------
+
+    def _fill(self) -> bool:
+        """Drop the consumed prefix and append the next chunk. Returns False at end of input."""
+        if self._eof:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                self._buf = self._buf[self._pos:] + chunk
+                self._pos = 0
+                return True
+        self._eof = True
+        return False
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ("" at end of input)."""
+        if self._pos < len(self._buf) and self._buf[self._pos] not in _WHITESPACE_CHARS:
+            return self._buf[self._pos]
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch:
+            raise IncompleteJsonError(f"Expected one of {chars!r}, got the end of JSON input")
+        if ch not in chars:
+            raise ValueError(f"Expected one of {chars!r} at offset {self._pos}, got {ch!r}")
+        self._pos += 1
+        return ch
+
+    # -- values --------------------------------------------------------------
+
+    def _scan_value(self, capture: bool) -> str:
+        """Advance past the next value, returning its text when ``capture`` is set."""
+        ch = self.peek()
+        if not ch:
+            raise IncompleteJsonError("Unexpected end of JSON input")
+
+        pieces = []
+        start = self._pos
+
+        if ch == '"':
+            while True:
+                m = _STRING.match(self._buf, self._pos)
+                if m:
+                    start, self._pos = m.start(), m.end()
+                    break
+                if not self._fill():
+                    raise IncompleteJsonError("Unterminated JSON string")
+
+        elif ch in "[{":
+            depth = 0
+            scan = start
+            while True:
+                end = None
+                for m in _NESTED_TOKEN.finditer(self._buf, scan):
+                    token = m.group()[0]
+                    if token == '"' and len(m.group()) == 1:
+                        scan = m.start()
+                        break
+                    if token in "[{":
+                        depth += 1
+                    elif token in "]}":
+                        depth -= 1
+                        if depth == 0:
+                            end = m.end()
+                            break
+                else:
+                    scan = len(self._buf)
+
+                if end is not None:
+                    self._pos = end
+                    break
+
+                # Hand the scanned part over (or drop it) before reading on
+                if capture:
+                    pieces.append(self._buf[start:scan])
+                self._pos = scan
+                if not self._fill():
+                    raise IncompleteJsonError("Unexpected end of JSON input")
+                start = scan = 0
+
+        else:
+            while True:
+                m = _SCALAR.match(self._buf, self._pos)
+                if m is None:
+                    raise ValueError(f"Unexpected {ch!r} at offset {self._pos}")
+                if m.end() < len(self._buf) or not self._fill():
+                    start, self._pos = m.start(), m.end()
+                    break
+
+        if not capture:
+            return ""
+        pieces.append(self._buf[start:self._pos])
+        return "".join(pieces)
+
+    def _decode_buffered(self) -> Any:
+        """Decode the next value if it lies entirely within the buffer, else return _INCOMPLETE."""
+        try:
+            value, end = _DECODER.raw_decode(self._buf, self._pos)
+        except ValueError:
+            return _INCOMPLETE
+        # A number or literal ending exactly at the buffer edge may continue in the next chunk
+        if end == len(self._buf):
+            if not self._eof:
+                return _INCOMPLETE
+        # A number cut after "." or "e" decodes as its prefix ("1" of "1.5"): only a delimiter ends a scalar
+        elif self._buf[self._pos] not in '"[{' and self._buf[end] not in _SCALAR_END:
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def read_value(self) -> Any:
+        """Decode the next value."""
+        if not self.peek():
+            raise IncompleteJsonError("Unexpected end of JSON input")
+        value = self._decode_buffered()
+        if value is _INCOMPLETE:
+            value = json.loads(self._scan_value(capture=True))
+        return value
+
+    def skip_value(self) -> None:
+        """Advance past the next value without retaining it."""
+        ch = self.peek()
+        # Decoding a buffered container in C beats tokenising it in Python; values
+        # spanning chunks fall back to the scanner, which drops text as it goes.
+        if ch in ("[", "{") and self._decode_buffered() is not _INCOMPLETE:
+            return
+        self._scan_value(capture=False)
+
+    # -- containers ----------------------------------------------------------
+
+    def iter_object(self) -> Iterator[str]:
+        """Yield the keys of the next object; the caller consumes each value."""
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            self.peek()
+            m = _KEY.match(self._buf, self._pos)
+            if m:
+                # Fast path for keys without escapes
+                key = m.group(1)
+                self._pos = m.end()
+            else:
+                key = self.read_value()
+                if not isinstance(key, str):
+                    raise ValueError(f"Expected an object key at offset {self._pos}")
+                self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def iter_array(self) -> Iterator[int]:
+        """Yield the indices of the next array; the caller consumes each element."""
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self._expect(",]") == "]":
+                return
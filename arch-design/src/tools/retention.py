@@ -0,0 +1,236 @@
+"""
+Retention and compaction of the output folders recorded in the run registry.
+
+Every diagram tool run leaves a ``<name>_<timestamp>/`` folder behind.  The
+retention job keeps them in check, oldest runs first:
+
+1. Identical PNGs in live folders are hardlinked to one copy (by SHA-256),
+   so re-rendering the same diagram does not store it again.
+2. Runs older than ``ARCH_DESIGN_RUN_ARCHIVE_AFTER_DAYS`` are compacted into
+   one ``.tar.gz`` per run under ``ARCH_DESIGN_RUN_ARCHIVE_DIR`` and their
+   folders removed, which also keeps the working directory short.
+3. Runs are deleted (folder or archive, and registry entry) when older than
+   ``ARCH_DESIGN_RUN_RETENTION_DAYS``, beyond the newest
+   ``ARCH_DESIGN_RUN_RETENTION_MAX_RUNS``, or while all runs together exceed
+   ``ARCH_DESIGN_RUN_RETENTION_MAX_MB``.
+
+A policy set to 0 is disabled.  Only folders a tool created itself (runs
+recorded as ``owned``) are ever deduplicated, archived or removed, and never
+the working directory or one of its parents; other runs only lose their
+registry entry.  PNG writers replace files instead of writing into them (see
+``disk_cache.atomic_render``), so hardlinked copies are never changed in
+place.  The job runs in a background thread at most once per
+``ARCH_DESIGN_RUN_RETENTION_INTERVAL_MINUTES`` after a run is recorded, and
+on demand through the ``clean_up_outputs`` tool.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from strands import tool
+
+from . import run_registry
+from .disk_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = float(os.getenv("ARCH_DESIGN_RUN_RETENTION_DAYS", "30"))
+RETENTION_MAX_RUNS = int(os.getenv("ARCH_DESIGN_RUN_RETENTION_MAX_RUNS", "500"))
+RETENTION_MAX_MB = float(os.getenv("ARCH_DESIGN_RUN_RETENTION_MAX_MB", "2048"))
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCH_DESIGN_RUN_ARCHIVE_AFTER_DAYS", "7"))
+ARCHIVE_DIR = Path(os.getenv("ARCH_DESIGN_RUN_ARCHIVE_DIR", str(DEFAULT_CACHE_DIR / "archive"))).expanduser()
+RETENTION_INTERVAL_MINUTES = float(os.getenv("ARCH_DESIGN_RUN_RETENTION_INTERVAL_MINUTES", "60"))
+
+_last_started = 0.0
+_job_lock = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Scheduling
+# ---------------------------------------------------------------------------
+
+def maybe_enforce_retention() -> None:
+    """Start the retention job in the background unless it ran within the interval."""
+    global _last_started
+
+    if RETENTION_INTERVAL_MINUTES <= 0:
+        return
+    now = time.time()
+    if now - _last_started < RETENTION_INTERVAL_MINUTES * 60 or _job_lock.locked():
+        return
+    _last_started = now
+    threading.Thread(target=_enforce_in_background, name="arch-design-retention", daemon=True).start()
+
+
+def _enforce_in_background() -> None:
+    try:
+        stats = enforce_retention()
+        if any(stats.values()):
+            logger.info(f"Output retention: {stats}")
+    except Exception as e:
+        logger.warning(f"Output retention failed: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Job
+# ---------------------------------------------------------------------------
+
+def enforce_retention() -> Dict[str, int]:
+    """Deduplicate, archive and delete runs according to the policies; returns what was done."""
+    with _job_lock:
+        stats = {"deduplicated": 0, "bytes_deduplicated": 0, "archived": 0, "deleted": 0, "bytes_freed": 0}
+        now = time.time()
+        runs = run_registry.list_runs(limit=-1)  # newest first
+
+        live = [run for run in runs if not run["archive"] and _is_removable(run)]
+        _deduplicate_pngs(live, stats)
+
+        if ARCHIVE_AFTER_DAYS > 0:
+            for run in live:
+                if now - run["updated"] > ARCHIVE_AFTER_DAYS * 86400 and Path(run["folder"]).is_dir():
+                    _archive_run(run, stats)
+
+        # Runs in folders the tools did not create are not theirs to count or remove
+        sizes = {run["run_id"]: _run_size(run) if _is_removable(run) else 0 for run in runs}
+        total = sum(sizes.values())
+        for index, run in reversed(list(enumerate(runs))):
+            expired = RETENTION_DAYS > 0 and now - run["updated"] > RETENTION_DAYS * 86400
+            surplus = RETENTION_MAX_RUNS > 0 and index >= RETENTION_MAX_RUNS
+            # The newest run is kept even if it alone is over the size limit
+            oversize = RETENTION_MAX_MB > 0 and total > RETENTION_MAX_MB * 1024 * 1024 and index > 0
+            if not (expired or surplus or oversize):
+                break
+            _delete_run(run, stats)
+            total -= sizes[run["run_id"]]
+            stats["bytes_freed"] += sizes[run["run_id"]]
+        return stats
+
+
+def _is_removable(run: dict) -> bool:
+    """Whether retention may touch a run's folder: one a tool created, not the CWD or above it."""
+    if not run.get("owned"):
+        return False
+    folder = Path(run["folder"]).resolve()
+    cwd = Path.cwd().resolve()
+    cache_dir = DEFAULT_CACHE_DIR.resolve()
+    if folder == cwd or folder in cwd.parents or folder == Path.home().resolve():
+        return False
+    return folder != cache_dir and cache_dir not in folder.parents
+
+
+def _run_size(run: dict) -> int:
+    """Bytes a run occupies: its archive, or the files in its folder."""
+    if run["archive"]:
+        try:
+            return os.stat(run["archive"]).st_size
+        except OSError:
+            return 0
+    total = 0
+    for root, _, files in os.walk(run["folder"]):
+        for name in files:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            # Hardlinked copies share the space of one file
+            total += stat.st_size // max(stat.st_nlink, 1)
+    return total
+
+
+def _deduplicate_pngs(runs: List[dict], stats: Dict[str, int]) -> None:
+    """Replace identical PNGs across live folders with hardlinks to one copy."""
+    by_size: Dict[int, List[Path]] = {}
+    for run in runs:
+        folder = Path(run["folder"])
+        if folder.is_dir():
+            for path in folder.glob("*.png"):
+                by_size.setdefault(path.stat().st_size, []).append(path)
+
+    for size, paths in by_size.items():
+        if len(paths) < 2:
+            continue
+        originals: Dict[str, Path] = {}
+        for path in paths:
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            original = originals.setdefault(digest, path)
+            if original == path or os.path.samefile(original, path):
+                continue
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.link")
+            try:
+                os.link(original, tmp)
+                os.replace(tmp, path)
+            except OSError as e:
+                # Folders on different filesystems cannot share a file
+                tmp.unlink(missing_ok=True)
+                logger.debug(f"Could not hardlink {path} to {original}: {e}")
+                continue
+            stats["deduplicated"] += 1
+            stats["bytes_deduplicated"] += size
+
+
+def _archive_run(run: dict, stats: Dict[str, int]) -> None:
+    """Compact a run's folder into a tar.gz under ARCHIVE_DIR and remove the folder."""
+    folder = Path(run["folder"])
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    archive = ARCHIVE_DIR / f"{folder.name}-{run['run_id'][:8]}.tar.gz"
+
+    fd, tmp = tempfile.mkstemp(dir=ARCHIVE_DIR, suffix=".tmp")
+    os.close(fd)
+    try:
+        with tarfile.open(tmp, "w:gz") as tar:
+            tar.add(folder, arcname=folder.name)
+        os.replace(tmp, archive)
+    except Exception as e:
+        Path(tmp).unlink(missing_ok=True)
+        logger.warning(f"Failed to archive {folder}: {e}")
+        return
+
+    run_registry.mark_archived(run["run_id"], archive)
+    run["archive"] = str(archive)
+    shutil.rmtree(folder, ignore_errors=True)
+    stats["archived"] += 1
+
+
+def _delete_run(run: dict, stats: Dict[str, int]) -> None:
+    if _is_removable(run):
+        if run["archive"]:
+            Path(run["archive"]).unlink(missing_ok=True)
+        shutil.rmtree(run["folder"], ignore_errors=True)
+        stats["deleted"] += 1
+    # Runs in folders the tools did not create are only forgotten
+    run_registry.delete_run(run["run_id"])
+
+
+# ---------------------------------------------------------------------------
+# Tool
+# ---------------------------------------------------------------------------
+
+@tool
+def clean_up_outputs() -> str:
+    """
+    Apply the output retention policies now: deduplicate identical PNGs, archive old
+    diagram folders and delete runs past the age, count or size limits.
+
+    Only folders created by the diagram tools (recorded in the run registry) are touched.
+
+    Returns:
+        Summary of what was deduplicated, archived and deleted
+    """
+    try:
+        stats = enforce_retention()
+    except Exception as e:
+        return f"❌ Error applying output retention: {str(e)}"
+
+    return f"""✅ Output Retention Applied
+
+🔗 **Deduplicated PNGs**: {stats['deduplicated']} ({stats['bytes_deduplicated'] / 1024:.1f}KB saved)
+📦 **Archived Runs**: {stats['archived']} (to {ARCHIVE_DIR})
+🗑️ **Deleted Runs**: {stats['deleted']} ({stats['bytes_freed'] / (1024 * 1024):.1f}MB freed)"""
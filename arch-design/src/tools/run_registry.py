@@ -0,0 +1,226 @@
+"""
+Registry of tool runs and the output folders and artifacts they produced.
+
+Every tool that writes a ``<name>_<timestamp>/`` folder records it here, so
+generate_diagram_from_yaml finds the most recent folder with one indexed
+query instead of globbing ``*/.folder_info`` and stat-ing every match.
+Runs live in a SQLite database (WAL mode, safe for concurrent tool calls
+and processes) at ``$ARCH_DESIGN_RUN_REGISTRY``, default
+``~/.cache/arch-design/runs.sqlite``.
+
+A run is keyed by its resolved folder path and carries the session that
+created it: servers call ``set_session`` per request so concurrent
+conversations only see their own latest folder (there is no fallback to
+other sessions' runs); without a session only folders under the working
+directory are considered.  Entries whose folder has been deleted by hand
+are dropped when a lookup reaches them; old runs are archived and removed
+by the retention job (retention.py), which is started in the background
+after a run is recorded.  Registry failures are logged and never fail a
+tool.
+"""
+
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .disk_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+RUN_REGISTRY_PATH = Path(os.getenv("ARCH_DESIGN_RUN_REGISTRY", str(DEFAULT_CACHE_DIR / "runs.sqlite"))).expanduser()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id       TEXT PRIMARY KEY,
+    folder       TEXT NOT NULL UNIQUE,
+    session_id   TEXT,
+    tool         TEXT NOT NULL,
+    diagram_name TEXT,
+    created      REAL NOT NULL,
+    updated      REAL NOT NULL,
+    archive      TEXT,
+    owned        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_by_session ON runs (session_id, updated);
+CREATE INDEX IF NOT EXISTS runs_by_updated ON runs (updated);
+CREATE TABLE IF NOT EXISTS artifacts (
+    run_id  TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    path    TEXT NOT NULL,
+    kind    TEXT NOT NULL,
+    size    INTEGER,
+    created REAL NOT NULL,
+    PRIMARY KEY (run_id, path)
+);
+"""
+
+current_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("arch_design_session", default=None)
+
+_connection: Optional[sqlite3.Connection] = None
+_connection_lock = threading.Lock()
+
+
+def set_session(session_id: Optional[str]) -> contextvars.Token:
+    """Attribute runs recorded in the current context to ``session_id``."""
+    return current_session.set(session_id)
+
+
+# ---------------------------------------------------------------------------
+# Connection
+# ---------------------------------------------------------------------------
+
+def _get_connection() -> sqlite3.Connection:
+    """Open the registry once per process, creating the schema if needed."""
+    global _connection
+
+    if _connection is None:
+        RUN_REGISTRY_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(RUN_REGISTRY_PATH), timeout=10, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+        if "archive" not in columns:
+            conn.execute("ALTER TABLE runs ADD COLUMN archive TEXT")
+        if "owned" not in columns:
+            conn.execute("ALTER TABLE runs ADD COLUMN owned INTEGER NOT NULL DEFAULT 0")
+        _connection = conn
+    return _connection
+
+
+def _folder_key(folder) -> str:
+    return str(Path(folder).resolve())
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+def record_run(folder, tool: str, diagram_name: Optional[str] = None, artifacts: Iterable = (),
+               created: bool = False) -> Optional[str]:
+    """Record that ``tool`` wrote ``artifacts`` (paths) to ``folder``; returns the run ID.
+
+    ``created`` says the tool made the folder itself; only such runs are ever
+    archived or deleted by retention.  Recording into a folder that is already
+    registered adds to that run and makes it the most recent one.
+    """
+    now = time.time()
+    key = _folder_key(folder)
+    try:
+        with _connection_lock:
+            conn = _get_connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO runs (run_id, folder, session_id, tool, diagram_name, created, updated, owned) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (folder) DO UPDATE SET updated = excluded.updated, archive = NULL, "
+                    "owned = MAX(runs.owned, excluded.owned), "
+                    "session_id = COALESCE(excluded.session_id, runs.session_id), "
+                    "diagram_name = COALESCE(excluded.diagram_name, runs.diagram_name)",
+                    (uuid.uuid4().hex, key, current_session.get(), tool, diagram_name, now, now, int(created)),
+                )
+                run_id = conn.execute("SELECT run_id FROM runs WHERE folder = ?", (key,)).fetchone()["run_id"]
+                for path in artifacts:
+                    path = Path(path)
+                    size = path.stat().st_size if path.exists() else None
+                    conn.execute(
+                        "INSERT OR REPLACE INTO artifacts (run_id, path, kind, size, created) VALUES (?, ?, ?, ?, ?)",
+                        (run_id, str(path.resolve()), path.suffix.lstrip(".") or "file", size, now),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    except Exception as e:
+        logger.warning(f"Failed to record run for {folder} in {RUN_REGISTRY_PATH}: {e}")
+        return None
+
+    from .retention import maybe_enforce_retention
+    maybe_enforce_retention()
+    return run_id
+
+
+def mark_archived(run_id: str, archive_path) -> None:
+    """Record that a run's folder was compacted into ``archive_path`` (and removed)."""
+    with _connection_lock:
+        _get_connection().execute("UPDATE runs SET archive = ? WHERE run_id = ?", (str(archive_path), run_id))
+
+
+def delete_run(run_id: str) -> None:
+    """Remove a run and its artifacts from the registry; files on disk are left alone."""
+    with _connection_lock:
+        _get_connection().execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+
+# ---------------------------------------------------------------------------
+# Lookups
+# ---------------------------------------------------------------------------
+
+def latest_run_folder(session_id: Optional[str] = None) -> Optional[str]:
+    """Folder of the most recent run that still exists, or None.
+
+    With a session (``session_id``, default: the current session) only that
+    session's runs are considered, so one conversation never writes into
+    another's folder; without one (CLI use) the registry, shared by every
+    process of the user, is limited to folders under the working directory.
+    Archived runs are skipped; runs whose folder was deleted are dropped from
+    the registry.
+    """
+    session_id = session_id or current_session.get()
+    if session_id:
+        sql = "SELECT run_id, folder FROM runs WHERE session_id = ? AND archive IS NULL ORDER BY updated DESC LIMIT 1"
+        params = (session_id,)
+    else:
+        prefix = os.path.join(_folder_key(Path.cwd()), "")
+        sql = ("SELECT run_id, folder FROM runs WHERE substr(folder, 1, length(?)) = ? AND archive IS NULL "
+               "ORDER BY updated DESC LIMIT 1")
+        params = (prefix, prefix)
+
+    try:
+        with _connection_lock:
+            conn = _get_connection()
+            while True:
+                row = conn.execute(sql, params).fetchone()
+                if row is None:
+                    break
+                if Path(row["folder"]).is_dir():
+                    return row["folder"]
+                conn.execute("DELETE FROM runs WHERE run_id = ?", (row["run_id"],))
+    except Exception as e:
+        logger.warning(f"Failed to look up the latest run in {RUN_REGISTRY_PATH}: {e}")
+    return None
+
+
+def get_run(run_id: str) -> Optional[Dict]:
+    """A run and its artifacts, or None if it is not registered."""
+    with _connection_lock:
+        conn = _get_connection()
+        row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = dict(row)
+        run["artifacts"] = [
+            dict(a) for a in conn.execute("SELECT path, kind, size, created FROM artifacts WHERE run_id = ? ORDER BY created", (run_id,))
+        ]
+    return run
+
+
+def list_runs(limit: int = 20, session_id: Optional[str] = None) -> List[Dict]:
+    """The most recent runs, newest first, optionally for one session (``limit=-1`` for all)."""
+    with _connection_lock:
+        conn = _get_connection()
+        if session_id:
+            rows = conn.execute(
+                "SELECT * FROM runs WHERE session_id = ? ORDER BY updated DESC LIMIT ?", (session_id, limit)
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM runs ORDER BY updated DESC LIMIT ?", (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
@@ -3,11 +3,23 @@ import json
 import yaml
 import re
 import os
+import glob
+import fnmatch
 import logging
-import boto3
-from pathlib import Path
+import pickle
+import sys
+import zlib
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path, PurePosixPath
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from .aws_clients import get_client, stream_bedrock_array
+from .diagram_nodes import create_node
+from .disk_cache import DiskCache, atomic_render, get_render_cache, make_key, render_cache_key
+from .json_stream import IncompleteJsonError, JsonStreamReader, decode_chunks
+from .run_registry import record_run
 
 logger = logging.getLogger(__name__)
 
@@ -157,35 +169,463 @@ SKIP_RESOURCE_TYPES = {
 # State file reading
 # ---------------------------------------------------------------------------
 
-def _read_local_tfstate(path: str) -> dict:
-    """Read a terraform.tfstate file from a local path."""
+# Instance attributes used for naming and relationship inference; everything
+# else in a resource's state is dropped while streaming.
+RELATIONSHIP_ATTRIBUTES = {"tags", "load_balancer_type", "arn", "cluster", "load_balancer"}
+
+# Top-level state fields kept alongside the resources
+STATE_METADATA_KEYS = ("version", "terraform_version", "serial", "lineage")
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Concurrent state reads when a source expands to many files
+TFSTATE_FETCH_WORKERS = int(os.getenv("TFSTATE_FETCH_WORKERS", "8"))
+
+# Parsed states, keyed by source and read options and validated against the
+# S3 ETag (conditional GET) or the local file's mtime and size
+STATE_CACHE_ENABLED = os.getenv("TFSTATE_CACHE", "on").lower() not in ("0", "off", "false", "no")
+STATE_CACHE_MAX_MB = int(os.getenv("TFSTATE_CACHE_MB", "512"))
+# Bump when the shape of parsed states changes so stale entries are ignored
+STATE_CACHE_FORMAT = 2
+
+_state_cache: Optional[DiskCache] = None
+
+# Attributes whose values identify a resource when referenced from elsewhere
+IDENTITY_ATTRIBUTES = {"arn", "id", "dns_name", "invoke_arn", "qualified_arn"}
+
+# Attributes never scanned for references to other resources (a resource's
+# own name would otherwise match another resource whose ID is the same name)
+NON_REFERENCE_ATTRIBUTES = {"tags", "tags_all", "name", "name_prefix", "description"}
+
+# Shorter strings ("main", "1", "true") are too ambiguous to match on
+MIN_IDENTITY_LENGTH = 6
+MAX_REFERENCE_LENGTH = 2048
+
+_ARN_PATTERN = re.compile(r"arn:aws[a-z-]*:[a-z0-9-]+:[a-z0-9-]*:\d{0,12}:[^\s\"',()\[\]{}]+")
+
+# Shapes of values kept as references from any attribute: generated EC2/VPC/EFS
+# IDs and AWS DNS names.  Anything else (names, URLs, free text) is only kept
+# from the attributes the bridge and alias rules read, so a state's memory
+# footprint does not grow with every string it contains.
+_AWS_ID_PATTERN = re.compile(
+    r"(?:sg|sgr|subnet|vpc|vpce|i|igw|eigw|nat|rtb|eni|vol|ami|snap|eipalloc|acl|tgw|tgw-attach|pcx|lt|"
+    r"dopt|cgw|vgw|vpn|fs|fsap|fsmt|pl)-[0-9a-f]{8,17}"
+)
+_AWS_DNS_SUFFIXES = (".amazonaws.com", ".cloudfront.net", ".on.aws")
+
+
+def _is_diagrammable(mode: Optional[str], tf_type: Optional[str]) -> bool:
+    """Whether a resource can appear on the diagram. Unknown (not yet read) fields count as a match."""
+    if mode is not None and mode != "managed":
+        return False
+    if tf_type is not None and (tf_type in SKIP_RESOURCE_TYPES or tf_type not in TERRAFORM_TO_DIAGRAM_TYPE):
+        return False
+    return True
+
+
+def _is_referenceable(mode: Optional[str], tf_type: Optional[str]) -> bool:
+    """Whether a resource is kept for reference-graph inference (every managed resource)."""
+    return mode is None or mode == "managed"
+
+
+def _is_reference_shaped(value: str) -> bool:
+    return value.startswith("arn:") or value.endswith(_AWS_DNS_SUFFIXES) or bool(_AWS_ID_PATTERN.fullmatch(value))
+
+
+def _reference_candidates(value: Any, any_token: bool = False) -> Iterator[str]:
+    """Yield the strings in an attribute value that may identify another resource.
+
+    ARNs, generated IDs and AWS DNS names are yielded as is, ARNs embedded in
+    longer strings such as policy documents are extracted, and with
+    ``any_token`` every single-token string (names, API IDs) is yielded too.
+    """
+    if isinstance(value, str):
+        if (MIN_IDENTITY_LENGTH <= len(value) <= MAX_REFERENCE_LENGTH and not any(c.isspace() for c in value)
+                and (any_token or _is_reference_shaped(value))):
+            yield sys.intern(value)
+        if "arn:" in value:
+            for arn in _ARN_PATTERN.findall(value):
+                if arn != value:
+                    yield sys.intern(arn)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _reference_candidates(item, any_token)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _reference_candidates(item, any_token)
+
+
+def _attribute_references(attr: str, value: Any) -> Iterator[str]:
+    """Distinct reference candidates in one top-level attribute."""
+    return iter(dict.fromkeys(_reference_candidates(value, attr in _NAME_REFERENCE_ATTRIBUTES)))
+
+
+def _stream_instance(reader: JsonStreamReader, keep_references: bool = False, keep_digest: bool = False) -> dict:
+    """Read one resource instance, keeping only RELATIONSHIP_ATTRIBUTES.
+
+    With ``keep_references`` the instance also records its identities
+    (IDENTITY_ATTRIBUTES values), the (attribute, string) pairs that may refer
+    to other resources, and its ``dependencies``.  With ``keep_digest`` it
+    records a hash of all of its attributes as ``digest``, so changes to
+    attributes that are otherwise dropped can still be detected.
+    """
+    attrs = {}
+    identities: List[str] = []
+    references: List[Tuple[str, str]] = []
+    dependencies: List[str] = []
+    digest = None
+
+    for key in reader.iter_object():
+        if key == "attributes" and keep_digest and reader.peek() == "{":
+            all_attrs = reader.read_value()
+            digest = make_key(all_attrs)
+            attrs = {attr: value for attr, value in all_attrs.items() if attr in RELATIONSHIP_ATTRIBUTES}
+            if keep_references:
+                for attr, value in all_attrs.items():
+                    if attr in IDENTITY_ATTRIBUTES:
+                        if isinstance(value, str) and len(value) >= MIN_IDENTITY_LENGTH:
+                            identities.append(value)
+                    elif attr not in NON_REFERENCE_ATTRIBUTES:
+                        for candidate in _attribute_references(attr, value):
+                            references.append((attr, candidate))
+        elif key == "attributes" and reader.peek() == "{":
+            for attr in reader.iter_object():
+                if keep_references:
+                    value = reader.read_value()
+                    if attr in IDENTITY_ATTRIBUTES:
+                        if isinstance(value, str) and len(value) >= MIN_IDENTITY_LENGTH:
+                            identities.append(value)
+                    elif attr not in NON_REFERENCE_ATTRIBUTES:
+                        for candidate in _attribute_references(attr, value):
+                            references.append((attr, candidate))
+                    if attr in RELATIONSHIP_ATTRIBUTES:
+                        attrs[attr] = value
+                elif attr in RELATIONSHIP_ATTRIBUTES:
+                    attrs[attr] = reader.read_value()
+                else:
+                    reader.skip_value()
+        elif key == "dependencies" and keep_references and reader.peek() == "[":
+            dependencies = [dep for dep in reader.read_value() if isinstance(dep, str)]
+        else:
+            reader.skip_value()
+
+    instance: Dict[str, Any] = {"attributes": attrs}
+    if digest is not None:
+        instance["digest"] = digest
+    if keep_references:
+        own = set(identities)
+        instance["identities"] = identities
+        instance["references"] = [(attr, value) for attr, value in references if value not in own]
+        instance["dependencies"] = dependencies
+    return instance
+
+
+def _stream_resource(reader: JsonStreamReader, keep_references: bool = False, keep_digest: bool = False) -> Optional[dict]:
+    """Read one entry of ``resources[]``, or skip it if it is not needed."""
+    is_wanted = _is_referenceable if keep_references else _is_diagrammable
+    res: Dict[str, Any] = {}
+    for key in reader.iter_object():
+        if key in ("mode", "type", "name", "module"):
+            res[key] = reader.read_value()
+        elif key == "instances" and reader.peek() == "[" and is_wanted(res.get("mode"), res.get("type")):
+            # Only the first instance is used (count/for_each copies share a node)
+            instances = []
+            for index in reader.iter_array():
+                if index == 0 and reader.peek() == "{":
+                    instances.append(_stream_instance(reader, keep_references, keep_digest))
+                else:
+                    reader.skip_value()
+            res["instances"] = instances
+        else:
+            reader.skip_value()
+
+    if not is_wanted(res.get("mode"), res.get("type", "")):
+        return None
+    return res
+
+
+def _stream_tfstate(chunks, keep_references: bool = False, keep_digest: bool = False) -> dict:
+    """Parse tfstate JSON text chunks without materialising the whole document.
+
+    Returns a state dict shaped like the original (metadata plus a ``resources``
+    list) holding only diagrammable resources with trimmed attributes, and the
+    total number of entries in ``resources[]`` as ``resource_count``.  Memory is
+    bounded by the retained resources rather than the size of the state.
+
+    With ``keep_references`` every managed resource is kept, together with the
+    identities and references used by reference-graph inference.  With
+    ``keep_digest`` each instance carries a hash of its full attributes.
+    """
+    reader = JsonStreamReader(chunks)
+    state: Dict[str, Any] = {"resources": [], "resource_count": 0}
+
+    if reader.peek() != "{":
+        raise ValueError("tfstate is not a JSON object")
+
+    for key in reader.iter_object():
+        if key == "resources" and reader.peek() == "[":
+            for _ in reader.iter_array():
+                state["resource_count"] += 1
+                if reader.peek() != "{":
+                    reader.skip_value()
+                    continue
+                res = _stream_resource(reader, keep_references, keep_digest)
+                if res is not None:
+                    state["resources"].append(res)
+        elif key in STATE_METADATA_KEYS:
+            state[key] = reader.read_value()
+        else:
+            reader.skip_value()
+
+    return state
+
+
+def _get_state_cache() -> Optional[DiskCache]:
+    """Return the cache of parsed states, or None when disabled via TFSTATE_CACHE=off."""
+    global _state_cache
+
+    if not STATE_CACHE_ENABLED:
+        return None
+    if _state_cache is None:
+        _state_cache = DiskCache("tfstates", max_bytes=STATE_CACHE_MAX_MB * 1024 * 1024)
+    return _state_cache
+
+
+def _state_cache_key(source: str, keep_references: bool, keep_digest: bool) -> str:
+    return make_key("tfstate", source, keep_references, keep_digest, STATE_CACHE_FORMAT)
+
+
+def _load_cached_state(cache_key: str) -> Optional[Tuple[str, dict]]:
+    """Return the (version marker, parsed state) stored for a source, or None."""
+    cache = _get_state_cache()
+    data = cache.get_bytes(cache_key, ".state") if cache else None
+    if data is None:
+        return None
+    try:
+        marker, state = pickle.loads(zlib.decompress(data))
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable state cache entry: {e}")
+        return None
+    return marker, state
+
+
+def _store_cached_state(cache_key: str, marker: str, state: dict) -> None:
+    cache = _get_state_cache()
+    if cache and marker:
+        data = zlib.compress(pickle.dumps((marker, state), protocol=pickle.HIGHEST_PROTOCOL), 1)
+        cache.put_bytes(cache_key, data, ".state")
+
+
+def _read_local_tfstate(path: str, keep_references: bool = False, keep_digest: bool = False) -> dict:
+    """Read a terraform.tfstate file from a local path, reusing the parse while the file is unchanged."""
     file_path = Path(path).expanduser().resolve()
     if not file_path.exists():
         raise FileNotFoundError(f"File not found: {file_path}")
     if not file_path.suffix == ".tfstate" and "tfstate" not in file_path.name:
         raise ValueError(f"File does not appear to be a tfstate file: {file_path}")
-    with open(file_path, "r") as f:
-        return json.load(f)
 
+    stat = file_path.stat()
+    marker = f"{stat.st_mtime_ns}:{stat.st_size}"
+    cache_key = _state_cache_key(str(file_path), keep_references, keep_digest)
+    cached = _load_cached_state(cache_key)
+    if cached and cached[0] == marker:
+        logger.info(f"State cache hit for {file_path}")
+        return cached[1]
 
-def _read_s3_tfstate(s3_uri: str) -> dict:
-    """Read a terraform.tfstate file from an S3 bucket."""
-    match = re.match(r"s3://([^/]+)/(.+)", s3_uri)
-    if not match:
+    with open(file_path, "r", encoding="utf-8") as f:
+        state = _stream_tfstate(iter(lambda: f.read(READ_CHUNK_SIZE), ""), keep_references, keep_digest)
+    _store_cached_state(cache_key, marker, state)
+    return state
+
+
+def _split_s3_uri(s3_uri: str, require_key: bool = True) -> Tuple[str, str]:
+    """Split ``s3://bucket/key`` into bucket and key."""
+    match = re.match(r"s3://([^/]+)/?(.*)", s3_uri)
+    if not match or (require_key and not match.group(2)):
         raise ValueError(f"Invalid S3 URI: {s3_uri}. Expected format: s3://bucket/key")
-    bucket, key = match.group(1), match.group(2)
+    return match.group(1), match.group(2)
+
+
+def _read_s3_tfstate(s3_uri: str, keep_references: bool = False, keep_digest: bool = False) -> dict:
+    """Read a terraform.tfstate file from an S3 bucket, streaming the object body.
 
-    s3 = boto3.client("s3")
-    response = s3.get_object(Bucket=bucket, Key=key)
-    content = response["Body"].read().decode("utf-8")
-    return json.loads(content)
+    When a parse of the object is cached, the GET is conditional on its ETag
+    and a 304 Not Modified serves the cached parse without a download.
+    """
+    bucket, key = _split_s3_uri(s3_uri)
+
+    cache_key = _state_cache_key(s3_uri, keep_references, keep_digest)
+    cached = _load_cached_state(cache_key)
+    params = {"Bucket": bucket, "Key": key}
+    if cached:
+        params["IfNoneMatch"] = cached[0]
+
+    try:
+        response = get_client("s3").get_object(**params)
+    except ClientError as e:
+        if cached and e.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+            logger.info(f"State cache hit for {s3_uri} (not modified)")
+            return cached[1]
+        raise
+
+    body = response["Body"]
+    try:
+        state = _stream_tfstate(decode_chunks(body.iter_chunks(READ_CHUNK_SIZE)), keep_references, keep_digest)
+    finally:
+        body.close()
+    _store_cached_state(cache_key, response.get("ETag", ""), state)
+    return state
 
 
-def _read_tfstate(source: str) -> dict:
+def _read_tfstate(source: str, keep_references: bool = False, keep_digest: bool = False) -> dict:
     """Read tfstate from either local file or S3."""
     if source.startswith("s3://"):
-        return _read_s3_tfstate(source)
-    return _read_local_tfstate(source)
+        return _read_s3_tfstate(source, keep_references, keep_digest)
+    return _read_local_tfstate(source, keep_references, keep_digest)
+
+
+# ---------------------------------------------------------------------------
+# Multi-state workspaces
+# ---------------------------------------------------------------------------
+
+def _list_s3_tfstates(bucket: str, prefix: str, pattern: Optional[str] = None) -> List[str]:
+    """List ``.tfstate`` objects under a prefix, optionally filtered by a glob pattern on the key."""
+    paginator = get_client("s3").get_paginator("list_objects_v2")
+    uris = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            if not key.endswith(".tfstate"):
+                continue
+            if pattern is not None and not fnmatch.fnmatchcase(key, pattern):
+                continue
+            uris.append(f"s3://{bucket}/{key}")
+    return sorted(uris)
+
+
+def _expand_sources(source: str) -> List[str]:
+    """Expand a source spec into individual state files.
+
+    Accepts a comma-separated list whose items are each a local path, a local
+    glob (``stacks/**/*.tfstate``), a local directory, an S3 object URI, an S3
+    prefix (``s3://bucket/env/``) or an S3 key glob (``s3://bucket/env/*/terraform.tfstate``).
+    """
+    sources: List[str] = []
+    for item in (part.strip() for part in source.split(",")):
+        if not item:
+            continue
+        if item.startswith("s3://"):
+            bucket, key = _split_s3_uri(item, require_key=False)
+            if glob.has_magic(key):
+                prefix = key[:min(key.find(c) for c in "*?[" if c in key)]
+                sources.extend(_list_s3_tfstates(bucket, prefix, pattern=key))
+            elif not key or key.endswith("/"):
+                sources.extend(_list_s3_tfstates(bucket, key))
+            else:
+                sources.append(item)
+        elif glob.has_magic(item):
+            sources.extend(sorted(glob.glob(os.path.expanduser(item), recursive=True)))
+        elif Path(item).expanduser().is_dir():
+            sources.extend(sorted(str(p) for p in Path(item).expanduser().rglob("*.tfstate")))
+        else:
+            sources.append(item)
+    return list(dict.fromkeys(sources))
+
+
+def _stack_name(source: str) -> str:
+    """Short stack name for a state file: its file stem, or its folder for ``terraform.tfstate``."""
+    path = PurePosixPath(source[len("s3://"):].split("/", 1)[-1] if source.startswith("s3://") else Path(source).as_posix())
+    stem = path.name[: -len(".tfstate")] if path.name.endswith(".tfstate") else path.stem
+    if stem in ("", "terraform", "default") and path.parent.name:
+        stem = path.parent.name
+    return re.sub(r"[^a-zA-Z0-9]+", "_", stem).strip("_").lower() or "stack"
+
+
+def _merge_states(states: List[Tuple[str, dict]]) -> dict:
+    """Merge several states into one, namespacing each stack's resources as a module.
+
+    Resource modules and dependency addresses get a ``module.<stack>`` prefix,
+    so ids stay unique, each stack becomes a cluster, and reference-graph
+    inference links resources across stacks through the ARNs they share.
+    """
+    if len(states) == 1:
+        return states[0][1]
+
+    merged: Dict[str, Any] = {
+        "version": min(state.get("version", 0) for _, state in states),
+        "serial": None,
+        "lineage": None,
+        "resources": [],
+        "resource_count": 0,
+        "sources": [],
+    }
+    used_names: set = set()
+
+    for source, state in states:
+        stack = _stack_name(source)
+        suffix = 2
+        while stack in used_names:
+            stack = f"{_stack_name(source)}_{suffix}"
+            suffix += 1
+        used_names.add(stack)
+        prefix = f"module.{stack}"
+
+        for res in state.get("resources", []):
+            res = dict(res, module=f"{prefix}.{res['module']}" if res.get("module") else prefix)
+            if res.get("instances") and res["instances"][0].get("dependencies"):
+                instance = dict(res["instances"][0])
+                instance["dependencies"] = [f"{prefix}.{dep}" for dep in instance["dependencies"]]
+                res["instances"] = [instance] + res["instances"][1:]
+            merged["resources"].append(res)
+
+        merged["resource_count"] += state.get("resource_count", len(state.get("resources", [])))
+        merged["sources"].append({
+            "source": source,
+            "stack": stack,
+            "version": state.get("version"),
+            "serial": state.get("serial"),
+            "lineage": state.get("lineage"),
+        })
+
+    return merged
+
+
+def _read_tfstates(
+    source: str,
+    keep_references: bool = False,
+    sources: Optional[List[str]] = None,
+    keep_digest: bool = False,
+) -> Tuple[dict, List[str]]:
+    """Read one or many state files concurrently and merge them.
+
+    ``sources`` skips expanding ``source`` again when the caller already did.
+    Returns the merged state and a list of per-source errors; raises only if
+    no source could be read.
+    """
+    if sources is None:
+        sources = _expand_sources(source)
+    if not sources:
+        raise FileNotFoundError(f"No tfstate files match: {source}")
+    if len(sources) == 1:
+        return _read_tfstate(sources[0], keep_references, keep_digest), []
+
+    states: Dict[str, dict] = {}
+    errors: List[str] = []
+    with ThreadPoolExecutor(max_workers=min(TFSTATE_FETCH_WORKERS, len(sources))) as pool:
+        futures = {pool.submit(_read_tfstate, src, keep_references, keep_digest): src for src in sources}
+        for future in as_completed(futures):
+            src = futures[future]
+            try:
+                states[src] = future.result()
+            except Exception as e:
+                logger.warning(f"Failed to read {src}: {e}")
+                errors.append(f"{src}: {e}")
+
+    if not states:
+        raise ValueError(f"Could not read any of {len(sources)} state files: " + "; ".join(errors))
+
+    logger.info(f"Read {len(states)} of {len(sources)} state files")
+    return _merge_states([(src, states[src]) for src in sources if src in states]), errors
 
 
 # ---------------------------------------------------------------------------
@@ -248,164 +688,190 @@ def _parse_resources(state: dict) -> List[Dict[str, Any]]:
 # Relationship inference
 # ---------------------------------------------------------------------------
 
+# Per-type inference rules, applied in order to every resource of the type.
+# Each rule resolves target resource ids and adds one edge per target
+# (resource → target, or target → resource when "reverse" is set):
+#   arn:   ids of resources whose ARN is in attribute "attribute" (or in
+#          "field" of each entry of that attribute when it is a list of blocks)
+#   first: the first resource of the first type in "types" that exists (1:1)
+#   all:   every resource of every type in "types", skipped entirely when a
+#          resource of type "unless" exists
+# Pattern rules are selective (1:1 or 1:few) — never every compute to every database.
+RELATIONSHIP_RULES: Dict[str, List[Dict[str, Any]]] = {
+    "aws_ecs_service": [
+        # Precise ARN-based connections: target group → service, cluster → service
+        {"kind": "arn", "attribute": "load_balancer", "field": "target_group_arn", "label": "Routes To", "reverse": True},
+        {"kind": "arn", "attribute": "cluster", "label": "Runs", "reverse": True},
+        # Services (not clusters/tasks/ECR) → RDS / DynamoDB / ElastiCache
+        {"kind": "all", "types": ("aws_db_instance", "aws_rds_cluster", "aws_dynamodb_table"), "label": "Reads/Writes"},
+        {"kind": "all", "types": ("aws_elasticache_cluster", "aws_elasticache_replication_group"), "label": "Cache"},
+    ],
+    "aws_route53_zone": [
+        {"kind": "first", "types": ("aws_cloudfront_distribution", "aws_lb"), "label": "DNS"},
+    ],
+    "aws_cloudfront_distribution": [
+        {"kind": "first", "types": ("aws_lb",), "label": "Origin"},
+        {"kind": "all", "types": ("aws_s3_bucket",), "label": "Static Assets"},
+    ],
+    "aws_wafv2_web_acl": [
+        {"kind": "first", "types": ("aws_lb", "aws_cloudfront_distribution"), "label": "Protects"},
+    ],
+    "aws_waf_web_acl": [
+        {"kind": "first", "types": ("aws_lb", "aws_cloudfront_distribution"), "label": "Protects"},
+    ],
+    # ALB → ECS services only; EC2 or EKS when there is no ECS
+    "aws_lb": [
+        {"kind": "all", "types": ("aws_ecs_service",), "label": "Routes To"},
+        {"kind": "all", "types": ("aws_instance", "aws_eks_cluster"), "label": "Routes To", "unless": "aws_ecs_service"},
+    ],
+    "aws_alb": [
+        {"kind": "all", "types": ("aws_ecs_service",), "label": "Routes To"},
+        {"kind": "all", "types": ("aws_instance", "aws_eks_cluster"), "label": "Routes To", "unless": "aws_ecs_service"},
+    ],
+    "aws_api_gateway_rest_api": [
+        {"kind": "all", "types": ("aws_lambda_function",), "label": "Invokes"},
+    ],
+    "aws_apigatewayv2_api": [
+        {"kind": "all", "types": ("aws_lambda_function",), "label": "Invokes"},
+    ],
+    # Lambda ← SQS (consumer), Lambda → S3
+    "aws_lambda_function": [
+        {"kind": "all", "types": ("aws_sqs_queue",), "label": "Triggers", "reverse": True},
+        {"kind": "all", "types": ("aws_s3_bucket",), "label": "Reads/Writes"},
+    ],
+    "aws_sns_topic": [
+        {"kind": "all", "types": ("aws_sqs_queue",), "label": "Fanout"},
+        {"kind": "all", "types": ("aws_lambda_function",), "label": "Notifies"},
+    ],
+    "aws_kinesis_stream": [
+        {"kind": "all", "types": ("aws_lambda_function",), "label": "Streams To"},
+        {"kind": "all", "types": ("aws_kinesis_firehose_delivery_stream",), "label": "Delivers To"},
+    ],
+    "aws_sfn_state_machine": [
+        {"kind": "all", "types": ("aws_lambda_function",), "label": "Orchestrates"},
+    ],
+    "aws_codepipeline": [
+        {"kind": "all", "types": ("aws_codebuild_project",), "label": "Builds"},
+        {"kind": "first", "types": ("aws_ecs_service", "aws_lambda_function"), "label": "Deploys"},
+    ],
+    "aws_codebuild_project": [
+        {"kind": "all", "types": ("aws_ecr_repository",), "label": "Pushes Image"},
+    ],
+    # Cognito → ALB / API Gateway (auth provider)
+    "aws_cognito_user_pool": [
+        {"kind": "first", "types": ("aws_lb", "aws_api_gateway_rest_api"), "label": "Authenticates"},
+    ],
+}
+
+
+def _rule_targets(
+    rule: Dict[str, Any],
+    attrs: Dict[str, Any],
+    ids_by_type: Dict[str, List[str]],
+    id_by_arn: Dict[str, str],
+) -> List[str]:
+    """Resolve the target resource ids of one rule from the type and ARN indexes."""
+    kind = rule["kind"]
+
+    if kind == "arn":
+        value = attrs.get(rule["attribute"])
+        if "field" in rule:
+            arns = [block.get(rule["field"], "") for block in value or [] if isinstance(block, dict)]
+        else:
+            arns = [value]
+        return [id_by_arn[arn] for arn in arns if arn and arn in id_by_arn]
+
+    if kind == "first":
+        for tf_type in rule["types"]:
+            if ids_by_type.get(tf_type):
+                return ids_by_type[tf_type][:1]
+        return []
+
+    if rule.get("unless") and ids_by_type.get(rule["unless"]):
+        return []
+    return [rid for tf_type in rule["types"] for rid in ids_by_type.get(tf_type, ())]
+
+
 def _infer_relationships(resources: List[Dict[str, Any]]) -> List[Tuple[str, str, str]]:
     """Infer relationships between resources from their attributes.
 
     Uses ARN-based lookups for precise connections and falls back to
     architectural patterns only for 1:1 or 1:few connections — never
-    connects every compute to every database.
+    connects every compute to every database.  Resource ids are computed
+    once and RELATIONSHIP_RULES are joined against per-type id buckets and
+    an ARN index, so no per-pair work is repeated.
 
     Returns list of (source_id, target_id, label) tuples.
     """
-    relationships: List[Tuple[str, str, str]] = []
+    ids = [_resource_id(res) for res in resources]
     id_by_arn: Dict[str, str] = {}
-    res_by_type: Dict[str, List[Dict]] = {}
+    ids_by_type: Dict[str, List[str]] = {}
 
-    for res in resources:
-        rid = _resource_id(res)
+    for res, rid in zip(resources, ids):
         arn = res["attrs"].get("arn", "")
         if arn:
             id_by_arn[arn] = rid
-        res_by_type.setdefault(res["tf_type"], []).append(res)
+        ids_by_type.setdefault(res["tf_type"], []).append(rid)
 
+    relationships: List[Tuple[str, str, str]] = []
     seen = set()
 
-    def _first_id(tf_type: str) -> Optional[str]:
-        items = res_by_type.get(tf_type, [])
-        return _resource_id(items[0]) if items else None
+    for res, rid in zip(resources, ids):
+        for rule in RELATIONSHIP_RULES.get(res["tf_type"], ()):
+            for target in _rule_targets(rule, res["attrs"], ids_by_type, id_by_arn):
+                if rule.get("reverse"):
+                    _add_rel(relationships, seen, target, rid, rule["label"])
+                else:
+                    _add_rel(relationships, seen, rid, target, rule["label"])
+
+    return relationships
+
+
+def _stack_pattern_relationships(resources: List[Dict[str, Any]], state: dict) -> List[Tuple[str, str, str]]:
+    """Run _infer_relationships once per stack of a merged state.
 
+    Type patterns only say that resources *could* be connected, which holds
+    within one stack but not across unrelated ones; edges between stacks come
+    from _infer_reference_relationships alone.
+    """
+    prefixes = [f"module.{s['stack']}" for s in state.get("sources", ())]
+    if len(prefixes) < 2:
+        return _infer_relationships(resources)
+
+    by_stack: Dict[str, List[Dict[str, Any]]] = {}
     for res in resources:
-        rid = _resource_id(res)
-        attrs = res["attrs"]
-        tf_type = res["tf_type"]
-
-        # --- Precise ARN-based connections ---
-
-        # ECS service → target group (via load_balancer config)
-        if tf_type == "aws_ecs_service":
-            for lb_conf in attrs.get("load_balancer", []):
-                tg_arn = lb_conf.get("target_group_arn", "")
-                if tg_arn and tg_arn in id_by_arn:
-                    _add_rel(relationships, seen, id_by_arn[tg_arn], rid, "Routes To")
-
-        # ECS service → its cluster
-        if tf_type == "aws_ecs_service":
-            cluster_arn = attrs.get("cluster", "")
-            if cluster_arn and cluster_arn in id_by_arn:
-                _add_rel(relationships, seen, id_by_arn[cluster_arn], rid, "Runs")
-
-        # --- Architectural flow (selective, not N×M) ---
-
-        # Route53 → CloudFront (1:1)
-        if tf_type == "aws_route53_zone":
-            tgt = _first_id("aws_cloudfront_distribution")
-            if tgt:
-                _add_rel(relationships, seen, rid, tgt, "DNS")
-            else:
-                tgt = _first_id("aws_lb")
-                if tgt:
-                    _add_rel(relationships, seen, rid, tgt, "DNS")
-
-        # CloudFront → ALB + S3
-        if tf_type == "aws_cloudfront_distribution":
-            tgt = _first_id("aws_lb")
-            if tgt:
-                _add_rel(relationships, seen, rid, tgt, "Origin")
-            for s3 in res_by_type.get("aws_s3_bucket", []):
-                _add_rel(relationships, seen, rid, _resource_id(s3), "Static Assets")
-
-        # WAF → ALB or CloudFront (1:1)
-        if tf_type in ("aws_wafv2_web_acl", "aws_waf_web_acl"):
-            tgt = _first_id("aws_lb") or _first_id("aws_cloudfront_distribution")
-            if tgt:
-                _add_rel(relationships, seen, rid, tgt, "Protects")
-
-        # ALB → ECS services only (not all compute)
-        if tf_type in ("aws_lb", "aws_alb"):
-            for svc in res_by_type.get("aws_ecs_service", []):
-                _add_rel(relationships, seen, rid, _resource_id(svc), "Routes To")
-            # If no ECS, try EC2 or EKS
-            if not res_by_type.get("aws_ecs_service"):
-                for inst in res_by_type.get("aws_instance", []):
-                    _add_rel(relationships, seen, rid, _resource_id(inst), "Routes To")
-                for eks in res_by_type.get("aws_eks_cluster", []):
-                    _add_rel(relationships, seen, rid, _resource_id(eks), "Routes To")
-
-        # API Gateway → Lambda
-        if tf_type in ("aws_api_gateway_rest_api", "aws_apigatewayv2_api"):
-            for lam in res_by_type.get("aws_lambda_function", []):
-                _add_rel(relationships, seen, rid, _resource_id(lam), "Invokes")
-
-        # ECS services → RDS / DynamoDB / ElastiCache (services only, not clusters/tasks/ECR)
-        if tf_type == "aws_ecs_service":
-            for db in res_by_type.get("aws_db_instance", []):
-                _add_rel(relationships, seen, rid, _resource_id(db), "Reads/Writes")
-            for db in res_by_type.get("aws_rds_cluster", []):
-                _add_rel(relationships, seen, rid, _resource_id(db), "Reads/Writes")
-            for ddb in res_by_type.get("aws_dynamodb_table", []):
-                _add_rel(relationships, seen, rid, _resource_id(ddb), "Reads/Writes")
-            for cache in res_by_type.get("aws_elasticache_cluster", []) + res_by_type.get("aws_elasticache_replication_group", []):
-                _add_rel(relationships, seen, rid, _resource_id(cache), "Cache")
-
-        # Lambda → SQS (consumer), SNS (publisher)
-        if tf_type == "aws_lambda_function":
-            for q in res_by_type.get("aws_sqs_queue", []):
-                _add_rel(relationships, seen, _resource_id(q), rid, "Triggers")
-            for s3 in res_by_type.get("aws_s3_bucket", []):
-                _add_rel(relationships, seen, rid, _resource_id(s3), "Reads/Writes")
-
-        # SNS → SQS fanout, SNS → Lambda
-        if tf_type == "aws_sns_topic":
-            for q in res_by_type.get("aws_sqs_queue", []):
-                _add_rel(relationships, seen, rid, _resource_id(q), "Fanout")
-            for lam in res_by_type.get("aws_lambda_function", []):
-                _add_rel(relationships, seen, rid, _resource_id(lam), "Notifies")
-
-        # Kinesis → Lambda / Firehose
-        if tf_type == "aws_kinesis_stream":
-            for lam in res_by_type.get("aws_lambda_function", []):
-                _add_rel(relationships, seen, rid, _resource_id(lam), "Streams To")
-            for fh in res_by_type.get("aws_kinesis_firehose_delivery_stream", []):
-                _add_rel(relationships, seen, rid, _resource_id(fh), "Delivers To")
-
-        # Step Functions → Lambda
-        if tf_type == "aws_sfn_state_machine":
-            for lam in res_by_type.get("aws_lambda_function", []):
-                _add_rel(relationships, seen, rid, _resource_id(lam), "Orchestrates")
-
-        # CodePipeline → CodeBuild
-        if tf_type == "aws_codepipeline":
-            for cb in res_by_type.get("aws_codebuild_project", []):
-                _add_rel(relationships, seen, rid, _resource_id(cb), "Builds")
-            tgt = _first_id("aws_ecs_service") or _first_id("aws_lambda_function")
-            if tgt:
-                _add_rel(relationships, seen, rid, tgt, "Deploys")
-
-        # CodeBuild → ECR
-        if tf_type == "aws_codebuild_project":
-            for ecr in res_by_type.get("aws_ecr_repository", []):
-                _add_rel(relationships, seen, rid, _resource_id(ecr), "Pushes Image")
-
-        # Cognito → ALB / API Gateway (auth provider)
-        if tf_type == "aws_cognito_user_pool":
-            tgt = _first_id("aws_lb") or _first_id("aws_api_gateway_rest_api")
-            if tgt:
-                _add_rel(relationships, seen, rid, tgt, "Authenticates")
+        module = res["module"] or ""
+        stack = next((p for p in prefixes if module == p or module.startswith(f"{p}.")), "")
+        by_stack.setdefault(stack, []).append(res)
 
+    relationships: List[Tuple[str, str, str]] = []
+    seen: set = set()
+    for stack_resources in by_stack.values():
+        for src, tgt, label in _infer_relationships(stack_resources):
+            _add_rel(relationships, seen, src, tgt, label)
     return relationships
 
 
-def _resource_id(res: Dict[str, Any]) -> str:
-    """Generate a stable, unique diagram resource ID from tf_type + tf_name."""
-    module = res["module"].replace("module.", "").replace(".", "_") if res["module"] else ""
+_NON_ALPHANUMERIC = re.compile(r"[^a-zA-Z0-9]")
+_REPEATED_UNDERSCORES = re.compile(r"_+")
+
+
+@lru_cache(maxsize=65536)
+def _make_resource_id(module: str, tf_type: str, tf_name: str) -> str:
+    module = module.replace("module.", "").replace(".", "_") if module else ""
     # Use short type prefix + name to guarantee uniqueness across different resource types
-    tf_short = res["tf_type"].replace("aws_", "").replace("v2_", "")
-    base = re.sub(r"[^a-zA-Z0-9]", "_", f"{tf_short}_{res['tf_name']}").lower()
+    tf_short = tf_type.replace("aws_", "").replace("v2_", "")
+    base = _NON_ALPHANUMERIC.sub("_", f"{tf_short}_{tf_name}").lower()
     # Collapse repeated underscores
-    base = re.sub(r"_+", "_", base).strip("_")
+    base = _REPEATED_UNDERSCORES.sub("_", base).strip("_")
     return f"{module}_{base}" if module else base
 
 
+def _resource_id(res: Dict[str, Any]) -> str:
+    """Generate a stable, unique diagram resource ID from tf_type + tf_name (memoised)."""
+    return _make_resource_id(res["module"], res["tf_type"], res["tf_name"])
+
+
 def _add_rel(rels: list, seen: set, src: str, tgt: str, label: str):
     """Add a relationship if not already present."""
     if src == tgt:
@@ -417,82 +883,344 @@ def _add_rel(rels: list, seen: set, src: str, tgt: str, label: str):
 
 
 # ---------------------------------------------------------------------------
-# LLM-enhanced relationship inference
+# Reference-graph relationship inference
 # ---------------------------------------------------------------------------
 
-def _load_bedrock_config() -> dict:
-    """Load Bedrock model config from .agent.yaml so we reuse the same model."""
-    defaults = {
-        "model_id": "us.anthropic.claude-3-7-sonnet-20250219-v1:0",
-        "region_name": "us-west-2",
-    }
-    try:
-        cfg_path = Path(__file__).parent.parent.parent / ".agent.yaml"
-        if cfg_path.exists():
-            cfg = yaml.safe_load(cfg_path.read_text())
-            kwargs = cfg.get("provider", {}).get("kwargs", {})
-            return {
-                "model_id": kwargs.get("model_id", defaults["model_id"]),
-                "region_name": kwargs.get("region_name", defaults["region_name"]),
-            }
-    except Exception:
-        pass
-    return defaults
-
-
-def _call_bedrock(prompt: str, max_tokens: int = 4096) -> str:
-    """Make a direct boto3 call to Bedrock for structured inference."""
-    cfg = _load_bedrock_config()
-    client = boto3.client("bedrock-runtime", region_name=cfg["region_name"])
-
-    response = client.invoke_model(
-        modelId=cfg["model_id"],
-        contentType="application/json",
-        accept="application/json",
-        body=json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": max_tokens,
-            "messages": [{"role": "user", "content": prompt}],
-            "temperature": 0.2,
-        }),
-    )
-    result = json.loads(response["body"].read())
-    return result["content"][0]["text"]
-
-
-def _parse_json_from_llm(text: str):
-    """Extract a JSON array from LLM output, handling markdown fences."""
-    text = text.strip()
-    if "```" in text:
-        parts = text.split("```")
-        for part in parts:
-            cleaned = part.strip()
-            if cleaned.startswith("json"):
-                cleaned = cleaned[4:].strip()
-            if cleaned.startswith("["):
-                try:
-                    return json.loads(cleaned)
-                except json.JSONDecodeError:
-                    continue
-    if text.startswith("["):
-        return json.loads(text)
-    start = text.find("[")
-    end = text.rfind("]")
-    if start != -1 and end != -1:
-        return json.loads(text[start : end + 1])
-    raise ValueError("No JSON array found in LLM response")
+# Plumbing resources that connect two other resources: an edge is drawn from
+# whatever the "from" attributes reference to whatever the "to" attributes
+# reference, e.g. an event source mapping links its queue to its function.
+BRIDGE_RULES: Dict[str, Dict[str, Any]] = {
+    "aws_lambda_event_source_mapping": {"from": ("event_source_arn",), "to": ("function_arn", "function_name"), "label": "Triggers"},
+    "aws_lambda_permission": {"from": ("source_arn",), "to": ("function_name",), "label": "Invokes"},
+    "aws_sns_topic_subscription": {"from": ("topic_arn",), "to": ("endpoint",), "label": "Delivers To"},
+    "aws_s3_bucket_notification": {"from": ("bucket",), "to": ("lambda_function", "queue", "topic"), "label": "Notifies"},
+    "aws_cloudwatch_event_target": {"from": ("rule",), "to": ("arn",), "label": "Triggers"},
+    "aws_pipes_pipe": {"from": ("source",), "to": ("target",), "label": "Pipes To"},
+    "aws_lb_listener": {"from": ("load_balancer_arn",), "to": ("default_action",), "label": "Routes To"},
+    "aws_alb_listener": {"from": ("load_balancer_arn",), "to": ("default_action",), "label": "Routes To"},
+    "aws_lb_listener_rule": {"from": ("listener_arn",), "to": ("action",), "label": "Routes To"},
+    "aws_api_gateway_integration": {"from": ("rest_api_id",), "to": ("uri",), "label": "Invokes"},
+    "aws_apigatewayv2_integration": {"from": ("api_id",), "to": ("integration_uri",), "label": "Invokes"},
+    "aws_wafv2_web_acl_association": {"from": ("web_acl_arn",), "to": ("resource_arn",), "label": "Protects"},
+}
 
+# Non-diagram resources that stand for diagram resources when a bridge points
+# at them: a target group stands for the services registered with it, a
+# listener for its load balancer.
+#   "referrers": diagram resources referencing it (and members added by ALIAS_MEMBER_RULES)
+#   tuple:       diagram resources it references through these attributes
+ALIAS_EXPANSIONS: Dict[str, Any] = {
+    "aws_lb_target_group": "referrers",
+    "aws_alb_target_group": "referrers",
+    "aws_lb_listener": ("load_balancer_arn",),
+    "aws_alb_listener": ("load_balancer_arn",),
+}
 
-def _llm_enhance_relationships(
+# Resources that register a member with an alias: type → (alias attribute, member attribute)
+ALIAS_MEMBER_RULES: Dict[str, Tuple[str, str]] = {
+    "aws_lb_target_group_attachment": ("target_group_arn", "target_id"),
+    "aws_alb_target_group_attachment": ("target_group_arn", "target_id"),
+}
+
+# Label and direction of a direct reference (referrer → referenced) by
+# (referrer type, referenced type); "*" matches any type.  "reverse" draws
+# the edge from the referenced resource, e.g. a cluster runs its services.
+REFERENCE_OVERRIDES: Dict[Tuple[str, str], Tuple[str, bool]] = {
+    ("aws_ecs_service", "aws_ecs_cluster"): ("Runs", True),
+    ("aws_eks_node_group", "aws_eks_cluster"): ("Runs", True),
+    ("aws_rds_cluster_instance", "aws_rds_cluster"): ("Member Of", False),
+    ("aws_cloudfront_distribution", "aws_wafv2_web_acl"): ("Protects", True),
+    ("aws_cloudfront_distribution", "aws_waf_web_acl"): ("Protects", True),
+    ("aws_route53_record", "aws_route53_zone"): ("DNS", True),
+    ("aws_internet_gateway", "aws_vpc"): ("Attached To", False),
+    ("aws_nat_gateway", "aws_vpc"): ("Attached To", False),
+    ("aws_vpc_endpoint", "aws_vpc"): ("Attached To", False),
+    ("aws_cloudfront_distribution", "*"): ("Origin", False),
+    ("aws_route53_record", "*"): ("DNS", False),
+    ("aws_cloudwatch_metric_alarm", "*"): ("Alerts", False),
+    ("*", "aws_kms_key"): ("Encrypts", True),
+    ("*", "aws_acm_certificate"): ("TLS", False),
+    ("*", "aws_cloudwatch_log_group"): ("Logs To", False),
+}
+
+# Attributes that may refer to other resources by plain name or API ID rather
+# than ARN: those the rules above resolve (function_name, bucket, rest_api_id,
+# target_id, ...) and environment variables (a function's table name)
+_NAME_REFERENCE_ATTRIBUTES = {
+    "environment",
+    *(attr for rule in BRIDGE_RULES.values() for attr in (*rule["from"], *rule["to"])),
+    *(attr for expansion in ALIAS_EXPANSIONS.values() if isinstance(expansion, tuple) for attr in expansion),
+    *(attr for rule in ALIAS_MEMBER_RULES.values() for attr in rule),
+}
+
+# Default label of a direct reference by the referenced resource's category
+REFERENCE_LABELS: Dict[str, str] = {
+    "compute": "Invokes",
+    "network": "Routes To",
+    "database": "Reads/Writes",
+    "storage": "Reads/Writes",
+    "security": "Uses",
+    "integration": "Publishes",
+    "analytics": "Streams To",
+    "monitoring": "Logs To",
+    "devops": "Uses",
+}
+
+# Containers: references to them express placement, not flow, and are only
+# drawn when REFERENCE_OVERRIDES names the pair.
+CONTAINER_TYPES = {"aws_vpc"}
+
+RELATIONSHIP_MODES = ("auto", "references", "patterns")
+
+_INSTANCE_KEY = re.compile(r"\[[^\]]*\]")
+
+
+def _resource_address(module: str, tf_type: str, name: str) -> str:
+    """Terraform address of a resource, e.g. ``module.api.aws_lambda_function.handler``."""
+    return f"{module}.{tf_type}.{name}" if module else f"{tf_type}.{name}"
+
+
+def _reference_records(state: dict) -> List[Dict[str, Any]]:
+    """Collect identities, references and dependencies of every managed resource.
+
+    Requires a state read with ``keep_references=True``.
+    """
+    records = []
+    for res in state.get("resources", []):
+        if res.get("mode") != "managed":
+            continue
+        instances = res.get("instances") or [{}]
+        instance = instances[0]
+        tf_type = res.get("type", "")
+        records.append({
+            "address": _resource_address(res.get("module", ""), tf_type, res.get("name", tf_type)),
+            "tf_type": tf_type,
+            "identities": instance.get("identities", []),
+            "references": instance.get("references", []),
+            "dependencies": instance.get("dependencies", []),
+        })
+    return records
+
+
+def _reference_label(src_type: str, tgt_type: str) -> Optional[Tuple[str, bool]]:
+    """Label and direction for a direct reference, or None if it should not be drawn."""
+    for key in ((src_type, tgt_type), (src_type, "*"), ("*", tgt_type)):
+        if key in REFERENCE_OVERRIDES:
+            return REFERENCE_OVERRIDES[key]
+    if tgt_type in CONTAINER_TYPES:
+        return None
+    mapping = TERRAFORM_TO_DIAGRAM_TYPE.get(tgt_type)
+    return (REFERENCE_LABELS.get(mapping["category"], "Uses"), False) if mapping else None
+
+
+def _infer_reference_relationships(
     resources: List[Dict[str, Any]],
-    deterministic_rels: List[Tuple[str, str, str]],
+    state: dict,
 ) -> List[Tuple[str, str, str]]:
-    """Ask the LLM to review and enhance the deterministic relationships.
+    """Infer relationships from what resources actually reference.
 
-    The LLM receives the full resource list and the relationships already
-    inferred, and can add missing ones, remove incorrect ones, or improve
-    labels.  Returns the enhanced list, or the original if the call fails.
+    Builds one reverse index of every identity string (ARN, ID, DNS name,
+    invoke ARN) in the state, then resolves each resource's attribute strings
+    and ``dependencies`` against it in a single linear pass.  References
+    between two diagram resources become edges labelled by REFERENCE_OVERRIDES
+    or the target's category; plumbing resources (BRIDGE_RULES) become edges
+    between the resources they connect.
+
+    Returns list of (source_id, target_id, label) tuples.
+    """
+    records = _reference_records(state)
+    node_ids = {
+        _resource_address(res["module"], res["tf_type"], res["tf_name"]): _resource_id(res)
+        for res in resources
+    }
+    type_by_address = {rec["address"]: rec["tf_type"] for rec in records}
+
+    # Identity → address.  Diagram resources win collisions with plumbing that
+    # shares their ID (an S3 bucket and its versioning config); other
+    # collisions are ambiguous and resolve to nothing.
+    identity_index: Dict[str, Optional[str]] = {}
+    for rec in records:
+        address = rec["address"]
+        for identity in rec["identities"]:
+            if identity not in identity_index:
+                identity_index[identity] = address
+                continue
+            current = identity_index[identity]
+            if current is None or current == address:
+                continue
+            if (current in node_ids) == (address in node_ids):
+                identity_index[identity] = None
+            elif address in node_ids:
+                identity_index[identity] = address
+
+    address_by_key = {}
+    for address in type_by_address:
+        address_by_key.setdefault(_INSTANCE_KEY.sub("", address), address)
+
+    def _resolve(value: str) -> Optional[str]:
+        address = identity_index.get(value)
+        if address is None and value.startswith("arn:"):
+            # Qualified ARNs (function:name:alias) point at the unqualified resource
+            address = identity_index.get(value.rsplit(":", 1)[0])
+        return address
+
+    # Direct references: address → [(attribute, referenced address)]
+    outgoing: Dict[str, List[Tuple[str, str]]] = {}
+    referrers: Dict[str, List[str]] = {}
+    for rec in records:
+        targets: Dict[str, str] = {}
+        for attr, value in rec["references"]:
+            address = _resolve(value)
+            if address and address != rec["address"]:
+                targets.setdefault(address, attr)
+        for dep in rec["dependencies"]:
+            address = address_by_key.get(_INSTANCE_KEY.sub("", dep))
+            if address and address != rec["address"]:
+                targets.setdefault(address, "dependencies")
+        outgoing[rec["address"]] = [(attr, address) for address, attr in targets.items()]
+        for address in targets:
+            referrers.setdefault(address, []).append(rec["address"])
+
+    def _expand(address: str, depth: int = 0) -> List[str]:
+        """Diagram resource ids an address stands for."""
+        if address in node_ids:
+            return [node_ids[address]]
+        expansion = ALIAS_EXPANSIONS.get(type_by_address.get(address, ""))
+        if expansion is None or depth > 2:
+            return []
+        expanded: List[str] = []
+        if expansion == "referrers":
+            for referrer in referrers.get(address, []):
+                member_rule = ALIAS_MEMBER_RULES.get(type_by_address[referrer])
+                if referrer in node_ids:
+                    expanded.append(node_ids[referrer])
+                elif member_rule:
+                    for attr, member in outgoing[referrer]:
+                        if attr == member_rule[1]:
+                            expanded.extend(_expand(member, depth + 1))
+        else:
+            for attr, target in outgoing.get(address, []):
+                if attr in expansion:
+                    expanded.extend(_expand(target, depth + 1))
+        return expanded
+
+    relationships: List[Tuple[str, str, str]] = []
+    seen = set()
+
+    for rec in records:
+        address, tf_type = rec["address"], rec["tf_type"]
+
+        bridge = BRIDGE_RULES.get(tf_type)
+        if bridge:
+            sources = [rid for attr, target in outgoing[address] if attr in bridge["from"] for rid in _expand(target)]
+            targets = [rid for attr, target in outgoing[address] if attr in bridge["to"] for rid in _expand(target)]
+            for src in sources:
+                for tgt in targets:
+                    _add_rel(relationships, seen, src, tgt, bridge["label"])
+            continue
+
+        rid = node_ids.get(address)
+        if rid is None:
+            continue
+        for _, target in outgoing[address]:
+            target_id = node_ids.get(target)
+            if target_id is None:
+                continue
+            rule = _reference_label(tf_type, type_by_address[target])
+            if rule is None:
+                continue
+            label, reverse = rule
+            if reverse:
+                _add_rel(relationships, seen, target_id, rid, label)
+            else:
+                _add_rel(relationships, seen, rid, target_id, label)
+
+    return relationships
+
+
+def _merge_pattern_relationships(
+    reference_rels: List[Tuple[str, str, str]],
+    pattern_rels: List[Tuple[str, str, str]],
+) -> List[Tuple[str, str, str]]:
+    """Keep reference edges and add pattern edges only for resources the references leave unconnected."""
+    connected = {rid for src, tgt, _ in reference_rels for rid in (src, tgt)}
+    merged = list(reference_rels)
+    seen = {(src, tgt) for src, tgt, _ in reference_rels}
+    for src, tgt, label in pattern_rels:
+        if src in connected and tgt in connected:
+            continue
+        _add_rel(merged, seen, src, tgt, label)
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# LLM-enhanced relationship inference
+# ---------------------------------------------------------------------------
+
+# Resource sets larger than this are split into chunks reviewed by concurrent
+# prompts, so neither the prompt nor the JSON answer outgrows its limits
+LLM_CHUNK_MAX_RESOURCES = int(os.getenv("TFSTATE_LLM_CHUNK_RESOURCES", "60"))
+LLM_CHUNK_WORKERS = int(os.getenv("TFSTATE_LLM_WORKERS", "4"))
+
+# Log streamed LLM progress every this many relationships
+LLM_PROGRESS_EVERY = 25
+
+
+def _partition_for_llm(
+    resources: List[Dict[str, Any]],
+    relationships: List[Tuple[str, str, str]],
+    max_size: int = LLM_CHUNK_MAX_RESOURCES,
+) -> List[List[Dict[str, Any]]]:
+    """Split resources into chunks of at most ``max_size`` that keep connected resources together.
+
+    Connected components of the relationship graph are packed into chunks
+    first-fit in resource order; a component larger than a chunk is split by module and
+    then sliced.  Partitioning is deterministic, so unchanged input yields
+    identical prompts (and Bedrock response cache hits).
     """
+    parent = {_resource_id(r): _resource_id(r) for r in resources}
+
+    def find(rid: str) -> str:
+        while parent[rid] != rid:
+            parent[rid] = parent[parent[rid]]
+            rid = parent[rid]
+        return rid
+
+    for src, tgt, _ in relationships:
+        if src in parent and tgt in parent:
+            parent[find(src)] = find(tgt)
+
+    components: Dict[str, List[Dict[str, Any]]] = {}
+    for res in resources:
+        components.setdefault(find(_resource_id(res)), []).append(res)
+
+    groups: List[List[Dict[str, Any]]] = []
+    for component in components.values():
+        if len(component) <= max_size:
+            groups.append(component)
+            continue
+        by_module: Dict[str, List[Dict[str, Any]]] = {}
+        for res in component:
+            by_module.setdefault(res["module"], []).append(res)
+        for members in by_module.values():
+            groups.extend(members[i:i + max_size] for i in range(0, len(members), max_size))
+
+    # First fit: each group joins the first chunk with room for it
+    chunks: List[List[Dict[str, Any]]] = []
+    for group in groups:
+        for chunk in chunks:
+            if len(chunk) + len(group) <= max_size:
+                chunk.extend(group)
+                break
+        else:
+            chunks.append(list(group))
+    return chunks
+
+
+def _build_enhance_prompt(
+    resources: List[Dict[str, Any]],
+    deterministic_rels: List[Tuple[str, str, str]],
+) -> str:
     resource_desc = "\n".join(
         f"  - id: {_resource_id(r)},  terraform_type: {r['tf_type']},  "
         f"name: {r['resource_name']},  category: {r['category']}"
@@ -502,7 +1230,7 @@ def _llm_enhance_relationships(
         f"  - {src} → {tgt}  label: \"{lbl}\"" for src, tgt, lbl in deterministic_rels
     )
 
-    prompt = f"""You are a Senior AWS Solutions Architect reviewing an infrastructure architecture derived from a Terraform state file.
+    return f"""You are a Senior AWS Solutions Architect reviewing an infrastructure architecture derived from a Terraform state file.
 
 ## Resources (from Terraform state)
 {resource_desc}
@@ -525,31 +1253,103 @@ Return ONLY a JSON array — no markdown, no explanation. Each element:
 
 JSON array:"""
 
-    try:
-        raw = _call_bedrock(prompt)
-        parsed = _parse_json_from_llm(raw)
 
-        valid_ids = {_resource_id(r) for r in resources}
-        enhanced: List[Tuple[str, str, str]] = []
-        seen: set = set()
-        for rel in parsed:
+def _llm_review_relationships(
+    resources: List[Dict[str, Any]],
+    deterministic_rels: List[Tuple[str, str, str]],
+) -> Tuple[List[Tuple[str, str, str]], bool]:
+    """Run one review prompt and return the valid, de-duplicated edges it produced.
+
+    The response is streamed and each edge is validated as it arrives; the
+    stream is closed as soon as the JSON array is.  If the answer is cut off
+    (max_tokens), the edges received are kept, the deterministic edges the
+    review did not reach are added back, and the result is flagged partial.
+    Raises if the call fails or the answer holds no edge at all.
+    """
+    valid_ids = {_resource_id(r) for r in resources}
+    enhanced: List[Tuple[str, str, str]] = []
+    seen: set = set()
+    try:
+        for rel in stream_bedrock_array(_build_enhance_prompt(resources, deterministic_rels)):
+            if not isinstance(rel, dict):
+                continue
             src = rel.get("from_id", "")
             tgt = rel.get("to_id", "")
             lbl = rel.get("label", "")
             if src in valid_ids and tgt in valid_ids and src != tgt:
-                key = (src, tgt)
-                if key not in seen:
-                    seen.add(key)
-                    enhanced.append((src, tgt, lbl))
-
-        logger.info(
-            f"LLM enhanced relationships: {len(deterministic_rels)} deterministic → "
-            f"{len(enhanced)} LLM-derived"
-        )
-        return enhanced if enhanced else deterministic_rels
-    except Exception as e:
-        logger.warning(f"LLM enhancement failed, keeping deterministic relationships: {e}")
-        return deterministic_rels
+                _add_rel(enhanced, seen, src, tgt, lbl if isinstance(lbl, str) else "")
+                if len(enhanced) % LLM_PROGRESS_EVERY == 0:
+                    logger.info(f"LLM review: {len(enhanced)} relationships received")
+    except IncompleteJsonError as e:
+        if not enhanced:
+            raise
+        logger.warning(f"LLM review ended early ({e}), keeping the {len(enhanced)} relationships received")
+        for src, tgt, lbl in deterministic_rels:
+            _add_rel(enhanced, seen, src, tgt, lbl)
+        return enhanced, True
+    return enhanced, False
+
+
+def _llm_enhance_relationships(
+    resources: List[Dict[str, Any]],
+    deterministic_rels: List[Tuple[str, str, str]],
+) -> Tuple[List[Tuple[str, str, str]], bool]:
+    """Ask the LLM to review and enhance the deterministic relationships.
+
+    The LLM receives the resource list and the relationships already
+    inferred, and can add missing ones, remove incorrect ones, or improve
+    labels.  Returns the enhanced list, or the original if the call fails,
+    and whether a review was cut off (see _llm_review_relationships).
+
+    Above LLM_CHUNK_MAX_RESOURCES resources the graph is partitioned
+    (_partition_for_llm) and the chunks are reviewed concurrently.  A chunk
+    whose call fails or returns nothing keeps its deterministic edges, and
+    edges between chunks are kept as inferred.
+    """
+    if len(resources) <= LLM_CHUNK_MAX_RESOURCES:
+        try:
+            enhanced, partial = _llm_review_relationships(resources, deterministic_rels)
+            logger.info(
+                f"LLM enhanced relationships: {len(deterministic_rels)} deterministic → "
+                f"{len(enhanced)} LLM-derived"
+            )
+            return (enhanced, partial) if enhanced else (deterministic_rels, False)
+        except Exception as e:
+            logger.warning(f"LLM enhancement failed, keeping deterministic relationships: {e}")
+            return deterministic_rels, False
+
+    chunks = _partition_for_llm(resources, deterministic_rels)
+    chunk_of = {_resource_id(r): index for index, chunk in enumerate(chunks) for r in chunk}
+    chunk_rels: List[List[Tuple[str, str, str]]] = [[] for _ in chunks]
+    cross_rels: List[Tuple[str, str, str]] = []
+    for rel in deterministic_rels:
+        src_chunk, tgt_chunk = chunk_of.get(rel[0]), chunk_of.get(rel[1])
+        if src_chunk is not None and src_chunk == tgt_chunk:
+            chunk_rels[src_chunk].append(rel)
+        else:
+            cross_rels.append(rel)
+
+    def review(index: int) -> Tuple[List[Tuple[str, str, str]], bool]:
+        try:
+            enhanced, partial = _llm_review_relationships(chunks[index], chunk_rels[index])
+        except Exception as e:
+            logger.warning(f"LLM enhancement of chunk {index + 1}/{len(chunks)} failed, keeping its deterministic relationships: {e}")
+            return chunk_rels[index], False
+        return (enhanced, partial) if enhanced else (chunk_rels[index], False)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(LLM_CHUNK_WORKERS, len(chunks)))) as pool:
+        reviewed = list(pool.map(review, range(len(chunks))))
+
+    merged: List[Tuple[str, str, str]] = []
+    seen: set = set()
+    for src, tgt, lbl in [rel for rels, _ in reviewed for rel in rels] + cross_rels:
+        _add_rel(merged, seen, src, tgt, lbl)
+
+    logger.info(
+        f"LLM enhanced relationships in {len(chunks)} chunks: {len(deterministic_rels)} deterministic → "
+        f"{len(merged)} merged"
+    )
+    return merged, any(partial for _, partial in reviewed)
 
 
 # ---------------------------------------------------------------------------
@@ -643,6 +1443,215 @@ def _build_diagram_yaml(
     return diagram
 
 
+# ---------------------------------------------------------------------------
+# Incremental snapshots
+# ---------------------------------------------------------------------------
+
+SNAPSHOT_CACHE_MAX_MB = int(os.getenv("TFSTATE_SNAPSHOT_CACHE_MB", "256"))
+
+# Change diagram styling
+CHANGE_PREFIXES = {"added": "+ ", "removed": "- ", "modified": "~ "}
+CHANGE_EDGE_STYLES = {
+    "added": {"color": "darkgreen"},
+    "removed": {"color": "firebrick", "style": "dashed"},
+    "modified": {"color": "darkorange"},
+}
+
+_snapshot_cache: Optional[DiskCache] = None
+
+
+def _get_snapshot_cache() -> DiskCache:
+    global _snapshot_cache
+
+    if _snapshot_cache is None:
+        _snapshot_cache = DiskCache("tfstate-snapshots", max_bytes=SNAPSHOT_CACHE_MAX_MB * 1024 * 1024)
+    return _snapshot_cache
+
+
+def _source_fingerprint(source: str) -> str:
+    """Cheap change marker for one state file: the S3 ETag (one HEAD request) or local mtime and size."""
+    if source.startswith("s3://"):
+        bucket, key = _split_s3_uri(source)
+        head = get_client("s3").head_object(Bucket=bucket, Key=key)
+        return f"etag:{head['ETag']}"
+    stat = Path(source).expanduser().resolve().stat()
+    return f"stat:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _source_fingerprints(sources: List[str]) -> Dict[str, str]:
+    if len(sources) == 1:
+        return {sources[0]: _source_fingerprint(sources[0])}
+    with ThreadPoolExecutor(max_workers=min(TFSTATE_FETCH_WORKERS, len(sources))) as pool:
+        return dict(zip(sources, pool.map(_source_fingerprint, sources)))
+
+
+def _state_versions(state: dict, sources: List[str]) -> Dict[str, List[Any]]:
+    """(lineage, serial) of every state that was read, by source."""
+    if "sources" in state:
+        return {s["source"]: [s["lineage"], s["serial"]] for s in state["sources"]}
+    return {sources[0]: [state.get("lineage"), state.get("serial")]}
+
+
+def _resource_digests(resources: List[Dict[str, Any]], state: dict) -> Dict[str, str]:
+    """Digest of each diagram resource's node and full attributes, to detect modified ones."""
+    attribute_digests = {}
+    for raw in state.get("resources", []):
+        tf_type = raw.get("type", "")
+        rid = _make_resource_id(raw.get("module", ""), tf_type, raw.get("name", tf_type))
+        attribute_digests.setdefault(rid, (raw.get("instances") or [{}])[0].get("digest"))
+
+    return {
+        _resource_id(res): make_key(res["resource_name"], res["diagram_type"], attribute_digests.get(_resource_id(res)))
+        for res in resources
+    }
+
+
+def _build_snapshot(
+    fingerprints: Dict[str, str],
+    versions: Dict[str, List[Any]],
+    resources: List[Dict[str, Any]],
+    relationships: List[Tuple[str, str, str]],
+    digests: Dict[str, str],
+    outputs: Dict[str, str],
+) -> dict:
+    return {
+        "fingerprints": fingerprints,
+        "versions": versions,
+        "resources": [
+            {
+                "id": _resource_id(res),
+                "name": res["resource_name"],
+                "type": res["diagram_type"],
+                "digest": digests[_resource_id(res)],
+            }
+            for res in resources
+        ],
+        "relationships": [list(rel) for rel in relationships],
+        "outputs": outputs,
+    }
+
+
+def _diff_snapshots(previous: dict, current: dict) -> Dict[str, Any]:
+    """Added, removed and modified nodes and edges between two snapshots."""
+    old_nodes = {r["id"]: r for r in previous["resources"]}
+    new_nodes = {r["id"]: r for r in current["resources"]}
+    old_edges = {(src, tgt): lbl for src, tgt, lbl in previous["relationships"]}
+    new_edges = {(src, tgt): lbl for src, tgt, lbl in current["relationships"]}
+
+    return {
+        "nodes": {
+            "added": [rid for rid in new_nodes if rid not in old_nodes],
+            "removed": [rid for rid in old_nodes if rid not in new_nodes],
+            "modified": [
+                rid for rid, node in new_nodes.items()
+                if rid in old_nodes and node["digest"] != old_nodes[rid]["digest"]
+            ],
+        },
+        "edges": {
+            "added": [edge for edge in new_edges if edge not in old_edges],
+            "removed": [edge for edge in old_edges if edge not in new_edges],
+            "modified": [edge for edge, lbl in new_edges.items() if edge in old_edges and old_edges[edge] != lbl],
+        },
+    }
+
+
+def _has_changes(diff: Dict[str, Any]) -> bool:
+    return any(diff["nodes"].values()) or any(diff["edges"].values())
+
+
+def _build_change_diagram(previous: dict, current: dict, diff: Dict[str, Any], diagram_name: str) -> dict:
+    """diagrams-as-code structure showing only what changed, with direct neighbours for context.
+
+    Changed nodes get a +/-/~ label prefix; added, removed and relabelled
+    edges are coloured (removed ones dashed).
+    """
+    nodes = {r["id"]: r for r in previous["resources"]}
+    nodes.update({r["id"]: r for r in current["resources"]})
+    node_change = {rid: kind for kind, rids in diff["nodes"].items() for rid in rids}
+    edge_change = {edge: kind for kind, edges in diff["edges"].items() for edge in edges}
+
+    labels = {(src, tgt): lbl for src, tgt, lbl in previous["relationships"]}
+    labels.update({(src, tgt): lbl for src, tgt, lbl in current["relationships"]})
+
+    shown = set(node_change) | {rid for edge in edge_change for rid in edge}
+    for src, tgt in labels:
+        if src in node_change or tgt in node_change:
+            shown.update((src, tgt))
+
+    relates: Dict[str, List[dict]] = {}
+    for (src, tgt), lbl in labels.items():
+        if src not in shown or tgt not in shown:
+            continue
+        entry = {"to": tgt, "direction": "outgoing", "label": lbl}
+        entry.update(CHANGE_EDGE_STYLES.get(edge_change.get((src, tgt)), {}))
+        relates.setdefault(src, []).append(entry)
+
+    yaml_resources = []
+    for rid, node in nodes.items():
+        if rid not in shown:
+            continue
+        entry: Dict[str, Any] = {
+            "id": rid,
+            "name": CHANGE_PREFIXES.get(node_change.get(rid), "") + node["name"],
+            "type": node["type"],
+        }
+        if rid in relates:
+            entry["relates"] = relates[rid]
+        yaml_resources.append(entry)
+
+    return {
+        "diagram": {
+            "name": f"{diagram_name} (changes)",
+            "direction": "top-to-bottom",
+            "format": "png",
+            "open": False,
+            "resources": yaml_resources,
+        }
+    }
+
+
+def _format_diff_summary(diff: Dict[str, Any], limit: int = 10) -> str:
+    lines = []
+    for scope in ("nodes", "edges"):
+        for kind in ("added", "removed", "modified"):
+            items = diff[scope][kind]
+            if not items:
+                continue
+            names = [item if isinstance(item, str) else f"{item[0]} → {item[1]}" for item in items[:limit]]
+            more = f" (+{len(items) - limit} more)" if len(items) > limit else ""
+            lines.append(f"  {CHANGE_PREFIXES[kind]}{len(items)} {scope} {kind}: {', '.join(names)}{more}")
+    return "\n".join(lines) if lines else "  (no changes)"
+
+
+def _format_versions(versions: Dict[str, List[Any]]) -> str:
+    return ", ".join(f"{src} (serial {serial})" for src, (_, serial) in versions.items())
+
+
+def _replaced_states(previous: dict, current: dict) -> List[str]:
+    """Sources whose lineage changed, i.e. the state was recreated rather than updated."""
+    return [
+        src for src, (lineage, _) in current["versions"].items()
+        if src in previous["versions"] and previous["versions"][src][0] != lineage
+    ]
+
+
+def _outputs_exist(snapshot: dict) -> bool:
+    outputs = snapshot.get("outputs", {})
+    return bool(outputs) and all(Path(path).exists() for path in outputs.values())
+
+
+def _unchanged_result(source: str, snapshot: dict, reason: str) -> str:
+    outputs = snapshot["outputs"]
+    return f""" Terraform State Unchanged — nothing re-processed ({reason})
+
+ **Source**: {source}
+ **States**: {_format_versions(snapshot["versions"])}
+ **Resources**: {len(snapshot["resources"])}  |  **Relationships**: {len(snapshot["relationships"])}
+ **YAML File**: {outputs.get("yaml_path", "n/a")}
+ **PNG Diagram**: {outputs.get("png_path", "n/a")}
+"""
+
+
 # ---------------------------------------------------------------------------
 # Strands tools
 # ---------------------------------------------------------------------------
@@ -656,13 +1665,16 @@ def read_tfstate(source: str) -> str:
         source: Path to the tfstate file. Either a local path
                 (e.g. /path/to/terraform.tfstate) or an S3 URI
                 (e.g. s3://my-bucket/env/terraform.tfstate).
+                Several states can be combined: a comma-separated list, a
+                glob (stacks/**/*.tfstate), a directory, an S3 prefix
+                (s3://my-bucket/env/) or an S3 key glob.
 
     Returns:
         JSON summary of managed AWS resources found in the state file including
         resource types, names, and counts by category.
     """
     try:
-        state = _read_tfstate(source)
+        state, read_errors = _read_tfstates(source)
     except FileNotFoundError as e:
         return f"❌ File not found: {e}"
     except Exception as e:
@@ -687,11 +1699,15 @@ def read_tfstate(source: str) -> str:
         "source": source,
         "tfstate_version": state.get("version"),
         "serial": state.get("serial"),
-        "total_managed_resources": len(state.get("resources", [])),
+        "total_managed_resources": state.get("resource_count", len(state.get("resources", []))),
         "diagrammable_resources": len(resources),
         "categories": category_counts,
         "resources": resource_list,
     }
+    if "sources" in state:
+        summary["sources"] = state["sources"]
+    if read_errors:
+        summary["errors"] = read_errors
 
     return json.dumps(summary, indent=2)
 
@@ -704,6 +1720,8 @@ def tfstate_to_diagram(
     include_types: str = "",
     exclude_types: str = "",
     enhance_with_llm: str = "false",
+    relationship_mode: str = "auto",
+    incremental: str = "false",
 ) -> str:
     """
     Read a Terraform state file and generate an architecture diagram (YAML + PNG).
@@ -717,27 +1735,95 @@ def tfstate_to_diagram(
     connections, removing incorrect ones, and improving labels. This requires
     AWS Bedrock credentials. Defaults to "false" to keep standalone capability.
 
+    relationship_mode selects how connections are inferred:
+    - "references": from what resources actually reference — ARNs/IDs in their
+      attributes, their dependencies, and plumbing such as event source
+      mappings, listeners and subscriptions.
+    - "patterns": from architectural patterns between resource types.
+    - "auto" (default): references, plus patterns for resources the references
+      leave unconnected.
+
+    When incremental is "true", a snapshot of the parsed resources and
+    relationships is kept per source and settings, keyed on each state's
+    lineage and serial. A state whose S3 ETag (or local mtime and size) is
+    unchanged costs a single HEAD request; one whose serial is unchanged is
+    not re-processed; otherwise the tool also writes a change diagram
+    highlighting added (+), removed (-) and modified (~) nodes and edges.
+
     Args:
         source: Path to the tfstate file. Either a local path
                 (e.g. /path/to/terraform.tfstate) or an S3 URI
                 (e.g. s3://my-bucket/env/terraform.tfstate).
+                Several states are fetched concurrently and merged into one
+                cross-stack diagram: a comma-separated list, a glob
+                (stacks/**/*.tfstate), a directory, an S3 prefix
+                (s3://my-bucket/env/) or an S3 key glob.
         diagram_name: Name shown on the generated diagram.
         output_folder: Folder to save outputs. Auto-generated if empty.
         include_types: Comma-separated Terraform types to include (empty = all).
         exclude_types: Comma-separated additional Terraform types to exclude.
         enhance_with_llm: "true" to use LLM for relationship enhancement, "false" (default) for deterministic only.
+        relationship_mode: "auto" (default), "references" or "patterns".
+        incremental: "true" to skip unchanged states and report changes since the previous run.
 
     Returns:
         Status message with file paths and a summary of what was generated.
     """
+    relationship_mode = relationship_mode.strip().lower() or "auto"
+    if relationship_mode not in RELATIONSHIP_MODES:
+        return f"❌ Unknown relationship_mode '{relationship_mode}'. Use one of: {', '.join(RELATIONSHIP_MODES)}"
+
+    # Incremental mode: compare cheap fingerprints with the previous snapshot before reading anything
+    snapshot_key = None
+    previous = None
+    sources = None
+    fingerprints: Dict[str, str] = {}
+    if incremental.lower() == "true":
+        try:
+            sources = _expand_sources(source)
+        except Exception as e:
+            return f"❌ Error reading tfstate: {e}"
+        if not sources:
+            return f"❌ File not found: No tfstate files match: {source}"
+
+        # A snapshot only answers for the folder its outputs are in; "" reuses the last auto-named one
+        snapshot_key = make_key(
+            "tfstate-snapshot", source, include_types, exclude_types,
+            relationship_mode, enhance_with_llm.lower(), diagram_name,
+            str(Path(output_folder).resolve()) if output_folder else "",
+        )
+        previous = _get_snapshot_cache().get_json(snapshot_key)
+        if previous and not _outputs_exist(previous):
+            previous = None
+
+        try:
+            fingerprints = _source_fingerprints(sources)
+        except Exception as e:
+            logger.warning(f"Could not fingerprint {source}, reading it in full: {e}")
+        if previous and fingerprints and previous["fingerprints"] == fingerprints:
+            return _unchanged_result(source, previous, "state files untouched")
+
     # Read state
     try:
-        state = _read_tfstate(source)
+        state, read_errors = _read_tfstates(
+            source,
+            keep_references=relationship_mode != "patterns",
+            sources=sources,
+            keep_digest=snapshot_key is not None,
+        )
     except FileNotFoundError as e:
         return f"❌ File not found: {e}"
     except Exception as e:
         return f"❌ Error reading tfstate: {e}"
 
+    if snapshot_key:
+        versions = _state_versions(state, sources)
+        if previous and not read_errors and previous["versions"] == versions:
+            # Rewritten without a new serial (e.g. re-uploaded): remember the new fingerprints
+            previous["fingerprints"] = fingerprints
+            _get_snapshot_cache().put_json(snapshot_key, previous)
+            return _unchanged_result(source, previous, "serial and lineage unchanged")
+
     # Parse resources
     resources = _parse_resources(state)
 
@@ -753,13 +1839,24 @@ def tfstate_to_diagram(
         return "❌ No diagrammable AWS resources found in the state file."
 
     # Infer relationships (deterministic pass)
-    relationships = _infer_relationships(resources)
-    relationship_method = "deterministic"
+    if relationship_mode == "patterns":
+        relationships = _stack_pattern_relationships(resources, state)
+        relationship_method = "deterministic"
+    else:
+        relationships = _infer_reference_relationships(resources, state)
+        relationship_method = "attribute references"
+        if relationship_mode == "auto":
+            reference_count = len(relationships)
+            relationships = _merge_pattern_relationships(
+                relationships, _stack_pattern_relationships(resources, state)
+            )
+            if len(relationships) > reference_count:
+                relationship_method = "attribute references + patterns"
 
     # Optional LLM enhancement pass
     if enhance_with_llm.lower() == "true":
-        relationships = _llm_enhance_relationships(resources, relationships)
-        relationship_method = "LLM-enhanced"
+        relationships, partial = _llm_enhance_relationships(resources, relationships)
+        relationship_method = "LLM-enhanced (partial: the response was truncated)" if partial else "LLM-enhanced"
 
     # Build YAML
     diagram_dict = _build_diagram_yaml(resources, relationships, diagram_name)
@@ -773,6 +1870,7 @@ def tfstate_to_diagram(
         output_folder = f"{sanitized}_{timestamp}"
 
     output_dir = Path(output_folder)
+    created = not output_dir.exists()
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Save YAML
@@ -784,6 +1882,7 @@ def tfstate_to_diagram(
     # Generate PNG using the diagrams library
     png_path = output_dir / f"{diagram_name.replace(' ', '_').lower()}.png"
     diagram_result = _generate_png(diagram_dict, str(png_path))
+    artifacts = [yaml_path, png_path]
 
     # Build category summary
     cat_counts: Dict[str, int] = {}
@@ -791,6 +1890,42 @@ def tfstate_to_diagram(
         cat_counts[res["category"]] = cat_counts.get(res["category"], 0) + 1
     cat_summary = ", ".join(f"{v} {k}" for k, v in sorted(cat_counts.items(), key=lambda x: -x[1]))
 
+    sources_summary = ""
+    if "sources" in state:
+        stacks = ", ".join(s["stack"] for s in state["sources"])
+        sources_summary = f"\n **Stacks**: {len(state['sources'])} state files merged ({stacks})"
+    if read_errors:
+        sources_summary += f"\n ⚠️ **Unreadable States**: {len(read_errors)}\n" + "\n".join(f"  - {e}" for e in read_errors)
+
+    changes_summary = ""
+    if snapshot_key:
+        snapshot = _build_snapshot(
+            fingerprints, versions, resources, relationships,
+            _resource_digests(resources, state),
+            {"yaml_path": str(yaml_path), "png_path": str(png_path)},
+        )
+        if previous is None:
+            changes_summary = "\n\n **Changes**: first incremental run — snapshot saved as the baseline"
+        else:
+            diff = _diff_snapshots(previous, snapshot)
+            replaced = _replaced_states(previous, snapshot)
+            changes_summary = (
+                f"\n\n **Changes** since {_format_versions(previous['versions'])}:\n{_format_diff_summary(diff)}"
+            )
+            if replaced:
+                changes_summary += f"\n ⚠️ **Replaced States** (new lineage): {', '.join(replaced)}"
+            if _has_changes(diff):
+                change_dict = _build_change_diagram(previous, snapshot, diff, diagram_name)
+                change_stem = f"{diagram_name.replace(' ', '_').lower()}_changes"
+                with open(output_dir / f"{change_stem}.yaml", "w") as f:
+                    yaml.dump(change_dict, f, default_flow_style=False, sort_keys=False)
+                change_result = _generate_png(change_dict, str(output_dir / f"{change_stem}.png"))
+                changes_summary += f"\n **Change Diagram**: {output_dir / change_stem}.png —{change_result}"
+                artifacts += [output_dir / f"{change_stem}.yaml", output_dir / f"{change_stem}.png"]
+        _get_snapshot_cache().put_json(snapshot_key, snapshot)
+
+    record_run(output_dir, "tfstate_to_diagram", diagram_name, artifacts, created=created)
+
     return f""" Terraform State → Architecture Diagram Generated!
 
  **Source**: {source}
@@ -800,7 +1935,7 @@ def tfstate_to_diagram(
 
  **Resources**: {len(resources)} AWS services mapped ({cat_summary})
  **Relationships**: {len(relationships)} connections ({relationship_method})
- **Terraform State Version**: {state.get('version')}  |  Serial: {state.get('serial')}
+ **Terraform State Version**: {state.get('version')}  |  Serial: {state.get('serial')}{sources_summary}{changes_summary}
 
 {diagram_result}
 
@@ -813,17 +1948,6 @@ def _generate_png(diagram_dict: dict, output_path: str) -> str:
     """Generate PNG from the diagram dict using the Python diagrams library."""
     try:
         from diagrams import Diagram, Cluster, Edge
-        import diagrams.aws.network as aws_network
-        import diagrams.aws.compute as aws_compute
-        import diagrams.aws.database as aws_database
-        import diagrams.aws.storage as aws_storage
-        import diagrams.aws.security as aws_security
-        import diagrams.aws.management as aws_management
-        import diagrams.aws.devtools as aws_devtools
-        import diagrams.aws.analytics as aws_analytics
-        import diagrams.aws.integration as aws_integration
-        import diagrams.aws.general as aws_general
-        import diagrams.generic.network as generic_network
     except ImportError:
         return "⚠️ PNG generation skipped — install: pip install diagrams graphviz"
 
@@ -834,115 +1958,45 @@ def _generate_png(diagram_dict: dict, output_path: str) -> str:
     output_stem = output_file.stem
     output_dir = output_file.parent
 
-    NODE_MAP = {
-        "aws.compute.EC2": aws_compute.EC2,
-        "aws.compute.ECS": aws_compute.ECS,
-        "aws.compute.EKS": aws_compute.EKS,
-        "aws.compute.Lambda": aws_compute.Lambda,
-        "aws.compute.Fargate": aws_compute.Fargate,
-        "aws.compute.ElasticBeanstalk": aws_compute.ElasticBeanstalk,
-        "aws.compute.ECR": aws_compute.ECR,
-        "aws.compute.AppRunner": lambda n: aws_compute.EC2(n),
-        "aws.compute.Batch": aws_compute.Batch,
-        "aws.compute.Lightsail": aws_compute.Lightsail,
-        "aws.network.ElbApplicationLoadBalancer": aws_network.ElbApplicationLoadBalancer,
-        "aws.network.ElbNetworkLoadBalancer": aws_network.ElbNetworkLoadBalancer,
-        "aws.network.ELB": aws_network.ELB,
-        "aws.network.APIGateway": aws_network.APIGateway,
-        "aws.network.CloudFront": aws_network.CloudFront,
-        "aws.network.Route53": aws_network.Route53,
-        "aws.network.VPC": aws_network.VPC,
-        "aws.network.NATGateway": aws_network.NATGateway,
-        "aws.network.InternetGateway": aws_network.InternetGateway,
-        "aws.network.Endpoint": aws_network.Endpoint,
-        "aws.network.TransitGateway": aws_network.TransitGateway,
-        "aws.network.DirectConnect": aws_network.DirectConnect,
-        "aws.network.VPNGateway": aws_network.VpnGateway,
-        "aws.network.GlobalAccelerator": aws_network.GlobalAccelerator,
-        "aws.network.CloudMap": aws_network.CloudMap,
-        "aws.network.Privatelink": aws_network.Privatelink,
-        "aws.database.RDS": aws_database.RDS,
-        "aws.database.Aurora": aws_database.Aurora,
-        "aws.database.Dynamodb": aws_database.Dynamodb,
-        "aws.database.ElastiCache": aws_database.ElastiCache,
-        "aws.database.Redshift": aws_database.Redshift,
-        "aws.database.Neptune": aws_database.Neptune,
-        "aws.database.DocumentDB": lambda n: aws_database.RDS(n),
-        "aws.database.DynamodbDax": aws_database.DynamodbDax,
-        "aws.database.Timestream": aws_database.Timestream,
-        "aws.database.KeyspacesManagedApacheCassandraService": lambda n: aws_database.RDS(n),
-        "aws.storage.S3": aws_storage.S3,
-        "aws.storage.EFS": aws_storage.EFS,
-        "aws.storage.EBS": aws_storage.EBS,
-        "aws.storage.Fsx": aws_storage.Fsx,
-        "aws.storage.Backup": aws_storage.Backup,
-        "aws.storage.S3Glacier": aws_storage.S3Glacier,
-        "aws.security.Cognito": aws_security.Cognito,
-        "aws.security.WAF": aws_security.WAF,
-        "aws.security.Shield": aws_security.Shield,
-        "aws.security.CertificateManager": aws_security.CertificateManager,
-        "aws.security.KMS": aws_security.KMS,
-        "aws.security.SecretsManager": aws_security.SecretsManager,
-        "aws.security.IAM": aws_security.IAM,
-        "aws.security.Guardduty": aws_security.Guardduty,
-        "aws.security.Inspector": aws_security.Inspector,
-        "aws.security.Macie": aws_security.Macie,
-        "aws.integration.SQS": aws_integration.SQS,
-        "aws.integration.SNS": aws_integration.SNS,
-        "aws.integration.Eventbridge": aws_integration.Eventbridge,
-        "aws.integration.StepFunctions": aws_integration.StepFunctions,
-        "aws.integration.MQ": aws_integration.MQ,
-        "aws.integration.Appsync": aws_integration.Appsync,
-        "aws.analytics.KinesisDataStreams": aws_analytics.KinesisDataStreams,
-        "aws.analytics.KinesisDataFirehose": aws_analytics.KinesisDataFirehose,
-        "aws.analytics.Glue": aws_analytics.Glue,
-        "aws.analytics.Athena": aws_analytics.Athena,
-        "aws.analytics.ElasticsearchService": aws_analytics.ElasticsearchService,
-        "aws.analytics.EMR": aws_analytics.EMR,
-        "aws.analytics.Quicksight": lambda n: aws_analytics.Athena(n),
-        "aws.analytics.ManagedStreamingForKafka": aws_analytics.ManagedStreamingForKafka,
-        "aws.management.Cloudwatch": aws_management.Cloudwatch,
-        "aws.management.Cloudtrail": aws_management.Cloudtrail,
-        "aws.management.Cloudformation": aws_management.Cloudformation,
-        "aws.management.SystemsManager": aws_management.SystemsManager,
-        "aws.management.Config": aws_management.Config,
-        "aws.devtools.Codebuild": aws_devtools.Codebuild,
-        "aws.devtools.Codepipeline": aws_devtools.Codepipeline,
-        "aws.devtools.Codecommit": aws_devtools.Codecommit,
-        "aws.devtools.Codedeploy": aws_devtools.Codedeploy,
-    }
+    # Identical diagrams (e.g. re-rendering an unchanged state) are served from the render cache
+    cache = get_render_cache()
+    cache_key = render_cache_key("tfstate", diagram_dict, "png", "TB") if cache else None
+    if cache:
+        meta = cache.get_json(cache_key)
+        if meta and cache.copy_to(cache_key, output_dir / f"{output_stem}.png", suffix=".png"):
+            logger.info(f"Render cache hit for {output_file.name}")
+            return f" PNG generated with {meta['nodes']} nodes and {meta['edges']} edges (cached)"
 
     try:
-        with Diagram(diagram_info.get("name", "Architecture"), filename=str(output_dir / output_stem), show=False, direction="TB"):
+        # Rendered beside the target and moved over it, never written into a (possibly hardlinked) old PNG
+        with atomic_render(output_dir / f"{output_stem}.png") as render_stem, \
+                Diagram(diagram_info.get("name", "Architecture"), filename=str(render_stem), show=False, direction="TB"):
             nodes = {}
 
             for res in resources:
                 rid = res.get("id", "")
                 rname = res.get("name", rid)
-                rtype = res.get("type", "")
-
-                node_cls = NODE_MAP.get(rtype, aws_general.General)
-                if callable(node_cls):
-                    nodes[rid] = node_cls(rname)
-                else:
-                    nodes[rid] = aws_general.General(rname)
+                nodes[rid] = create_node(res.get("type", ""), rname)
 
             rel_count = 0
             for res in resources:
                 rid = res.get("id", "")
                 for rel in res.get("relates", []):
                     target = rel.get("to", "")
-                    label = rel.get("label", "")
+                    edge_attrs = {k: rel[k] for k in ("label", "color", "style") if rel.get(k)}
                     if rid in nodes and target in nodes:
                         try:
-                            if label:
-                                nodes[rid] >> Edge(label=label) >> nodes[target]
+                            if edge_attrs:
+                                nodes[rid] >> Edge(**edge_attrs) >> nodes[target]
                             else:
                                 nodes[rid] >> nodes[target]
                             rel_count += 1
                         except Exception:
                             pass
 
+        if cache and cache.put_file(cache_key, output_dir / f"{output_stem}.png", suffix=".png"):
+            cache.put_json(cache_key, {"nodes": len(nodes), "edges": rel_count})
+
         return f" PNG generated with {len(nodes)} nodes and {rel_count} edges"
 
     except Exception as e:
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the incremental JSON reader: values split across chunks
+"""
+
+import json
+
+from src.tools.json_stream import JsonStreamReader
+
+DOCUMENT = json.dumps({
+    "timeout": 2.5,
+    "ratio": -0.125,
+    "big": 6.02e23,
+    "small": 1E-7,
+    "count": 1024,
+    "enabled": True,
+    "missing": None,
+    "name": "lambda-2.5",
+    "nested": {"values": [1.5, 2, 3e2, False]},
+})
+
+
+def read_document(chunks) -> dict:
+    """Read every value of a top-level object, decoding each one."""
+    reader = JsonStreamReader(iter(chunks))
+    return {key: reader.read_value() for key in reader.iter_object()}
+
+
+def test_split_at_every_position():
+    """Splitting the document anywhere, including inside a number, reads the same values."""
+    expected = json.loads(DOCUMENT)
+    for split in range(1, len(DOCUMENT)):
+        chunks = [DOCUMENT[:split], DOCUMENT[split:]]
+        assert read_document(chunks) == expected, f"split at {split}: {chunks!r}"
+
+
+def test_split_numbers_in_arrays():
+    """Array elements that are numbers split after "." or "e" are not cut short."""
+    text = "[1.5, 2e3, -0.25, 7]"
+    for split in range(1, len(text)):
+        reader = JsonStreamReader(iter([text[:split], text[split:]]))
+        assert [reader.read_value() for _ in reader.iter_array()] == [1.5, 2e3, -0.25, 7], f"split at {split}"
+
+
+def test_one_character_chunks():
+    """A document delivered one character at a time reads the same values."""
+    assert read_document(list(DOCUMENT)) == json.loads(DOCUMENT)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing split JSON values...")
+    test_split_at_every_position()
+    test_split_numbers_in_arrays()
+    test_one_character_chunks()
+    print("✅ All values read correctly across chunk boundaries")
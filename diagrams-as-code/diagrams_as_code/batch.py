@@ -0,0 +1,178 @@
+"""
+Provide implementation of rendering many diagrams at once.
+"""
+from __future__ import annotations
+
+import functools
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import yaml
+
+from diagrams_as_code.renderer import DiagramRenderer
+from diagrams_as_code.schema import RenderResult
+
+if TYPE_CHECKING:
+    from diagrams_as_code.cache import RenderCache
+
+
+def glob_yaml_file_paths(pattern: str) -> list[str]:
+    """
+    Get paths to files matching a glob pattern, relative or absolute, sorted.
+
+    Arguments:
+        pattern (str): a glob pattern such as `examples/**/*.yaml`, `**` matches any number of directories.
+
+    Returns:
+        A list of paths to files as a list of strings.
+    """
+    pattern_path = Path(pattern)
+
+    if pattern_path.is_absolute():
+        root = Path(pattern_path.anchor)
+        pattern = str(pattern_path.relative_to(root))
+    else:
+        root = Path()
+
+    return sorted(str(path) for path in root.glob(pattern) if path.is_file())
+
+
+def expand_yaml_file_paths(patterns: list[str]) -> list[str]:
+    """
+    Expand paths and glob patterns to a list of `YAML` files.
+
+    Paths and patterns without matches are kept as is, so a missing file or a mistyped pattern is reported as a
+    failure instead of being silently skipped. Duplicates, including a file passed both by relative and absolute
+    paths, are removed while keeping the initial order.
+
+    Arguments:
+        patterns (list[str]): paths to files and/or glob patterns such as `examples/**/*.yaml`.
+
+    Returns:
+        A list of paths to `YAML` files as a list of strings.
+    """
+    yaml_file_paths = []
+
+    for pattern in patterns:
+        matches = glob_yaml_file_paths(pattern=pattern) if glob.has_magic(pattern) else []
+        yaml_file_paths.extend(matches or [pattern])
+
+    yaml_file_path_by_resolved_path = {}
+
+    for yaml_file_path in yaml_file_paths:
+        yaml_file_path_by_resolved_path.setdefault(Path(yaml_file_path).resolve(), yaml_file_path)
+
+    return list(yaml_file_path_by_resolved_path.values())
+
+
+def read_yaml_file(yaml_file_path: str) -> dict:
+    """
+    Read a `YAML` file.
+
+    Arguments:
+        yaml_file_path (str): a path to a `YAML` file, relative to the current directory or absolute.
+
+    Returns:
+        The parsed file as a dictionary.
+    """
+    if glob.has_magic(yaml_file_path) and not Path(yaml_file_path).exists():
+        message = f'no files match the pattern: {yaml_file_path}'
+        raise FileNotFoundError(message)
+
+    with (Path.cwd() / yaml_file_path).open() as yaml_file:
+        return yaml.safe_load(yaml_file)
+
+
+def render_file(yaml_file_path: str, cache: RenderCache | None = None) -> RenderResult:
+    """
+    Render a diagram from a `YAML` file.
+
+    Errors are not raised but returned as a part of the result to let other files of a batch be rendered.
+
+    Arguments:
+        yaml_file_path (str): a path to a `YAML` file, relative to the current directory or absolute.
+        cache (RenderCache | None): a cache of drawings, no cache by default.
+
+    Returns:
+        The result as a `RenderResult`.
+    """
+    try:
+        yaml_as_dict = read_yaml_file(yaml_file_path=yaml_file_path)
+        drawing_path = DiagramRenderer(cache=cache).render(yaml_as_dict=yaml_as_dict)
+
+    except Exception as error:  # noqa: BLE001
+        return RenderResult(yaml_file_path=yaml_file_path, error=f'{type(error).__name__}: {error}')
+
+    return RenderResult(yaml_file_path=yaml_file_path, drawing_path=drawing_path)
+
+
+def find_drawing_path_conflicts(yaml_file_paths: list[str]) -> dict[str, RenderResult]:
+    """
+    Find files that would be drawn to the same file as a file before them.
+
+    Such files can not be rendered in parallel, as processes would write the same drawing at once, and only the
+    last one would be kept anyway. Files that can not be read are left for rendering to report.
+
+    Arguments:
+        yaml_file_paths (list[str]): paths to `YAML` files.
+
+    Returns:
+        Failed results of the conflicting files by their paths as a dictionary.
+    """
+    renderer = DiagramRenderer()
+    yaml_file_path_by_drawing_path = {}
+    conflicts = {}
+
+    for yaml_file_path in yaml_file_paths:
+        try:
+            drawing_path = renderer.get_drawing_path(yaml_as_dict=read_yaml_file(yaml_file_path=yaml_file_path))
+        except Exception:  # noqa: BLE001, S112
+            continue
+
+        drawing_path_key = Path(drawing_path).resolve()
+        first_yaml_file_path = yaml_file_path_by_drawing_path.setdefault(drawing_path_key, yaml_file_path)
+
+        if first_yaml_file_path != yaml_file_path:
+            conflicts[yaml_file_path] = RenderResult(
+                yaml_file_path=yaml_file_path,
+                error=f'DrawingPathConflict: {drawing_path} is already drawn from {first_yaml_file_path}, '
+                'set a different `file_name`',
+            )
+
+    return conflicts
+
+
+def render_files(
+    yaml_file_paths: list[str],
+    jobs: int | None = None,
+    cache: RenderCache | None = None,
+) -> list[RenderResult]:
+    """
+    Render diagrams from many `YAML` files across a pool of processes.
+
+    Every process of the pool is reused for many files, so the interpreter and `diagrams` are loaded once per process
+    instead of once per file. A file that would be drawn to the same file as a file before it is not rendered but
+    reported as failed. Results are returned in the order of the files.
+
+    Arguments:
+        yaml_file_paths (list[str]): paths to `YAML` files.
+        jobs (int | None): a number of processes, a number of CPUs by default.
+        cache (RenderCache | None): a cache of drawings shared by all processes, no cache by default.
+
+    Returns:
+        Results as a list of `RenderResult`.
+    """
+    conflicts = find_drawing_path_conflicts(yaml_file_paths=yaml_file_paths)
+    yaml_file_paths_to_render = [path for path in yaml_file_paths if path not in conflicts]
+
+    if jobs == 1 or len(yaml_file_paths_to_render) <= 1:
+        results = [render_file(yaml_file_path=path, cache=cache) for path in yaml_file_paths_to_render]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(functools.partial(render_file, cache=cache), yaml_file_paths_to_render))
+
+    results_by_path = {result.yaml_file_path: result for result in results} | conflicts
+
+    return [results_by_path[yaml_file_path] for yaml_file_path in yaml_file_paths]
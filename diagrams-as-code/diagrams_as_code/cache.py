@@ -0,0 +1,167 @@
+"""
+Provide implementation of a cache of rendered drawings.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from importlib.metadata import (
+    PackageNotFoundError,
+    version,
+)
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from diagrams_as_code.schema import YamlDiagram
+
+DEFAULT_CACHE_DIRECTORY = str(Path('~') / '.cache' / 'diagrams-as-code')
+DEFAULT_CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+
+def get_diagrams_version() -> str:
+    """
+    Get a version of the installed `diagrams` library.
+
+    Returns:
+        The version as a string, `unknown` if the library is not installed as a distribution.
+    """
+    try:
+        return version('diagrams')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+class RenderCache:
+    """
+    Render cache implementation.
+
+    Stores drawings on disk by a hash of the diagram's content, so a `YAML` file which is byte-for-byte or
+    semantically identical to a previously rendered one (keys order, formatting and comments do not matter) is served
+    without invoking `Graphviz`. The least recently used drawings are evicted when the cache grows over its size.
+    """
+
+    def __init__(
+        self: RenderCache,
+        directory: str | None = None,
+        max_size: int = DEFAULT_CACHE_MAX_SIZE,
+    ) -> None:
+        """
+        Construct the object.
+
+        Arguments:
+            directory (str | None): a directory to store drawings in, `DIAGRAMS_AS_CODE_CACHE_DIR` environment
+                variable or `~/.cache/diagrams-as-code` by default.
+            max_size (int): a maximum size of all stored drawings in bytes.
+        """
+        directory = directory or os.environ.get('DIAGRAMS_AS_CODE_CACHE_DIR') or DEFAULT_CACHE_DIRECTORY
+
+        self.directory = str(Path(directory).expanduser())
+        self.max_size = max_size
+
+    @staticmethod
+    def get_key(diagram: YamlDiagram) -> str:
+        """
+        Get a key of a diagram.
+
+        The key is a hash of everything that changes a drawing: resources, relationships, format, direction, style and
+        the `diagrams` library version. A file name and whether to open a drawing do not change it, so they are left
+        out.
+
+        Arguments:
+            diagram (YamlDiagram): a diagram.
+
+        Returns:
+            The key as a string.
+        """
+        diagram_as_dict = diagram.model_dump(mode='json', exclude={'file_name', 'open', 'style'})
+        # The `style` default is a plain `{}` Pydantic warns about when dumping; empty sections draw as no style
+        style = diagram.style.model_dump(mode='json') if diagram.style else {}
+        diagram_as_dict['style'] = {section: attributes for section, attributes in style.items() if attributes}
+        canonical = json.dumps([diagram_as_dict, get_diagrams_version()], sort_keys=True, separators=(',', ':'))
+
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get_path(self: RenderCache, key: str, format_: str) -> str:
+        """
+        Get a path to a stored drawing.
+
+        Arguments:
+            key (str): a key of a diagram.
+            format_ (str): a format of a drawing such as `png`.
+
+        Returns:
+            The path as a string.
+        """
+        return str(Path(self.directory) / f'{key}.{format_}')
+
+    def get(self: RenderCache, key: str, format_: str, drawing_path: str) -> bool:
+        """
+        Copy a stored drawing to a path.
+
+        Arguments:
+            key (str): a key of a diagram.
+            format_ (str): a format of a drawing such as `png`.
+            drawing_path (str): a path to copy the drawing to.
+
+        Returns:
+            `True` if there was a stored drawing, `False` otherwise.
+        """
+        cached_drawing_path = self.get_path(key=key, format_=format_)
+
+        try:
+            shutil.copyfile(cached_drawing_path, drawing_path)
+            os.utime(cached_drawing_path)
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def put(self: RenderCache, key: str, format_: str, drawing_path: str) -> None:
+        """
+        Store a drawing.
+
+        The drawing is written to a temporary file first and then moved in place, so parallel renders never read a
+        partially written drawing.
+
+        Arguments:
+            key (str): a key of a diagram.
+            format_ (str): a format of a drawing such as `png`.
+            drawing_path (str): a path to the rendered drawing.
+        """
+        Path(self.directory).mkdir(parents=True, exist_ok=True)
+
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        os.close(file_descriptor)
+
+        shutil.copyfile(drawing_path, temporary_path)
+        Path(temporary_path).replace(self.get_path(key=key, format_=format_))
+
+        self.evict()
+
+    def evict(self: RenderCache) -> None:
+        """
+        Remove the least recently used drawings until the cache fits its size.
+        """
+        entries = []
+
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith('.tmp-'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+
+            try:
+                Path(path).unlink()
+            except FileNotFoundError:
+                continue
+
+            total_size -= size
@@ -0,0 +1,339 @@
+"""
+Provide implementation of a diagram renderer.
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
+import importlib
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from diagrams import (
+    Cluster,
+    Diagram,
+    Edge,
+    Node,
+)
+
+from diagrams_as_code.enums import (
+    ServiceResourceType,
+    RelationDirection,
+)
+from diagrams_as_code.resources import DiagramGroup
+from diagrams_as_code.schema import (
+    Relationship,
+    YamlDiagram,
+    YamlDiagramResource,
+)
+
+if TYPE_CHECKING:
+    from diagrams_as_code.cache import RenderCache
+
+
+@functools.cache
+def get_diagram_node_class(path: str) -> Node:
+    """
+    Get a `diagrams` node class.
+
+    The common example of a path is `aws.analytics.Analytics` which strongly correlates to `diagrams` real defined
+    classes. In the example, `Analytics` is a class, the rest `aws.analytics` is a few modules. Basically, there
+    are the modules are loaded and then the class is got on fly.
+
+    It helps to reuse the same «path» in both YAML files and execution of classes without a need of redeclaration.
+
+    The result is memoized per path, so a type repeated over many resources is resolved with a single lookup.
+
+    Arguments:
+        path (str): a path to class.
+
+    References:
+        - https://diagrams.mingrammer.com/docs/nodes/aws
+
+    Returns:
+        The node's class as a `Node`.
+    """
+    provider, resource, service = path.split('.')
+
+    module = importlib.import_module(f'diagrams.{provider}.{resource}')
+    class_ = getattr(module, service)
+
+    return class_
+
+
+class DiagramRenderer:
+    """
+    Diagram renderer implementation.
+
+    Owns the registry of nodes and the list of relationships of a single diagram, so nothing is shared between
+    renders. A renderer is meant to be used for one diagram, create a new one for every `render` call to be able to
+    draw many diagrams in one process (including from different threads, as `diagrams` keeps the current diagram
+    and cluster in context variables).
+    """
+
+    def __init__(
+        self: DiagramRenderer,
+        output_directory: str | None = None,
+        cache: RenderCache | None = None,
+    ) -> None:
+        """
+        Construct the object.
+
+        Arguments:
+            output_directory (str | None): a directory to save the drawing to, the current one by default.
+            cache (RenderCache | None): a cache of drawings to skip rendering of already rendered diagrams, no cache
+                by default.
+        """
+        self.output_directory = output_directory
+        self.cache = cache
+        self.resources = {}
+        self.relationships = []
+
+    def get_file_name(self: DiagramRenderer, diagram: YamlDiagram) -> str:
+        """
+        Get a path to the drawing of a diagram without the format's extension.
+
+        Arguments:
+            diagram (YamlDiagram): a diagram.
+
+        Returns:
+            The path as a string.
+        """
+        file_name = diagram.file_name or '_'.join(diagram.name.split()).lower()
+
+        if self.output_directory is not None:
+            file_name = str(Path(self.output_directory) / file_name)
+
+        return file_name
+
+    def get_drawing_path(self: DiagramRenderer, yaml_as_dict: dict) -> str:
+        """
+        Get a path the drawing of a diagram is saved to, without rendering it.
+
+        Arguments:
+            yaml_as_dict (dict): a parsed `YAML` file with configurations.
+
+        Returns:
+            The path as a string.
+        """
+        diagram = YamlDiagram(**yaml_as_dict.get('diagram'))
+
+        return f'{self.get_file_name(diagram=diagram)}.{diagram.format.value}'
+
+    def render(self: DiagramRenderer, yaml_as_dict: dict) -> str:
+        """
+        Render a diagram.
+
+        If the renderer has a cache and the same diagram was rendered before, the stored drawing is copied instead.
+
+        Arguments:
+            yaml_as_dict (dict): a parsed `YAML` file with configurations.
+
+        Returns:
+            A path to the drawing as a string.
+        """
+        diagram_as_dict = yaml_as_dict.get('diagram')
+        diagram = YamlDiagram(**diagram_as_dict)
+
+        # TODO: figure out how to pass empty `YamlDiagramStyle` to `diagram.style` in Pydantic to remove the if
+        #  condition.
+        graph_style = Diagram._default_graph_attrs | diagram.style.graph if diagram.style else {}
+        node_style = Diagram._default_node_attrs | diagram.style.node if diagram.style else {}
+        edge_style = Diagram._default_edge_attrs | diagram.style.edge if diagram.style else {}
+
+        file_name = self.get_file_name(diagram=diagram)
+        drawing_path = f'{file_name}.{diagram.format.value}'
+
+        # A drawing to be opened is always rendered, as `diagrams` opens it only as a part of rendering.
+        cache_key = None
+
+        if self.cache is not None and not diagram.open:
+            cache_key = self.cache.get_key(diagram=diagram)
+
+            if self.cache.get(key=cache_key, format_=diagram.format.value, drawing_path=drawing_path):
+                return drawing_path
+
+        with Diagram(
+            name='',
+            filename=file_name,
+            direction=diagram.direction.mapped,
+            outformat=diagram.format,
+            autolabel=diagram.label_resources,
+            show=diagram.open,
+            graph_attr=graph_style,
+            node_attr=node_style,
+            edge_attr=edge_style,
+        ):
+            for resource in diagram.resources:
+                self.process_resource(resource=resource, parent_id='diagram')
+
+            for relationship in self.relationships:
+                self.process_relationship(relationship=relationship)
+
+        if cache_key is not None:
+            with contextlib.suppress(OSError):
+                self.cache.put(key=cache_key, format_=diagram.format.value, drawing_path=drawing_path)
+
+        return drawing_path
+
+    def process_resource(
+        self: DiagramRenderer,
+        resource: YamlDiagramResource,
+        parent_id: str,
+        group: DiagramGroup = None,
+    ) -> None:
+        """
+        Process a resource.
+
+        Basically, this method is recursive because `YAML` file can contain infinite number of configurations. There
+        might be a single node (such as EC2 or RDS), a group of nodes and a cluster of nodes and groups further.
+
+        All nodes are stored by unique identifiers in the renderer's storage (`resources`) and then easily fetched from
+        there to build relationships. For this, there is a need to always pass parent's resource identifier to have
+        unique identifier for each node.
+
+        There is also the resource called `group` which is literary a list of nodes to which other things relate to.
+
+        Arguments:
+            resource (YamlDiagramResource): a resource.
+            parent_id (str): a parent's identifier.
+            group (DiagramGroup): a group.
+        """
+        if resource.type == ServiceResourceType.CLUSTER.value:
+            with Cluster(label=resource.name):
+                for resource_of in resource.of:
+                    self.process_resource(resource=resource_of, parent_id=f'{parent_id}.{resource.id}')
+
+        if resource.type == ServiceResourceType.GROUP.value:
+            diagram_group = DiagramGroup()
+
+            self.resources.update({
+                f'{parent_id}.{resource.id}': diagram_group,
+            })
+
+            self.collect_relationships(resource=resource, parent_id=parent_id)
+
+            for resource_of in resource.of:
+                self.process_resource(
+                    resource=resource_of,
+                    parent_id=f'{parent_id}.{resource.id}',
+                    group=diagram_group,
+                )
+
+        if (
+            resource.type != ServiceResourceType.CLUSTER.value and
+            resource.type != ServiceResourceType.GROUP.value
+        ):
+            resource_instance = get_diagram_node_class(path=resource.type)(label=resource.name)
+
+            self.resources.update({
+                f'{parent_id}.{resource.id}': resource_instance,
+            })
+
+            self.collect_relationships(resource=resource, parent_id=parent_id)
+
+            if group is not None:
+                group.add_node(node=resource_instance)
+
+    def collect_relationships(self: DiagramRenderer, resource: YamlDiagramResource, parent_id: str) -> None:
+        """
+        Collect relationships of a resource to draw them after all resources are processed.
+
+        Arguments:
+            resource (YamlDiagramResource): a resource.
+            parent_id (str): a parent's identifier.
+        """
+        for relation in resource.relates:
+            relationship = Relationship(
+                from_=f'{parent_id}.{resource.id}',
+                to=f'diagram.{relation.to}',
+                direction=relation.direction,
+                label=relation.label,
+                color=relation.color,
+                style=relation.style,
+            )
+
+            self.relationships.append(relationship)
+
+    def process_relationship(self: DiagramRenderer, relationship: Relationship) -> None:
+        """
+        Process a relationship.
+
+        Arguments:
+            relationship (Relationship): a relationship.
+
+        Raises:
+            ValueError: if there is no resource to relate to.
+        """
+        edge = Edge(label=relationship.label, color=relationship.color, style=relationship.style)
+
+        resource_from_instance = self.resources.get(relationship.from_)
+        resource_to_instance = self.resources.get(relationship.to)
+
+        if resource_to_instance is None:
+            resource_to_identifier_from_configs = relationship.to.replace('diagram.', '')
+
+            raise ValueError(
+                f"There is no such a resource's identifier to relate to: {resource_to_identifier_from_configs}",
+            )
+
+        is_resource_from_node = not isinstance(resource_from_instance, DiagramGroup)
+        is_resource_from_group = isinstance(resource_from_instance, DiagramGroup)
+
+        is_resource_to_node = not isinstance(resource_to_instance, DiagramGroup)
+        is_resource_to_group = isinstance(resource_to_instance, DiagramGroup)
+
+        if is_resource_from_node and is_resource_to_node:
+            if relationship.direction == RelationDirection.INCOMING:
+                resource_from_instance.__lshift__(other=edge)
+                edge.__lshift__(other=resource_to_instance)
+
+            if relationship.direction == RelationDirection.OUTGOING:
+                resource_from_instance.__rshift__(other=edge)
+                edge.__rshift__(other=resource_to_instance)
+
+            if relationship.direction == RelationDirection.BIDIRECTIONAL:
+                resource_from_instance.__rshift__(other=edge)
+                edge.__lshift__(other=resource_to_instance)
+
+            if relationship.direction == RelationDirection.UNDIRECTED:
+                resource_from_instance.__sub__(other=edge)
+                edge.__sub__(other=resource_to_instance)
+
+        if is_resource_from_group and is_resource_to_node:
+            group_nodes = resource_from_instance.get_nodes()
+
+            if relationship.direction == RelationDirection.INCOMING:
+                group_nodes_edges = edge.__rlshift__(other=group_nodes)
+                resource_to_instance.__rlshift__(other=group_nodes_edges)
+
+            if relationship.direction == RelationDirection.OUTGOING:
+                group_nodes_edges = edge.__rrshift__(other=group_nodes)
+                resource_to_instance.__rrshift__(other=group_nodes_edges)
+
+            if relationship.direction == RelationDirection.BIDIRECTIONAL:
+                group_nodes_edges = edge.__rrshift__(other=group_nodes)
+                resource_to_instance.__rlshift__(other=group_nodes_edges)
+
+            if relationship.direction == RelationDirection.UNDIRECTED:
+                group_nodes_edges = edge.__rsub__(other=group_nodes)
+                resource_to_instance.__rsub__(other=group_nodes_edges)
+
+        if is_resource_from_node and is_resource_to_group:
+            group_nodes = resource_to_instance.get_nodes()
+
+            if relationship.direction == RelationDirection.INCOMING:
+                resource_from_instance.__lshift__(other=edge)
+                edge.__lshift__(other=group_nodes)
+
+            if relationship.direction == RelationDirection.OUTGOING:
+                resource_from_instance.__rshift__(other=edge)
+                edge.__rshift__(other=group_nodes)
+
+            if relationship.direction == RelationDirection.BIDIRECTIONAL:
+                resource_from_instance.__rshift__(other=edge)
+                edge.__lshift__(other=group_nodes)
+
+            if relationship.direction == RelationDirection.UNDIRECTED:
+                resource_from_instance.__sub__(other=edge)
+                edge.__sub__(other=group_nodes)
@@ -77,3 +77,15 @@ class Relationship(BaseModel):
     label: str | None = None
     color: str | None = None
     style: str | None = None
+
+
+class RenderResult(BaseModel):
+    """
+    Render result schema implementation.
+
+    Is used to report a status of a single `YAML` file in the batch mode.
+    """
+
+    yaml_file_path: str
+    drawing_path: str | None = None
+    error: str | None = None